@@ -46,3 +46,29 @@ def segment_attributions(
         mean_attrs[mask_size == 0] = -np.inf
         result[:, seg] = mean_attrs
     return result
+
+
+def segment_attributions_tensor(
+    seg_images: torch.Tensor, attrs: torch.Tensor
+) -> torch.Tensor:
+    # Same as segment_attributions, but computed using torch on the device
+    # of the attributions.
+    seg_img_flat = seg_images.reshape(seg_images.shape[0], -1).to(
+        device=attrs.device, dtype=torch.long
+    )
+    attrs_flat = attrs.reshape(attrs.shape[0], -1)
+    num_segments = int(seg_img_flat.max().item()) + 1
+    sum_attrs = torch.zeros(
+        (attrs_flat.shape[0], num_segments),
+        dtype=attrs_flat.dtype,
+        device=attrs_flat.device,
+    ).scatter_add_(1, seg_img_flat, attrs_flat)
+    mask_size = torch.zeros_like(sum_attrs).scatter_add_(
+        1, seg_img_flat, torch.ones_like(attrs_flat)
+    )
+    # If seg does not exist for image, mask_size == 0. Set to -inf.
+    return torch.where(
+        mask_size > 0,
+        sum_attrs / mask_size.clamp(min=1),
+        torch.full_like(sum_attrs, -torch.inf),
+    )
@@ -3,7 +3,8 @@ from numpy import typing as npt
 from scipy import stats
 from statsmodels.stats.multitest import multipletests
 import pandas as pd
-from typing import Tuple, Optional
+import torch
+from typing import Optional
 
 
 def wilcoxon_tests(
@@ -69,76 +70,139 @@ def wilcoxon_tests(
     return effect_sizes, pvalues
 
 
+def _to_tensor(x: npt.NDArray | torch.Tensor) -> torch.Tensor:
+    # torch.from_numpy shares memory with the array, no copy is made
+    x = torch.from_numpy(x) if isinstance(x, np.ndarray) else x
+    if not torch.is_floating_point(x):
+        x = x.to(torch.get_default_dtype())
+    return x
+
+
+def rankdata(x: torch.Tensor) -> torch.Tensor:
+    """
+    Ranks the values along the last dimension of a tensor.
+    Equivalent to scipy.stats.rankdata with ``method="average"``:
+    ranks start at 1, and tied values are assigned the average of the ranks
+    that they would have received otherwise.
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        values to rank (shape: [..., num_measurements])
+
+    Returns
+    -------
+    torch.Tensor
+        ranks of the values along the last dimension (same shape as x)
+    """
+    x = _to_tensor(x)
+    n = x.shape[-1]
+    sorted_x, sort_idx = torch.sort(x, dim=-1)
+    positions = torch.arange(n, device=x.device).expand_as(sorted_x)
+    # A tie group starts where the sorted value differs from the previous one,
+    # and ends where it differs from the next one
+    new_value = sorted_x[..., 1:] != sorted_x[..., :-1]
+    is_start = torch.ones_like(sorted_x, dtype=torch.bool)
+    is_start[..., 1:] = new_value
+    is_end = torch.ones_like(sorted_x, dtype=torch.bool)
+    is_end[..., :-1] = new_value
+    # Position of the first and last element of the tie group of each element
+    group_start = torch.where(is_start, positions, 0).cummax(dim=-1).values
+    group_end = (
+        torch.where(is_end, positions, n - 1)
+        .flip(-1)
+        .cummin(dim=-1)
+        .values.flip(-1)
+    )
+    sorted_ranks = (group_start + group_end).to(x.dtype) / 2 + 1
+    return torch.empty_like(sorted_ranks).scatter_(-1, sort_idx, sorted_ranks)
+
+
 def rowwise_pearsonr(
-    a: npt.NDArray,
-    b: npt.NDArray,
-) -> Tuple[npt.NDArray, npt.NDArray]:
+    a: npt.NDArray | torch.Tensor,
+    b: npt.NDArray | torch.Tensor,
+) -> npt.NDArray | torch.Tensor:
     """
     Calculates row-wise correlations between two arrays.
     This is a faster implementation of scipy.stats.pearsonr,
     as it only calculates correlation coefficients between corresponding rows,
     rather than between all pairs of rows.
 
+    The correlations are computed using torch on the device of the inputs,
+    along the last dimension. Any leading dimensions are treated as batch
+    dimensions, and are broadcast between `a` and `b`. This allows computing
+    correlations for multiple methods or settings in a single call.
+    The inputs are not modified.
+
     Parameters
     ----------
-    a : npt.NDArray
-        first set of row vectors (shape: [num_rows, num_measurements])
-    b : npt.NDArray
-        second set of row vectors (shape: [num_rows, num_measurements])
+    a : npt.NDArray | torch.Tensor
+        first set of row vectors (shape: [..., num_measurements])
+    b : npt.NDArray | torch.Tensor
+        second set of row vectors (shape: [..., num_measurements])
 
     Returns
     -------
-    npt.NDArray
-        row-wise Pearson correlations between a and b (shape: [num_rows])
+    npt.NDArray | torch.Tensor
+        row-wise Pearson correlations between a and b (shape: [...]).
+        A numpy array if both inputs are numpy arrays, a tensor otherwise.
     """
-    # Subtract mean
-    # [batch_size, num_observations]
-    a -= a.mean(axis=1, keepdims=True)
-    b -= b.mean(axis=1, keepdims=True)
-    # Calculate numerator
-    # [batch_size]
-    cov = (a * b).sum(axis=1)
-    # Calculate denominator
-    # [batch_size]
-    denom = np.sqrt((a**2).sum(axis=1)) * np.sqrt((b**2).sum(axis=1))
-    # denom_zero = denom == 0.0
-    # if np.any(denom_zero):
-    #    warnings.warn(f"Zero standard deviation detected")
-
-    # If the denominator is zero, that means one of the series is constant.
+    return_numpy = isinstance(a, np.ndarray) and isinstance(b, np.ndarray)
+    a, b = _to_tensor(a), _to_tensor(b)
+    # Subtract mean and scale to unit norm before multiplying,
+    # this keeps the computation stable in float32.
+    # [..., num_measurements]
+    a = a - a.mean(dim=-1, keepdim=True)
+    b = b - b.mean(dim=-1, keepdim=True)
+    a_norm = torch.linalg.vector_norm(a, dim=-1, keepdim=True)
+    b_norm = torch.linalg.vector_norm(b, dim=-1, keepdim=True)
+    # If the norm is zero, that means one of the series is constant.
     # Correlation is technically undefined in this case, but covariance is 0.
     # We can just set the correlation coefficient to zero in this case.
-    corrcoefs = np.divide(cov, denom, out=np.zeros_like(cov), where=denom != 0)
+    a = torch.where(a_norm != 0, a / a_norm, torch.zeros_like(a))
+    b = torch.where(b_norm != 0, b / b_norm, torch.zeros_like(b))
+    # [...]
+    corrcoefs = (a * b).sum(dim=-1).clamp(-1.0, 1.0)
 
+    if return_numpy:
+        return corrcoefs.cpu().numpy()
     return corrcoefs
 
 
 def rowwise_spearmanr(
-    a: npt.NDArray,
-    b: npt.NDArray,
-) -> Tuple[npt.NDArray, npt.NDArray]:
+    a: npt.NDArray | torch.Tensor,
+    b: npt.NDArray | torch.Tensor,
+) -> npt.NDArray | torch.Tensor:
     """
     Calculates row-wise Spearman correlations between two arrays.
     This is a faster implementation of scipy.stats.spearmanr,
     as it only calculates correlation coefficients between corresponding rows,
     rather than between all pairs of rows.
 
+    Ties are handled by assigning average ranks (see :func:`rankdata`).
+    Like :func:`rowwise_pearsonr`, leading dimensions are broadcast.
+
     Parameters
     ----------
-    a : npt.NDArray
-        first set of row vectors (shape: [num_rows, num_measurements])
-    b : npt.NDArray
-        second set of row vectors (shape: [num_rows, num_measurements])
+    a : npt.NDArray | torch.Tensor
+        first set of row vectors (shape: [..., num_measurements])
+    b : npt.NDArray | torch.Tensor
+        second set of row vectors (shape: [..., num_measurements])
 
     Returns
     -------
-    npt.NDArray
-        row-wise Spearman correlations between a and b (shape: [num_rows])
+    npt.NDArray | torch.Tensor
+        row-wise Spearman correlations between a and b (shape: [...]).
+        A numpy array if both inputs are numpy arrays, a tensor otherwise.
     """
+    return_numpy = isinstance(a, np.ndarray) and isinstance(b, np.ndarray)
     # Calculate rank of each row
-    # [batch_size, num_observations]
-    a_ranks = stats.rankdata(a, axis=1)
-    b_ranks = stats.rankdata(b, axis=1)
+    # [..., num_observations]
+    a_ranks = rankdata(_to_tensor(a))
+    b_ranks = rankdata(_to_tensor(b))
 
     # Spearman rank correlation is simply Pearson correlation of ranks
-    return rowwise_pearsonr(a_ranks, b_ranks)
+    corrcoefs = rowwise_pearsonr(a_ranks, b_ranks)
+    if return_numpy:
+        return corrcoefs.cpu().numpy()
+    return corrcoefs
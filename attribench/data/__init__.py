@@ -1,6 +1,19 @@
 from .hdf5_dataset._hdf5_dataset import HDF5Dataset
 from .hdf5_dataset._hdf5_dataset_writer import HDF5DatasetWriter
+from .hdf5_dataset._output_cache import OutputCache, model_fingerprint
+from .memmap_dataset._memmap_dataset import MemmapDataset
+from .memmap_dataset._convert import hdf5_to_memmap, memmap_to_hdf5
+from .sharded_dataset._sharded_dataset import ShardedDataset
+from .bucketed_dataset._bucketed_dataset import BucketedDataset
+from .bucketed_dataset._bucketed_dataset_writer import (
+    BucketedDatasetWriter,
+    BucketedAttributionsDatasetWriter,
+)
+from .bucketed_dataset._bucket_batch_sampler import BucketBatchSampler
+from .subset_dataset._subset_dataset import SubsetDataset
+from .subset_dataset._subset_dataset_writer import SubsetDatasetWriter
 from ._index_dataset import IndexDataset
+from ._shared_cache import SharedArrayCache
 from .attributions_dataset._attributions_dataset import (
     AttributionsDataset,
     GroupedAttributionsDataset,
@@ -8,3 +21,9 @@ from .attributions_dataset._attributions_dataset import (
 from .attributions_dataset._attributions_dataset_writer import (
     AttributionsDatasetWriter,
 )
+from .sharded_dataset._sharded_dataset_writer import (
+    ShardedDatasetWriter,
+    ShardedAttributionsDatasetWriter,
+)
+from .attributions_dataset._materialize import materialize_aggregation
+from .attributions_dataset._rankings import store_rankings
@@ -0,0 +1,88 @@
+from typing import List, Optional, Sequence, Tuple
+from ._shared_cache import SharedArrayCache
+from .bucketed_dataset._bucketed_dataset import _BucketedArray
+from torch.utils.data import Dataset, TensorDataset
+from numpy import typing as npt
+import numpy as np
+import h5py
+import torch
+
+
+def _as_tensor(rows: npt.NDArray) -> torch.Tensor:
+    # Attributions stored as float16 are used as float32. Rankings are
+    # stored as unsigned integers, which torch does not support.
+    if rows.dtype == np.float16:
+        rows = rows.astype(np.float32)
+    elif rows.dtype == np.uint16:
+        rows = rows.astype(np.int32)
+    elif rows.dtype == np.uint32:
+        rows = rows.astype(np.int64)
+    return torch.from_numpy(np.ascontiguousarray(rows))
+
+
+def _coalesce(indices: npt.NDArray) -> Tuple[npt.NDArray, List[npt.NDArray]]:
+    # Sorts and deduplicates the indices, and splits them into runs of
+    # consecutive indices. Also returns the inverse of the sorting.
+    unique, inverse = np.unique(indices, return_inverse=True)
+    run_starts = np.flatnonzero(np.diff(unique) != 1) + 1
+    return inverse, np.split(unique, run_starts)
+
+
+def _read_rows(
+    source: h5py.Dataset | torch.Tensor | npt.NDArray | _BucketedArray,
+    indices: npt.ArrayLike,
+    cache: Optional[SharedArrayCache] = None,
+) -> torch.Tensor:
+    # Reads the rows at the given indices from a HDF5 dataset, memory-mapped
+    # array or Tensor. For HDF5 datasets and arrays, the indices are sorted
+    # and coalesced into contiguous ranges, which are read with one slice
+    # each. The rows are then scattered back into the order of the indices.
+    # If a cache is given, rows from HDF5 datasets are read through it.
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    if isinstance(source, torch.Tensor):
+        return source[torch.from_numpy(indices)]
+    if isinstance(source, _BucketedArray):
+        return _as_tensor(source.read_rows(indices))
+    if cache is not None and isinstance(source, h5py.Dataset):
+        return _as_tensor(cache.read_rows(source, indices))
+    if len(indices) == 0:
+        return _as_tensor(np.empty((0, *source.shape[1:]), source.dtype))
+    inverse, runs = _coalesce(indices)
+    if len(runs) == 1 and len(indices) == len(runs[0]) and np.all(
+        np.diff(indices) == 1
+    ):
+        # A single increasing range is a zero-copy slice for memmaps
+        return _as_tensor(source[indices[0] : indices[-1] + 1])
+    rows = np.concatenate([source[run[0] : run[-1] + 1] for run in runs])
+    return _as_tensor(rows[inverse])
+
+
+def _write_rows(
+    dataset: h5py.Dataset, indices: npt.ArrayLike, rows: npt.NDArray
+):
+    # Writes rows at the given indices of a HDF5 dataset, using one slice
+    # per contiguous range of indices. If an index occurs multiple times,
+    # the last row is written.
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    if len(indices) == 0:
+        return
+    order = np.argsort(indices, kind="stable")
+    last = np.ones(len(indices), dtype=bool)
+    last[:-1] = indices[order][1:] != indices[order][:-1]
+    order = order[last]
+    _, runs = _coalesce(indices)
+    start = 0
+    for run in runs:
+        dataset[run[0] : run[-1] + 1] = rows[order[start : start + len(run)]]
+        start += len(run)
+
+
+def _read_samples(dataset: Dataset, indices: Sequence[int]) -> List[Tuple]:
+    # Reads a batch of (sample, label) tuples from a dataset, using a bulk
+    # read if the dataset supports it.
+    if hasattr(dataset, "__getitems__"):
+        return dataset.__getitems__(indices)
+    if isinstance(dataset, TensorDataset):
+        index = torch.as_tensor(indices, dtype=torch.long)
+        return list(zip(*(tensor[index] for tensor in dataset.tensors)))
+    return [dataset[i] for i in indices]
@@ -0,0 +1,193 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from torch.utils.data import DataLoader, Dataset, TensorDataset
+from numpy import typing as npt
+from ._index_dataset import IndexDataset
+from .bucketed_dataset._bucketed_dataset import BucketedDataset
+from .bucketed_dataset._bucket_batch_sampler import BucketBatchSampler
+from .attributions_dataset._attributions_dataset import (
+    AttributionsDataset,
+    GroupedAttributionsDataset,
+)
+import math
+import torch
+
+
+def _tensor_samples(
+    dataset: Dataset,
+) -> Optional[Tuple[torch.Tensor, torch.Tensor]]:
+    # Returns the samples and labels if the dataset is a TensorDataset
+    if isinstance(dataset, TensorDataset) and len(dataset.tensors) == 2:
+        return dataset.tensors[0], dataset.tensors[1]
+    return None
+
+
+def _tensor_attributions(
+    dataset: AttributionsDataset,
+) -> Optional[Dict[str, torch.Tensor]]:
+    # Returns the attributions if they were given as a dict of Tensors
+    if dataset.path is not None or not isinstance(dataset.attributions, dict):
+        return None
+    if not all(
+        isinstance(dataset.attributions[method_name], torch.Tensor)
+        for method_name in dataset.method_names
+    ):
+        return None
+    return dataset.attributions
+
+
+def _samples_dataset(dataset: IndexDataset) -> Dataset:
+    # Returns the dataset containing the samples
+    if isinstance(dataset, AttributionsDataset):
+        return dataset.samples_dataset
+    if isinstance(dataset, GroupedAttributionsDataset):
+        return dataset.dataset.samples_dataset
+    return dataset.dataset
+
+
+def _buckets(dataset: IndexDataset) -> Optional[Dict[str, npt.NDArray]]:
+    # Returns the buckets if the samples have different shapes
+    samples_dataset = _samples_dataset(dataset)
+    if isinstance(samples_dataset, BucketedDataset):
+        return samples_dataset.buckets
+    return None
+
+
+class _InMemoryLoader:
+    """Iterates over the batches of a dataset that is held in memory as
+    Tensors, by slicing the Tensors directly.
+
+    The batches are identical to the batches of a ``DataLoader`` without
+    shuffling, but no worker processes are started and samples are not
+    read and collated one by one.
+    """
+
+    def __init__(
+        self,
+        dataset: IndexDataset,
+        batch_size: int,
+        samples: torch.Tensor,
+        labels: torch.Tensor,
+        attributions: Optional[Dict[str, torch.Tensor]] = None,
+    ):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.samples = samples
+        self.labels = labels
+        self.attributions = attributions
+
+    def __len__(self) -> int:
+        return math.ceil(len(self.dataset) / self.batch_size)
+
+    def _attributions_batch(self, start: int, stop: int) -> Tuple:
+        # Batches of an AttributionsDataset are method-major, so a batch
+        # can contain samples of consecutive methods
+        assert isinstance(self.dataset, AttributionsDataset)
+        assert self.attributions is not None
+        num_samples = self.dataset.num_samples
+        indices, samples, labels, attrs = [], [], [], []
+        method_names: List[str] = []
+        first_method = start // num_samples
+        last_method = (stop - 1) // num_samples
+        for method_idx in range(first_method, last_method + 1):
+            method_name = self.dataset.method_names[method_idx]
+            offset = method_idx * num_samples
+            lo = max(start, offset) - offset
+            hi = min(stop, offset + num_samples) - offset
+            indices.append(torch.arange(lo, hi))
+            samples.append(self.samples[lo:hi])
+            labels.append(self.labels[lo:hi])
+            attrs.append(
+                self.dataset._aggregate(
+                    self.attributions[method_name][lo:hi],
+                    dim=self.dataset.aggregate_dim + 1,
+                )
+            )
+            method_names.extend([method_name] * (hi - lo))
+        if len(indices) == 1:
+            return indices[0], samples[0], labels[0], attrs[0], method_names
+        return (
+            torch.cat(indices),
+            torch.cat(samples),
+            torch.cat(labels),
+            torch.cat(attrs),
+            method_names,
+        )
+
+    def _batch(self, start: int, stop: int) -> Tuple:
+        if isinstance(self.dataset, AttributionsDataset):
+            return self._attributions_batch(start, stop)
+        indices = torch.arange(start, stop)
+        samples = self.samples[start:stop]
+        labels = self.labels[start:stop]
+        if isinstance(self.dataset, GroupedAttributionsDataset):
+            assert self.attributions is not None
+            attrs = {
+                method_name: self.dataset.dataset._aggregate(
+                    self.attributions[method_name][start:stop],
+                    dim=self.dataset.dataset.aggregate_dim + 1,
+                )
+                for method_name in self.dataset.method_names
+            }
+            return indices, samples, labels, attrs
+        return indices, samples, labels
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for start in range(0, len(self.dataset), self.batch_size):
+            yield self._batch(
+                start, min(start + self.batch_size, len(self.dataset))
+            )
+
+
+def _get_dataloader(
+    dataset: IndexDataset,
+    batch_size: int,
+    num_workers: int = 4,
+    pin_memory: bool = False,
+) -> Iterable[Tuple]:
+    """Returns an iterable over the batches of an :class:`IndexDataset`,
+    :class:`AttributionsDataset` or :class:`GroupedAttributionsDataset`.
+
+    If the samples, labels and attributions are held in memory as Tensors,
+    the batches are sliced directly from the Tensors. Otherwise, a
+    ``DataLoader`` with the given number of workers is returned.
+    If the samples are a :class:`BucketedDataset`, the ``DataLoader`` uses
+    a :class:`BucketBatchSampler`, so each batch contains samples with the
+    same shape.
+    """
+    tensors = None
+    attributions = None
+    if isinstance(dataset, AttributionsDataset):
+        attributions = _tensor_attributions(dataset)
+        if attributions is not None:
+            tensors = _tensor_samples(dataset.samples_dataset)
+    elif isinstance(dataset, GroupedAttributionsDataset):
+        attributions = _tensor_attributions(dataset.dataset)
+        if attributions is not None:
+            tensors = _tensor_samples(dataset.dataset.samples_dataset)
+    elif type(dataset) is IndexDataset:
+        tensors = _tensor_samples(dataset.dataset)
+    if tensors is not None:
+        return _InMemoryLoader(dataset, batch_size, *tensors, attributions)
+    buckets = _buckets(dataset)
+    if buckets is not None:
+        offsets = [0]
+        if isinstance(dataset, AttributionsDataset):
+            # Batches are method-major, like the batches of the dataset
+            offsets = [
+                method_idx * dataset.num_samples
+                for method_idx in range(len(dataset.method_names))
+            ]
+        return DataLoader(
+            dataset,
+            batch_sampler=BucketBatchSampler(
+                buckets, batch_size, offsets=offsets
+            ),
+            num_workers=num_workers,
+            pin_memory=pin_memory,
+        )
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+    )
@@ -1,5 +1,7 @@
 from collections.abc import Sized
+from typing import List, Sequence, Tuple
 from torch.utils.data import Dataset
+from ._bulk_read import _read_samples
 
 
 class IndexDataset(Dataset):
@@ -26,3 +28,12 @@ class IndexDataset(Dataset):
     def __getitem__(self, item):
         data, target = self.dataset[item]
         return item, data, target
+
+    def __getitems__(self, items: Sequence[int]) -> List[Tuple]:
+        # Used by the DataLoader to read a batch at once
+        return [
+            (item, data, target)
+            for item, (data, target) in zip(
+                items, _read_samples(self.dataset, items)
+            )
+        ]
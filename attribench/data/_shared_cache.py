@@ -0,0 +1,157 @@
+from typing import Dict, Optional, Tuple
+from numpy import typing as npt
+import numpy as np
+import h5py
+import hashlib
+import os
+import tempfile
+import threading
+
+
+def _default_directory() -> str:
+    # /dev/shm is backed by memory on Linux
+    if os.path.isdir("/dev/shm"):
+        return os.path.join("/dev/shm", "attribench-cache")
+    return os.path.join(tempfile.gettempdir(), "attribench-cache")
+
+
+class SharedArrayCache:
+    """Cache of rows read from HDF5 datasets, shared between processes.
+
+    The cache can be passed to :class:`HDF5Dataset` and
+    :class:`AttributionsDataset`. Rows are cached in blocks of `block_size`
+    consecutive rows, keyed by the HDF5 file, the dataset in that file and
+    the block index. Each block is stored as a ``.npy`` file in `directory`,
+    which by default is on a memory-backed file system (``/dev/shm``).
+    Cached blocks are memory-mapped, so all DataLoader workers and metric
+    workers on the same node share the decoded arrays, also across
+    consecutive metric runs.
+
+    If the total size of the cached blocks exceeds `max_bytes`, the least
+    recently used blocks are evicted. Blocks of a HDF5 file are invalidated
+    when the file is modified.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        directory: Optional[str] = None,
+        block_size: int = 64,
+    ):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            Maximal total size of the cached blocks, in bytes.
+        directory : Optional[str], optional
+            Directory in which the blocks are stored. Processes that use
+            the same directory share the cache. If None, a directory in
+            ``/dev/shm`` is used if available, or in the temporary directory
+            otherwise. Defaults to None.
+        block_size : int, optional
+            Number of consecutive rows per cached block. Defaults to 64.
+        """
+        self.max_bytes = max_bytes
+        self.directory = (
+            directory if directory is not None else _default_directory()
+        )
+        self.block_size = block_size
+        os.makedirs(self.directory, exist_ok=True)
+        self._keys: Dict[Tuple[str, str], str] = {}
+
+    def __getstate__(self):
+        # Keys depend on the state of the file, so they are not copied
+        # to other processes
+        state = self.__dict__.copy()
+        state["_keys"] = {}
+        return state
+
+    def _key(self, dataset: h5py.Dataset) -> str:
+        filename = os.path.realpath(dataset.file.filename)
+        name = dataset.name if dataset.name is not None else ""
+        if (filename, name) not in self._keys:
+            stat = os.stat(filename)
+            self._keys[(filename, name)] = hashlib.sha1(
+                f"{filename}:{stat.st_mtime_ns}:{stat.st_size}:{name}".encode()
+            ).hexdigest()
+        return self._keys[(filename, name)]
+
+    def _read_block(
+        self, dataset: h5py.Dataset, key: str, block: int
+    ) -> npt.NDArray:
+        path = os.path.join(self.directory, f"{key}-{block}.npy")
+        try:
+            rows = np.load(path, mmap_mode="r")
+            os.utime(path)  # Mark as recently used
+            return rows
+        except FileNotFoundError:
+            pass
+        start = block * self.block_size
+        rows = dataset[start : start + self.block_size]
+        # Write to a temporary file first, so other processes never see
+        # a partially written block
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fp:
+            np.save(fp, rows)
+        os.replace(tmp_path, path)
+        self._evict()
+        return rows
+
+    def _evict(self):
+        # Removes the least recently used blocks until the cache fits
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # Evicted by another process
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def read_rows(
+        self, dataset: h5py.Dataset, indices: npt.ArrayLike
+    ) -> npt.NDArray:
+        """Reads rows from a HDF5 dataset, using the cached blocks if
+        possible.
+
+        Parameters
+        ----------
+        dataset : h5py.Dataset
+            The dataset to read from.
+        indices : npt.ArrayLike
+            Indices of the rows to read, in any order.
+
+        Returns
+        -------
+        npt.NDArray
+            The rows, in the order of `indices`.
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        key = self._key(dataset)
+        blocks = indices // self.block_size
+        rows = np.empty((len(indices), *dataset.shape[1:]), dataset.dtype)
+        for block in np.unique(blocks):
+            positions = np.flatnonzero(blocks == block)
+            block_rows = self._read_block(dataset, key, int(block))
+            rows[positions] = block_rows[
+                indices[positions] - block * self.block_size
+            ]
+        return rows
+
+    def clear(self):
+        """Removes all cached blocks from the cache directory."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
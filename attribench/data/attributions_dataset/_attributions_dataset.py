@@ -2,22 +2,75 @@ import torch
 from torch.utils.data import TensorDataset
 from attribench.data._index_dataset import IndexDataset
 from .._typing import _check_is_dataset
+from .._bulk_read import _read_rows, _read_samples
+from ..memmap_dataset._memmap_dataset import _load_manifest, _open_memmap
+from .._shared_cache import SharedArrayCache
+from ..sharded_dataset._sharded_dataset import (
+    SHARDED_ATTRIBUTIONS,
+    _ShardedArray,
+    _ShardedFile,
+    _is_sharded,
+    _shard_paths,
+)
+from ..bucketed_dataset._bucketed_dataset import (
+    BUCKETED,
+    BUCKETS,
+    _BucketedArray,
+    _BucketIndex,
+    _is_bucketed,
+)
 from torch.utils.data import Dataset
 import numpy as np
+from numpy import typing as npt
 import h5py
-from typing import List, Dict, Tuple
+import os
+from typing import List, Dict, Sequence, Tuple
 
 
 def _max_abs(arr: torch.Tensor, dim: int) -> torch.Tensor:
-    return torch.max(torch.abs(arr), dim=dim, keepdim=True)
+    return torch.amax(torch.abs(arr), dim=dim, keepdim=True)
 
 
 def _mean(arr: torch.Tensor, dim: int) -> torch.Tensor:
     return torch.mean(arr, dim=dim, keepdim=True)
 
 
-def _check_is_dataset_or_tensor(obj) -> h5py.Dataset | torch.Tensor:
-    if isinstance(obj, h5py.Dataset) or isinstance(obj, torch.Tensor):
+_AGGREGATE_FNS = {"mean": _mean, "max_abs": _max_abs}
+
+# Group (HDF5) or directory (memmap) containing materialized aggregations
+AGGREGATED = "aggregated"
+# Group (HDF5) or directory (memmap) containing precomputed rankings
+RANKINGS = "rankings"
+
+
+def _aggregation_key(aggregate_method: str, aggregate_dim: int) -> str:
+    return f"{AGGREGATED}/{aggregate_method}_{aggregate_dim}"
+
+
+def _has_stored(path: str, key: str, method_names: List[str]) -> bool:
+    # Checks if the group or directory contains all given methods
+    if _is_sharded(path, SHARDED_ATTRIBUTIONS):
+        return all(
+            _has_stored(shard_path, key, method_names)
+            for shard_path in _shard_paths(
+                path, _load_manifest(path, SHARDED_ATTRIBUTIONS)
+            )
+        )
+    if os.path.isdir(path):
+        return all(
+            os.path.isfile(os.path.join(path, key, f"{method_name}.npy"))
+            for method_name in method_names
+        )
+    with h5py.File(path, "r") as fp:
+        return all(f"{key}/{method_name}" in fp for method_name in method_names)
+
+
+def _check_is_dataset_or_tensor(
+    obj,
+) -> h5py.Dataset | torch.Tensor | npt.NDArray | _ShardedArray:
+    if isinstance(
+        obj, (h5py.Dataset, torch.Tensor, np.ndarray, _ShardedArray)
+    ):
         return obj
     else:
         raise ValueError(
@@ -26,13 +79,14 @@ def _check_is_dataset_or_tensor(obj) -> h5py.Dataset | torch.Tensor:
 
 
 def _get_attributions_shape(
-    attributions: Dict[str, torch.Tensor] | h5py.File, method_names: List[str]
+    attributions: Dict[str, torch.Tensor] | h5py.Group,
+    method_names: List[str],
 ) -> Tuple[int, ...]:
     shape = None
     for m_name in method_names:
         if shape is None:
             # If shape is None, set it to the shape of the first method
-            if isinstance(attributions, h5py.File):
+            if isinstance(attributions, h5py.Group):
                 dataset = _check_is_dataset(attributions[m_name])
                 shape = dataset.shape
             else:
@@ -40,7 +94,7 @@ def _get_attributions_shape(
         else:
             # Otherwise, check if the shape for the current method
             # is the same as the first
-            if isinstance(attributions, h5py.File):
+            if isinstance(attributions, h5py.Group):
                 dataset = _check_is_dataset(attributions[m_name])
                 cur_shape = dataset.shape
             else:
@@ -73,16 +127,68 @@ def _parse_attributions_dict(
 
 
 def _parse_attributions_file(
-    path: str, methods: List[str] | None
+    path: str, methods: List[str] | None, rankings: bool = False
 ) -> Tuple[List[str], int, Tuple[int, ...]]:
+    if _is_sharded(path, SHARDED_ATTRIBUTIONS):
+        # Sharded attributions: all shards contain the same methods,
+        # so the metadata is read from the first shard
+        manifest = _load_manifest(path, SHARDED_ATTRIBUTIONS)
+        shard_paths = _shard_paths(path, manifest)
+        method_names, _, attributions_shape = _parse_attributions_file(
+            shard_paths[0], methods, rankings
+        )
+        if rankings and not _has_stored(path, RANKINGS, method_names):
+            raise ValueError("Rankings were not stored for all shards")
+        return method_names, manifest["num_samples"], attributions_shape
+    if os.path.isdir(path):
+        # Memory-mapped attributions: metadata is in the manifest
+        manifest = _load_manifest(path, "attributions")
+        if methods is None:
+            method_names = manifest["methods"]
+        elif all(m in manifest["methods"] for m in methods):
+            method_names = methods
+        else:
+            raise ValueError(f"Invalid methods: {methods}")
+        if not _has_stored(path, RANKINGS if rankings else "", method_names):
+            raise ValueError(
+                "Rankings were not stored for all methods"
+                if rankings
+                else "Attribution values were dropped, use rankings=True"
+            )
+        return (
+            method_names,
+            manifest["num_samples"],
+            tuple(manifest["sample_shape"]),
+        )
+    if _is_bucketed(path):
+        return _parse_bucketed_file(path, methods, rankings)
     with h5py.File(path, "r") as fp:
+        group: h5py.Group = fp
+        if rankings:
+            if RANKINGS not in fp:
+                raise ValueError("Rankings were not stored")
+            group = fp[RANKINGS]
         # Check if methods argument is valid
+        # Groups (e.g. materialized aggregations) are not methods
+        all_methods = [
+            key
+            for key in group.keys()
+            if isinstance(group[key], h5py.Dataset)
+        ]
         if methods is None:
-            method_names = list(fp.keys())
-        elif all(m in fp for m in methods):
+            method_names = all_methods
+        elif all(m in all_methods for m in methods):
             method_names = methods
+        elif not rankings and RANKINGS in fp:
+            raise ValueError(
+                "Attribution values were dropped, use rankings=True"
+            )
         else:
             raise ValueError(f"Invalid methods: {methods}")
+        if len(method_names) == 0 and not rankings and RANKINGS in fp:
+            raise ValueError(
+                "Attribution values were dropped, use rankings=True"
+            )
 
         # Check if num_samples metadata is valid
         num_samples = fp.attrs["num_samples"]
@@ -95,11 +201,53 @@ def _parse_attributions_file(
             )
 
         # Check if attributions have the same shape for each method
-        shape = _get_attributions_shape(fp, method_names)
+        shape = _get_attributions_shape(group, method_names)
         attributions_shape = shape[1:]
     return method_names, num_samples, attributions_shape
 
 
+def _parse_bucketed_file(
+    path: str, methods: List[str] | None, rankings: bool
+) -> Tuple[List[str], int, Tuple[int, ...]]:
+    # Attributions of samples with different shapes: each bucket contains
+    # a dataset for each method. The attributions shape is the shape of the
+    # bucket with the fewest features, so e.g. the number of features to
+    # perturb in Sensitivity-N is valid for all samples.
+    if rankings:
+        raise ValueError("Rankings are not supported for bucketed files")
+    with h5py.File(path, "r") as fp:
+        buckets = fp[BUCKETS]
+        assert isinstance(buckets, h5py.Group)
+        all_methods: List[str] | None = None
+        shapes = []
+        for name in buckets.keys():
+            group = buckets[name]
+            assert isinstance(group, h5py.Group)
+            bucket_methods = [key for key in group.keys() if key != "indices"]
+            if all_methods is None:
+                all_methods = bucket_methods
+            elif set(bucket_methods) != set(all_methods):
+                raise ValueError(
+                    "Attributions must be given for each method in each"
+                    " bucket"
+                )
+            if len(bucket_methods) > 0:
+                shapes.append(
+                    _get_attributions_shape(group, bucket_methods)[1:]
+                )
+        if all_methods is None or len(shapes) == 0:
+            raise ValueError("Attributions must not be empty")
+        if methods is None:
+            method_names = all_methods
+        elif all(m in all_methods for m in methods):
+            method_names = methods
+        else:
+            raise ValueError(f"Invalid methods: {methods}")
+        num_samples = int(fp.attrs["num_samples"])
+    attributions_shape = min(shapes, key=lambda shape: np.prod(shape))
+    return method_names, num_samples, attributions_shape
+
+
 class AttributionsDataset(IndexDataset):
     """
     Represents a dataset containing attributions for a set of samples and
@@ -122,6 +270,20 @@ class AttributionsDataset(IndexDataset):
     for each method. The shape of the dataset must be
     ``[num_samples, *sample_shape]``. The file must also contain an attribute
     ``num_samples`` specifying the number of samples in the dataset.
+    Alternatively, the path can point to a directory containing a
+    memory-mapped ``.npy`` file for each method, as created by
+    :func:`hdf5_to_memmap`. Reads from such a directory are zero-copy and
+    do not hold the HDF5 lock, so they scale to many DataLoader workers.
+    The path can also point to a directory of HDF5 shards, as written by
+    :class:`ShardedAttributionsDatasetWriter`. The shards are opened when
+    they are first read from.
+
+    Attributions for samples with different shapes (see
+    :class:`BucketedDataset`) are read from a file written by
+    :class:`BucketedAttributionsDatasetWriter`. Each batch must then only
+    contain samples with the same shape, which can be done using a
+    :class:`BucketBatchSampler`. In that case, ``attributions_shape`` is
+    the shape with the fewest features.
 
     A list of method names can be given using the ``methods`` argument. If
     ``methods`` is None, all methods in the attributions dictionary or file
@@ -140,6 +302,25 @@ class AttributionsDataset(IndexDataset):
     attributions can be aggregated over the channel dimension by setting
     ``aggregate_dim=0``. The resulting attributions will have shape
     ``[num_samples, 32, 32]``.
+
+    If attributions are given using a file or directory, the aggregation can
+    be computed once in advance using :func:`materialize_aggregation`.
+    If a materialized aggregation is found for the given
+    ``aggregate_method`` and ``aggregate_dim``, it is read directly instead
+    of the full attributions, and no aggregation is done on read.
+
+    If the rankings of the attributions were stored using
+    :func:`store_rankings`, these can be read instead of the attribution
+    values by setting ``rankings=True``. The rankings have an integer dtype,
+    which maskers use directly instead of sorting the attributions.
+    This is only valid for metrics that depend solely on the order of the
+    attribution values: Deletion, Insertion and Minimal Subset without
+    segmentation. Infidelity, Sensitivity-n, Max-Sensitivity, IROF and
+    segmented masking raise a ValueError if they are given rankings.
+
+    When used with a DataLoader, a batch is read at once: the attributions
+    for each method are read using one slice per contiguous range of
+    sample indices, and each sample is read only once.
     """
 
     def __init__(
@@ -151,6 +332,8 @@ class AttributionsDataset(IndexDataset):
         methods: List[str] | None = None,
         aggregate_dim: int = 0,
         aggregate_method: str | None = None,
+        rankings: bool = False,
+        cache: SharedArrayCache | None = None,
     ):
         """
         Parameters
@@ -162,7 +345,8 @@ class AttributionsDataset(IndexDataset):
             A Tensor containing the labels for the samples.
             Only used if samples is a Tensor.
         path: str | None
-            Path to an HDF5 file containing the attributions.
+            Path to an HDF5 file containing the attributions, or to a
+            directory of memory-mapped or sharded attributions.
             If None, attributions must be given as a dictionary.
         attributions: Dict[str, torch.Tensor] | None
             A dictionary mapping attribution method names to Tensors containing
@@ -176,14 +360,30 @@ class AttributionsDataset(IndexDataset):
         aggregate_method: str | None
             If not None, aggregate the attributions using the given method.
             Must be one of "mean" or "max_abs" or None.
+        rankings: bool
+            If True, read the precomputed rankings of the attributions
+            instead of the attribution values. Requires a path, and cannot
+            be combined with aggregation.
+        cache: SharedArrayCache | None
+            If not None, attributions read from a HDF5 file are cached in
+            the given shared cache, so they can be re-used by other
+            processes and later metric runs.
         
         Raises
         ------
         ValueError
             If attributions is None and path is None, or if labels is None and
-            samples is a Tensor.
+            samples is a Tensor, or if rankings are requested but not
+            available.
         """
+        if rankings and (path is None or aggregate_method is not None):
+            raise ValueError(
+                "Rankings require a path and cannot be aggregated"
+            )
         self.path = path
+        self.rankings = rankings
+        self.cache = cache
+        self._bucket_index: _BucketIndex | None = None
 
         # If samples and labels are given as Tensors, wrap them in a Dataset
         self.samples_dataset: Dataset
@@ -197,7 +397,13 @@ class AttributionsDataset(IndexDataset):
             self.samples_dataset = samples
 
         # Handle attributions dict or file
-        self.attributions: Dict[str, torch.Tensor] | h5py.File | None = None
+        self.attributions: (
+            Dict[str, torch.Tensor]
+            | Dict[str, npt.NDArray]
+            | h5py.File
+            | _ShardedFile
+            | None
+        ) = None
         self.method_names: List[str]
         orig_attributions_shape: Tuple[int, ...]
         if attributions is not None:
@@ -216,15 +422,22 @@ class AttributionsDataset(IndexDataset):
                 self.method_names,
                 self.num_samples,
                 orig_attributions_shape,
-            ) = _parse_attributions_file(path, methods)
+            ) = _parse_attributions_file(path, methods, rankings)
 
         # Handle aggregation if necessary
         self.aggregate_fn = None
         self.aggregate_dim = aggregate_dim
+        self.aggregate_method = aggregate_method
         self.attributions_shape: Tuple[int, ...]
+        # Key of the materialized aggregation, if it exists
+        self.aggregation_key: str | None = None
         if aggregate_method is not None:
-            agg_fns = {"mean": _mean, "max_abs": _max_abs}
-            self.aggregate_fn = agg_fns[aggregate_method]
+            self.aggregate_fn = _AGGREGATE_FNS[aggregate_method]
+            key = _aggregation_key(aggregate_method, aggregate_dim)
+            if path is not None and _has_stored(
+                path, key, self.method_names
+            ):
+                self.aggregation_key = key
         if self.aggregate_fn is not None:
             # If we aggregate over some axis, drop the corresponding axis
             self.attributions_shape = (
@@ -233,28 +446,111 @@ class AttributionsDataset(IndexDataset):
             )
         else:
             self.attributions_shape = orig_attributions_shape
-        
+
     def _open_attributions_file(self):
-        self.attributions = h5py.File(self.path, "r")
+        assert self.path is not None
+        if _is_sharded(self.path, SHARDED_ATTRIBUTIONS):
+            self.attributions = _ShardedFile(self.path)
+        elif os.path.isdir(self.path):
+            directory = self.path
+            if self.aggregation_key is not None:
+                directory = os.path.join(self.path, self.aggregation_key)
+            elif self.rankings:
+                directory = os.path.join(self.path, RANKINGS)
+            self.attributions = {
+                method_name: _open_memmap(directory, method_name)
+                for method_name in self.method_names
+            }
+        else:
+            self.attributions = h5py.File(self.path, "r")
+            if self.attributions.attrs.get("layout") == BUCKETED:
+                self._bucket_index = _BucketIndex(self.attributions)
+
+    def _get_attributions(
+        self, method_name: str
+    ) -> (
+        h5py.Dataset
+        | torch.Tensor
+        | npt.NDArray
+        | _ShardedArray
+        | _BucketedArray
+    ):
+        # Returns the attributions for a method, aggregated if the
+        # aggregation is materialized, or the rankings if requested
+        if self.attributions is None:
+            self._open_attributions_file()
+        assert self.attributions is not None
+        if self._bucket_index is not None:
+            assert isinstance(self.attributions, h5py.File)
+            return _BucketedArray(
+                self.attributions, self._bucket_index, method_name
+            )
+        if isinstance(self.attributions, (h5py.File, _ShardedFile)):
+            if self.aggregation_key is not None:
+                return _check_is_dataset_or_tensor(
+                    self.attributions[f"{self.aggregation_key}/{method_name}"]
+                )
+            if self.rankings:
+                return _check_is_dataset_or_tensor(
+                    self.attributions[f"{RANKINGS}/{method_name}"]
+                )
+        return _check_is_dataset_or_tensor(self.attributions[method_name])
+
+    def _aggregate(self, attrs: torch.Tensor, dim: int) -> torch.Tensor:
+        # Aggregates attributions on read, unless this was done in advance
+        if self.aggregate_fn is None or self.aggregation_key is not None:
+            return attrs
+        return self.aggregate_fn(attrs, dim=dim)
 
     def __getitem__(
         self, index: int
     ) -> Tuple[int, torch.Tensor, torch.Tensor, torch.Tensor, str]:
-        if self.attributions is None:
-            self._open_attributions_file()
-        assert self.attributions is not None
         method_idx = index // self.num_samples
         method_name = self.method_names[method_idx]
         sample_idx = index % self.num_samples
         sample, label = self.samples_dataset[sample_idx]
-        dataset = _check_is_dataset_or_tensor(self.attributions[method_name])
-        attrs = dataset[sample_idx]
-        if not isinstance(attrs, torch.Tensor):
-            attrs = torch.tensor(attrs)
-        if self.aggregate_fn is not None:
-            attrs = self.aggregate_fn(attrs, dim=self.aggregate_dim)
+        attrs = _read_rows(
+            self._get_attributions(method_name), [sample_idx], self.cache
+        )[0]
+        attrs = self._aggregate(attrs, dim=self.aggregate_dim)
         return sample_idx, sample, label, attrs, method_name
 
+    def __getitems__(
+        self, indices: Sequence[int]
+    ) -> List[Tuple[int, torch.Tensor, torch.Tensor, torch.Tensor, str]]:
+        indices = np.asarray(indices, dtype=np.int64)
+        method_idxs = indices // self.num_samples
+        sample_idxs = indices % self.num_samples
+
+        # Read each sample once, even if it occurs for multiple methods
+        unique_samples, sample_inverse = np.unique(
+            sample_idxs, return_inverse=True
+        )
+        samples = _read_samples(self.samples_dataset, unique_samples.tolist())
+
+        # Read the attributions for each method in bulk
+        attrs: List[torch.Tensor] = [torch.empty(0)] * len(indices)
+        for method_idx in np.unique(method_idxs):
+            positions = np.flatnonzero(method_idxs == method_idx)
+            rows = _read_rows(
+                self._get_attributions(self.method_names[method_idx]),
+                sample_idxs[positions],
+                self.cache,
+            )
+            rows = self._aggregate(rows, dim=self.aggregate_dim + 1)
+            for position, row in zip(positions, rows):
+                attrs[position] = row
+
+        return [
+            (
+                int(sample_idxs[i]),
+                *samples[sample_inverse[i]],
+                attrs[i],
+                self.method_names[method_idxs[i]],
+            )
+            for i in range(len(indices))
+        ]
+
     def __len__(self):
         return self.num_samples * len(self.method_names)
 
@@ -268,24 +564,55 @@ class GroupedAttributionsDataset(IndexDataset):
         self.attributions_shape = dataset.attributions_shape
 
     def __getitem__(self, index):
-        if self.dataset.attributions is None:
-            self.dataset._open_attributions_file()
-            assert self.dataset.attributions is not None
         sample, label = self.dataset.samples_dataset[index]
         attrs: Dict[str, torch.Tensor] = {}
         for method_name in self.dataset.method_names:
-            dataset = _check_is_dataset_or_tensor(
-                self.dataset.attributions[method_name]
+            attrs[method_name] = self.dataset._aggregate(
+                _read_rows(
+                    self.dataset._get_attributions(method_name),
+                    [index],
+                    self.dataset.cache,
+                )[0],
+                dim=self.dataset.aggregate_dim,
             )
-            attrs[method_name] = dataset[index]
-            if not isinstance(attrs[method_name], torch.Tensor):
-                attrs[method_name] = torch.tensor(attrs[method_name])
-        if self.dataset.aggregate_fn is not None:
-            for method_name in self.dataset.method_names:
-                attrs[method_name] = self.dataset.aggregate_fn(
-                    attrs[method_name], dim=self.dataset.aggregate_dim
-                )
         return index, sample, label, attrs
 
+    def __getitems__(
+        self, indices: Sequence[int]
+    ) -> List[Tuple[int, torch.Tensor, torch.Tensor, Dict[str, torch.Tensor]]]:
+        samples = _read_samples(self.dataset.samples_dataset, indices)
+        method_rows: Dict[str, torch.Tensor] = {}
+        for method_name in self.dataset.method_names:
+            method_rows[method_name] = self.dataset._aggregate(
+                _read_rows(
+                    self.dataset._get_attributions(method_name),
+                    indices,
+                    self.dataset.cache,
+                ),
+                dim=self.dataset.aggregate_dim + 1,
+            )
+        return [
+            (
+                index,
+                sample,
+                label,
+                {
+                    method_name: rows[i]
+                    for method_name, rows in method_rows.items()
+                },
+            )
+            for i, (index, (sample, label)) in enumerate(zip(indices, samples))
+        ]
+
     def __len__(self):
         return self.dataset.num_samples
+
+
+def _check_attribution_values(dataset: AttributionsDataset, metric: str):
+    # Rankings only preserve the order of the attribution values, so they
+    # can't be used by metrics that use the values themselves
+    if dataset.rankings:
+        raise ValueError(
+            f"{metric} requires attribution values, but the attributions"
+            " dataset contains rankings. Use rankings=False."
+        )
@@ -1,20 +1,211 @@
-from typing import Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from .._typing import _check_is_dataset
+from .._bulk_read import _write_rows
 import h5py
 from numpy import typing as npt
+import numpy as np
+
+try:
+    import hdf5plugin
+except ImportError:  # Blosc compression is optional
+    hdf5plugin = None
 
 
 class AttributionsDatasetWriter:
-    def __init__(self, path: str, num_samples: int):
+    """Class to write attributions to a HDF5 file, which can be read using
+    :class:`AttributionsDataset`.
+
+    The way the attributions are stored can be configured using a storage
+    profile, consisting of the data type, the chunking and the compression
+    of the HDF5 datasets:
+
+    - ``chunking="sample"`` stores each sample in a separate chunk, which is
+      best for random access to single samples
+      (e.g. :class:`GroupedAttributionsDataset` with a shuffled sampler).
+    - ``chunking="batch"`` stores ``batch_size`` consecutive samples in a
+      chunk, which is best for reading batches of consecutive samples
+      (e.g. Deletion, Insertion and IROF, which read each method in order).
+    - If ``chunking`` is None, the datasets are stored contiguously,
+      unless compression is used, in which case h5py chooses the chunks.
+
+    The storage profile is recorded in the attributes of the file
+    (``storage_dtype``, ``chunking`` and ``compression``).
+
+    If a `buffer_size` is given, written rows are buffered in memory for
+    each method. When the buffer exceeds `buffer_size` bytes, the rows are
+    sorted and written as contiguous slices on a background thread.
+    Use :meth:`flush` to wait until all rows are written, and :meth:`close`
+    to flush and close the file.
+    """
+
+    COMPRESSIONS = ("gzip", "lzf", "blosc")
+    CHUNKINGS = ("sample", "batch")
+
+    def __init__(
+        self,
+        path: str,
+        num_samples: int,
+        dtype: npt.DTypeLike = np.float32,
+        chunking: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        compression: Optional[str] = None,
+        compression_opts: Optional[int] = None,
+        buffer_size: Optional[int] = None,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file.
+        num_samples : int
+            Number of samples for which attributions will be written.
+        dtype : npt.DTypeLike, optional
+            Data type used to store the attributions. Must be ``np.float32``
+            or ``np.float16``. Attributions stored as float16 are converted
+            to float32 when they are read. Defaults to ``np.float32``.
+        chunking : Optional[str], optional
+            Chunk layout of the datasets: ``"sample"``, ``"batch"`` or None.
+            Defaults to None.
+        batch_size : Optional[int], optional
+            Number of samples per chunk. Only used (and required) if
+            `chunking` is ``"batch"``. Defaults to None.
+        compression : Optional[str], optional
+            Compression filter: ``"gzip"``, ``"lzf"``, ``"blosc"`` or None.
+            ``"blosc"`` requires the ``hdf5plugin`` package.
+            Defaults to None.
+        compression_opts : Optional[int], optional
+            Compression level. Only used for ``"gzip"``. Defaults to None.
+        buffer_size : Optional[int], optional
+            Maximal number of bytes to buffer before writing to the file.
+            If None, rows are written immediately. Defaults to None.
+
+        Raises
+        ------
+        ValueError
+            If the storage profile is invalid, or if ``"blosc"``
+            compression is requested and ``hdf5plugin`` is not installed.
+        """
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported dtype: {self.dtype}")
+        if chunking is not None and chunking not in self.CHUNKINGS:
+            raise ValueError(
+                f"Invalid chunking: {chunking}."
+                f" Must be one of {self.CHUNKINGS} or None."
+            )
+        if chunking == "batch" and batch_size is None:
+            raise ValueError("batch_size must be given for batch chunking")
+        if compression is not None and compression not in self.COMPRESSIONS:
+            raise ValueError(
+                f"Invalid compression: {compression}."
+                f" Must be one of {self.COMPRESSIONS} or None."
+            )
+        if compression == "blosc" and hdf5plugin is None:
+            raise ValueError("Blosc compression requires hdf5plugin")
+        self.chunking = chunking
+        self.batch_size = batch_size
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.buffer_size = buffer_size
+        self._buffer: Dict[str, List[Tuple[npt.NDArray, npt.NDArray]]] = {}
+        self._buffered_bytes = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: Future | None = None
+        if self.buffer_size is not None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+
         self.path = path
         self.num_samples: int = num_samples
         self.sample_shape: Tuple[int, ...] | None = None
         self.file = h5py.File(self.path, "w")
         self.file.attrs["num_samples"] = self.num_samples
+        self.file.attrs["storage_dtype"] = self.dtype.name
+        self.file.attrs["chunking"] = str(self.chunking)
+        self.file.attrs["compression"] = str(self.compression)
+
+    def _chunk_shape(self) -> Tuple[int, ...] | None:
+        assert self.sample_shape is not None
+        if self.chunking == "sample":
+            return (1, *self.sample_shape)
+        if self.chunking == "batch":
+            assert self.batch_size is not None
+            return (
+                max(1, min(self.batch_size, self.num_samples)),
+                *self.sample_shape,
+            )
+        return None
+
+    def _create_dataset(self, method_name: str) -> h5py.Dataset:
+        assert self.sample_shape is not None
+        kwargs = {}
+        if self.compression == "blosc":
+            assert hdf5plugin is not None
+            kwargs.update(hdf5plugin.Blosc())
+        elif self.compression is not None:
+            kwargs["compression"] = self.compression
+            if self.compression == "gzip":
+                kwargs["compression_opts"] = self.compression_opts
+        return self.file.create_dataset(
+            method_name,
+            shape=(self.num_samples, *self.sample_shape),
+            dtype=self.dtype,
+            chunks=self._chunk_shape(),
+            **kwargs,
+        )
+
+    def _write_method(
+        self, method_name: str, indices: npt.NDArray, rows: npt.NDArray
+    ):
+        if method_name not in self.file.keys():
+            dataset = self._create_dataset(method_name)
+        else:
+            dataset = _check_is_dataset(self.file[method_name])
+        _write_rows(dataset, indices, rows)
+
+    def _write_buffer(
+        self, buffer: Dict[str, List[Tuple[npt.NDArray, npt.NDArray]]]
+    ):
+        for method_name, batches in buffer.items():
+            # Concatenation preserves the order in which rows were written,
+            # so later rows overwrite earlier rows for the same index
+            self._write_method(
+                method_name,
+                np.concatenate([indices for indices, _ in batches]),
+                np.concatenate([rows for _, rows in batches]),
+            )
+
+    def _wait(self):
+        # Waits for the pending background write, re-raising its errors
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def _submit_buffer(self):
+        assert self._executor is not None
+        buffer, self._buffer = self._buffer, {}
+        self._buffered_bytes = 0
+        # Only one buffer is written at a time, so at most two buffers
+        # are in memory
+        self._wait()
+        if len(buffer) > 0:
+            self._pending = self._executor.submit(self._write_buffer, buffer)
 
     def write(
         self, indices: npt.NDArray, attributions: npt.NDArray, method_name: str
     ):
+        """Writes the attributions of a batch of samples for a method.
+
+        Parameters
+        ----------
+        indices : npt.NDArray
+            Indices of the samples. Need not be sorted or contiguous.
+        attributions : npt.NDArray
+            Attributions for the samples.
+            Shape: ``[len(indices), *sample_shape]``
+        method_name : str
+            Name of the attribution method.
+        """
         if self.sample_shape is None:
             self.sample_shape = attributions.shape[1:]
             self.file.attrs["sample_shape"] = self.sample_shape
@@ -23,10 +214,42 @@ class AttributionsDatasetWriter:
                 f"Invalid sample shape. Expected: {self.sample_shape}, "
                 f"got: {attributions.shape[1:]}"
             )
-        if method_name not in self.file.keys():
-            dataset = self.file.create_dataset(
-                method_name, shape=(self.num_samples, *self.sample_shape)
+        if self.buffer_size is None:
+            self._write_method(
+                method_name, indices, attributions.astype(self.dtype)
             )
-        else:
-            dataset = _check_is_dataset(self.file[method_name])
-        dataset[indices, ...] = attributions
+            return
+        rows = attributions.astype(self.dtype, copy=True)
+        self._buffer.setdefault(method_name, []).append(
+            (np.array(indices, dtype=np.int64), rows)
+        )
+        self._buffered_bytes += rows.nbytes
+        if self._buffered_bytes >= self.buffer_size:
+            self._submit_buffer()
+
+    def flush(self):
+        """Writes all buffered rows to the file and waits until they are
+        written.
+        """
+        if self._executor is not None:
+            self._submit_buffer()
+            self._wait()
+        self.file.flush()
+
+    def close(self):
+        """Flushes all buffered rows and closes the file. The file is also
+        closed if writing the buffered rows fails, after which the error is
+        re-raised.
+        """
+        if not self.file.id.valid:
+            return
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self.file.close()
+
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.close()
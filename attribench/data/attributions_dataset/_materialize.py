@@ -0,0 +1,131 @@
+from .._typing import _check_is_dataset
+from .._bulk_read import _as_tensor
+from ..memmap_dataset._memmap_dataset import _load_manifest, _open_memmap
+from ..sharded_dataset._sharded_dataset import (
+    SHARDED_ATTRIBUTIONS,
+    _is_sharded,
+    _shard_paths,
+)
+from ._attributions_dataset import (
+    _AGGREGATE_FNS,
+    _aggregation_key,
+    _parse_attributions_file,
+)
+from typing import List, Optional
+from numpy import typing as npt
+import numpy as np
+import h5py
+import os
+
+
+def _aggregate_block(
+    block: npt.NDArray, aggregate_method: str, aggregate_dim: int
+) -> npt.NDArray:
+    aggregate_fn = _AGGREGATE_FNS[aggregate_method]
+    aggregated = aggregate_fn(_as_tensor(block), dim=aggregate_dim + 1)
+    return aggregated.numpy().astype(block.dtype)
+
+
+def materialize_aggregation(
+    path: str,
+    aggregate_method: str,
+    aggregate_dim: int = 0,
+    methods: Optional[List[str]] = None,
+    block_size: int = 1024,
+):
+    """Computes aggregated attributions once and stores them next to the
+    full attributions, in the same HDF5 file or memmap directory.
+    An :class:`AttributionsDataset` with the same `aggregate_method` and
+    `aggregate_dim` then reads the aggregated attributions directly, which
+    reduces the amount of data read by the size of the aggregated dimension.
+
+    Materialized aggregations are stored in the ``aggregated`` group
+    (HDF5) or subdirectory (memmap), under the name
+    ``<aggregate_method>_<aggregate_dim>``. Existing materialized
+    aggregations with the same name are overwritten.
+
+    Parameters
+    ----------
+    path : str
+        Path to the HDF5 file, memmap directory or sharded directory
+        containing the attributions. The shards of a sharded directory are
+        processed one by one.
+    aggregate_method : str
+        Aggregation method. Must be ``"mean"`` or ``"max_abs"``.
+    aggregate_dim : int, optional
+        Dimension to aggregate over, excluding the ``num_samples``
+        dimension. Defaults to 0.
+    methods : Optional[List[str]], optional
+        Methods for which to materialize the aggregation.
+        If None, all methods are used. Defaults to None.
+    block_size : int, optional
+        Number of samples to aggregate at once. Defaults to 1024.
+
+    Raises
+    ------
+    ValueError
+        If `aggregate_method` is invalid.
+    """
+    if aggregate_method not in _AGGREGATE_FNS:
+        raise ValueError(f"Invalid aggregate_method: {aggregate_method}")
+    if _is_sharded(path, SHARDED_ATTRIBUTIONS):
+        # Shards are processed independently
+        manifest = _load_manifest(path, SHARDED_ATTRIBUTIONS)
+        for shard_path in _shard_paths(path, manifest):
+            materialize_aggregation(
+                shard_path,
+                aggregate_method,
+                aggregate_dim,
+                methods,
+                block_size,
+            )
+        return
+    method_names, num_samples, _ = _parse_attributions_file(path, methods)
+    key = _aggregation_key(aggregate_method, aggregate_dim)
+
+    if os.path.isdir(path):
+        # Memmap directory: one .npy file per method in a subdirectory
+        _load_manifest(path, "attributions")
+        os.makedirs(os.path.join(path, key), exist_ok=True)
+        for method_name in method_names:
+            source = _open_memmap(path, method_name)
+            target = None
+            for start in range(0, num_samples, block_size):
+                block = _aggregate_block(
+                    source[start : start + block_size],
+                    aggregate_method,
+                    aggregate_dim,
+                )
+                if target is None:
+                    target = np.lib.format.open_memmap(
+                        os.path.join(path, key, f"{method_name}.npy"),
+                        mode="w+",
+                        dtype=block.dtype,
+                        shape=(num_samples, *block.shape[1:]),
+                    )
+                target[start : start + block_size] = block
+            if target is not None:
+                target.flush()
+                del target
+        return
+
+    with h5py.File(path, "a") as fp:
+        for method_name in method_names:
+            source = _check_is_dataset(fp[method_name])
+            name = f"{key}/{method_name}"
+            if name in fp:
+                del fp[name]
+            target = None
+            for start in range(0, num_samples, block_size):
+                block = _aggregate_block(
+                    source[start : start + block_size],
+                    aggregate_method,
+                    aggregate_dim,
+                )
+                if target is None:
+                    target = fp.create_dataset(
+                        name,
+                        shape=(num_samples, *block.shape[1:]),
+                        dtype=block.dtype,
+                    )
+                target[start : start + block_size] = block
@@ -0,0 +1,126 @@
+from .._typing import _check_is_dataset
+from .._bulk_read import _as_tensor
+from ..memmap_dataset._memmap_dataset import _load_manifest, _open_memmap
+from ..sharded_dataset._sharded_dataset import (
+    SHARDED_ATTRIBUTIONS,
+    _is_sharded,
+    _shard_paths,
+)
+from ._attributions_dataset import RANKINGS, _parse_attributions_file
+from typing import List, Optional
+from numpy import typing as npt
+import numpy as np
+import h5py
+import os
+
+
+def _rank_block(block: npt.NDArray, dtype: np.dtype) -> npt.NDArray:
+    # Sort the attributions in the same way as the maskers do, so the
+    # rankings reproduce the exact same order
+    flat_block = _as_tensor(block).numpy().reshape(block.shape[0], -1)
+    sorted_indices = flat_block.argsort()
+    ranks = np.empty(flat_block.shape, dtype=dtype)
+    np.put_along_axis(
+        ranks,
+        sorted_indices,
+        np.arange(flat_block.shape[1], dtype=dtype)[None, :],
+        axis=1,
+    )
+    return ranks.reshape(block.shape)
+
+
+def store_rankings(
+    path: str,
+    methods: Optional[List[str]] = None,
+    drop_values: bool = False,
+    block_size: int = 1024,
+):
+    """Computes the ranking of the features in each attribution map and
+    stores it next to the attributions, in the same HDF5 file or memmap
+    directory. The ranking of a feature is its position when the features
+    are sorted by increasing attribution value. Rankings are stored as
+    uint16 if there are at most 65536 features per sample, and as uint32
+    otherwise.
+
+    An :class:`AttributionsDataset` with ``rankings=True`` reads the
+    rankings instead of the attribution values, and the maskers use them
+    instead of sorting the attributions for every batch.
+
+    Rankings are stored in the ``rankings`` group (HDF5) or subdirectory
+    (memmap). Existing rankings are overwritten.
+
+    Parameters
+    ----------
+    path : str
+        Path to the HDF5 file, memmap directory or sharded directory
+        containing the attributions. The shards of a sharded directory are
+        processed one by one.
+    methods : Optional[List[str]], optional
+        Methods for which to store the rankings.
+        If None, all methods are used. Defaults to None.
+    drop_values : bool, optional
+        If True, the attribution values of the ranked methods are removed,
+        so they can only be read as rankings. This reduces the size of the
+        stored attributions by half or more, but the attributions can then
+        only be used for metrics that depend solely on the ranking
+        (Deletion, Insertion and Minimal Subset without segmentation).
+        Defaults to False.
+    block_size : int, optional
+        Number of samples to rank at once. Defaults to 1024.
+    """
+    if _is_sharded(path, SHARDED_ATTRIBUTIONS):
+        # Shards are processed independently
+        manifest = _load_manifest(path, SHARDED_ATTRIBUTIONS)
+        for shard_path in _shard_paths(path, manifest):
+            store_rankings(shard_path, methods, drop_values, block_size)
+        return
+    method_names, num_samples, shape = _parse_attributions_file(path, methods)
+    num_features = int(np.prod(shape))
+    dtype = np.dtype(np.uint16 if num_features <= 2**16 else np.uint32)
+
+    if os.path.isdir(path):
+        # Memmap directory: one .npy file per method in a subdirectory
+        _load_manifest(path, "attributions")
+        os.makedirs(os.path.join(path, RANKINGS), exist_ok=True)
+        for method_name in method_names:
+            source = _open_memmap(path, method_name)
+            target = np.lib.format.open_memmap(
+                os.path.join(path, RANKINGS, f"{method_name}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=(num_samples, *shape),
+            )
+            for start in range(0, num_samples, block_size):
+                target[start : start + block_size] = _rank_block(
+                    source[start : start + block_size], dtype
+                )
+            target.flush()
+            del source, target
+            if drop_values:
+                os.remove(os.path.join(path, f"{method_name}.npy"))
+        return
+
+    with h5py.File(path, "a") as fp:
+        for method_name in method_names:
+            source = _check_is_dataset(fp[method_name])
+            name = f"{RANKINGS}/{method_name}"
+            if name in fp:
+                del fp[name]
+            target = fp.create_dataset(
+                name, shape=(num_samples, *shape), dtype=dtype
+            )
+            for start in range(0, num_samples, block_size):
+                target[start : start + block_size] = _rank_block(
+                    source[start : start + block_size], dtype
+                )
+    if drop_values:
+        # HDF5 does not reclaim the space of deleted datasets,
+        # so the file is rewritten without the values
+        tmp_path = f"{path}.tmp"
+        with h5py.File(path, "r") as src, h5py.File(tmp_path, "w") as dst:
+            for key, value in src.attrs.items():
+                dst.attrs[key] = value
+            for key in src.keys():
+                if key not in method_names:
+                    src.copy(src[key], dst, name=key)
+        os.replace(tmp_path, path)
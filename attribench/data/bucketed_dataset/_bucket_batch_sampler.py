@@ -0,0 +1,70 @@
+from torch.utils.data import Sampler
+from typing import Iterator, List, Mapping, Sequence
+from numpy import typing as npt
+import numpy as np
+import math
+
+
+class BucketBatchSampler(Sampler[List[int]]):
+    """Batch sampler that only puts samples from the same bucket (i.e. with
+    the same shape) in a batch. Can be passed to a ``DataLoader`` using the
+    ``batch_sampler`` argument.
+
+    The batches contain global sample indices, so results can be stored by
+    sample index as usual. To iterate over an :class:`AttributionsDataset`,
+    which contains each sample once for every method, use
+    ``offsets=[i * num_samples for i in range(num_methods)]``.
+    """
+
+    def __init__(
+        self,
+        buckets: Mapping[str, npt.ArrayLike],
+        batch_size: int,
+        shuffle: bool = False,
+        offsets: Sequence[int] = (0,),
+    ):
+        """
+        Parameters
+        ----------
+        buckets : Mapping[str, npt.ArrayLike]
+            Global indices of the samples in each bucket, e.g.
+            :attr:`BucketedDataset.buckets`.
+        batch_size : int
+            Maximal number of samples per batch.
+        shuffle : bool, optional
+            If True, the samples in each bucket and the order of the batches
+            are shuffled. Defaults to False.
+        offsets : Sequence[int], optional
+            The batches are repeated for each offset, with the offset added
+            to the indices. Defaults to ``(0,)``.
+        """
+        super().__init__(None)
+        self.buckets = {
+            name: np.asarray(indices, dtype=np.int64)
+            for name, indices in buckets.items()
+        }
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.offsets = list(offsets)
+        self.rng = np.random.default_rng()
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches: List[npt.NDArray] = []
+        for offset in self.offsets:
+            for indices in self.buckets.values():
+                if self.shuffle:
+                    indices = self.rng.permutation(indices)
+                for start in range(0, len(indices), self.batch_size):
+                    batches.append(
+                        indices[start : start + self.batch_size] + offset
+                    )
+        if self.shuffle:
+            batches = [batches[i] for i in self.rng.permutation(len(batches))]
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self) -> int:
+        return len(self.offsets) * sum(
+            math.ceil(len(indices) / self.batch_size)
+            for indices in self.buckets.values()
+        )
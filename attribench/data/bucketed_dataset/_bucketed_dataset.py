@@ -0,0 +1,167 @@
+from torch.utils.data import Dataset
+from .._typing import _check_is_dataset
+from typing import Dict, List, Sequence, Tuple
+from numpy import typing as npt
+import numpy as np
+import h5py
+
+# Value of the "layout" attribute of bucketed HDF5 files
+BUCKETED = "bucketed"
+# Group containing a subgroup for each bucket
+BUCKETS = "buckets"
+
+
+def _bucket_name(shape: Tuple[int, ...]) -> str:
+    return "x".join(str(size) for size in shape)
+
+
+def _is_bucketed(path: str) -> bool:
+    with h5py.File(path, "r") as fp:
+        return fp.attrs.get("layout") == BUCKETED
+
+
+class _BucketIndex:
+    """Maps the global index of each sample to its bucket and to its row in
+    that bucket. The global indices of the samples in each bucket are
+    stored in the ``indices`` dataset of the bucket.
+    """
+
+    def __init__(self, file: h5py.File):
+        num_samples = int(file.attrs["num_samples"])
+        buckets = file[BUCKETS]
+        assert isinstance(buckets, h5py.Group)
+        self.names: List[str] = list(buckets.keys())
+        self.indices: Dict[str, npt.NDArray] = {}
+        self.bucket_of = np.full(num_samples, -1, dtype=np.int64)
+        self.row_of = np.full(num_samples, -1, dtype=np.int64)
+        for bucket, name in enumerate(self.names):
+            indices = _check_is_dataset(buckets[f"{name}/indices"])[:]
+            self.indices[name] = indices
+            self.bucket_of[indices] = bucket
+            self.row_of[indices] = np.arange(len(indices))
+
+    def locate(
+        self, indices: npt.ArrayLike
+    ) -> Tuple[npt.NDArray, npt.NDArray]:
+        # Returns the bucket and the row in the bucket of each index
+        indices = np.asarray(indices, dtype=np.int64)
+        buckets = self.bucket_of[indices]
+        if np.any(buckets < 0):
+            raise ValueError("Some samples were not written")
+        return buckets, self.row_of[indices]
+
+
+def _read_bucket_rows(
+    dataset: h5py.Dataset, rows: npt.NDArray
+) -> npt.NDArray:
+    # HDF5 only supports increasing indices
+    unique, inverse = np.unique(rows, return_inverse=True)
+    return dataset[unique][inverse]
+
+
+class _BucketedArray:
+    """Read-only view on the attributions of a method in a bucketed HDF5
+    file. Rows are read by global sample index, and all rows that are read
+    at once must be in the same bucket.
+    """
+
+    def __init__(self, file: h5py.File, index: _BucketIndex, name: str):
+        self.file = file
+        self.index = index
+        self.name = name
+
+    def read_rows(self, indices: npt.ArrayLike) -> npt.NDArray:
+        buckets, rows = self.index.locate(indices)
+        if len(np.unique(buckets)) != 1:
+            raise ValueError(
+                "Samples of different shapes cannot be read at once."
+                " Use a BucketBatchSampler to batch samples by shape."
+            )
+        bucket = self.index.names[buckets[0]]
+        return _read_bucket_rows(
+            _check_is_dataset(self.file[f"{BUCKETS}/{bucket}/{self.name}"]),
+            rows,
+        )
+
+
+class BucketedDataset(Dataset):
+    """
+    Dataset of samples with different shapes, stored in a HDF5 file.
+    Samples are grouped into buckets by shape: each bucket is a group in
+    the file, containing the following datasets:
+
+    - ``samples: [bucket_size, *bucket_shape]``
+    - ``labels: [bucket_size]``
+    - ``indices: [bucket_size]``: global indices of the samples
+
+    Files of this form are written by :class:`BucketedDatasetWriter`.
+    Batches of samples must have the same shape, so the dataset must be
+    batched using a :class:`BucketBatchSampler`, e.g.
+    ``BucketBatchSampler(dataset.buckets, batch_size)``. The functional
+    metrics do this automatically.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file.
+        """
+        self.path = path
+        self.file: h5py.File | None = None
+        with h5py.File(path, "r") as fp:
+            if fp.attrs.get("layout") != BUCKETED:
+                raise ValueError(f"{path} is not a bucketed file")
+            self.num_samples = int(fp.attrs["num_samples"])
+            index = _BucketIndex(fp)
+            # Shape of the samples in each bucket
+            self.shapes: Dict[str, Tuple[int, ...]] = {}
+            for name in index.names:
+                samples = _check_is_dataset(fp[f"{BUCKETS}/{name}/samples"])
+                self.shapes[name] = samples.shape[1:]
+        self.index = index
+
+    @property
+    def buckets(self) -> Dict[str, npt.NDArray]:
+        """Global indices of the samples in each bucket."""
+        return self.index.indices
+
+    def _open(self):
+        self.file = h5py.File(self.path, "r")
+
+    def __getitem__(self, index):
+        if self.file is None:
+            self._open()
+            assert self.file is not None
+        buckets, rows = self.index.locate([index])
+        group = self.file[f"{BUCKETS}/{self.index.names[buckets[0]]}"]
+        return (
+            _check_is_dataset(group["samples"])[rows[0]],
+            _check_is_dataset(group["labels"])[rows[0]],
+        )
+
+    def __getitems__(self, indices: Sequence[int]) -> List[Tuple]:
+        """Reads a batch of samples at once, with one bulk read per bucket.
+        Used by the DataLoader to avoid reading the samples one by one.
+        """
+        if self.file is None:
+            self._open()
+            assert self.file is not None
+        buckets, rows = self.index.locate(indices)
+        result: List[Tuple] = [()] * len(buckets)
+        for bucket in np.unique(buckets):
+            positions = np.flatnonzero(buckets == bucket)
+            group = self.file[f"{BUCKETS}/{self.index.names[bucket]}"]
+            samples = _read_bucket_rows(
+                _check_is_dataset(group["samples"]), rows[positions]
+            )
+            labels = _read_bucket_rows(
+                _check_is_dataset(group["labels"]), rows[positions]
+            )
+            for position, sample, label in zip(positions, samples, labels):
+                result[position] = (sample, label)
+        return result
+
+    def __len__(self):
+        return self.num_samples
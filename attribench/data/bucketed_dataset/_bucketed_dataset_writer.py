@@ -0,0 +1,185 @@
+from typing import Dict, List, Mapping, Sequence
+from .._typing import _check_is_dataset
+from .._bulk_read import _write_rows
+from ._bucketed_dataset import BUCKETED, BUCKETS, _BucketIndex, _bucket_name
+import h5py
+from numpy import typing as npt
+import numpy as np
+
+
+class BucketedDatasetWriter:
+    """Class to write samples with different shapes to a HDF5 file, which
+    can be read using :class:`BucketedDataset`.
+
+    Samples are grouped into buckets by shape. Each sample gets a global
+    index in the order in which the samples are written, which is stored
+    next to the sample in its bucket.
+    """
+
+    def __init__(self, path: str, num_samples: int):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file.
+        num_samples : int
+            Number of samples that will be written.
+        """
+        self.path = path
+        self.num_samples = num_samples
+        self.head = 0
+        self.file = h5py.File(self.path, "x")
+        self.file.attrs["num_samples"] = self.num_samples
+        self.file.attrs["layout"] = BUCKETED
+        self.file.create_group(BUCKETS)
+
+    def _append(self, group: h5py.Group, name: str, rows: npt.NDArray):
+        if name not in group:
+            group.create_dataset(
+                name,
+                shape=(0, *rows.shape[1:]),
+                maxshape=(None, *rows.shape[1:]),
+                chunks=(1, *rows.shape[1:]),
+                dtype=rows.dtype,
+            )
+        dataset = _check_is_dataset(group[name])
+        start = dataset.shape[0]
+        dataset.resize(start + rows.shape[0], axis=0)
+        dataset[start:] = rows
+
+    def write(self, samples: Sequence[npt.NDArray], labels: npt.NDArray):
+        """Writes a batch of samples and labels to the file.
+
+        Parameters
+        ----------
+        samples : Sequence[npt.NDArray]
+            Samples to write. The samples can have different shapes.
+        labels : npt.NDArray
+            Labels of the samples.
+        """
+        if self.num_samples - self.head < len(samples):
+            raise ValueError("Data size exceeds pre-specified length")
+        if len(samples) != labels.shape[0]:
+            raise ValueError(
+                "Number of samples and number of labels do not match."
+            )
+        # Group the samples in the batch by shape
+        positions: Dict[str, List[int]] = {}
+        for position, sample in enumerate(samples):
+            positions.setdefault(_bucket_name(sample.shape), []).append(
+                position
+            )
+        for name, bucket_positions in positions.items():
+            group = self.file.require_group(f"{BUCKETS}/{name}")
+            bucket_samples = np.stack([samples[i] for i in bucket_positions])
+            self._append(group, "samples", bucket_samples.astype(np.float32))
+            self._append(
+                group, "labels", labels[bucket_positions].astype(np.int64)
+            )
+            self._append(
+                group,
+                "indices",
+                self.head + np.array(bucket_positions, dtype=np.int64),
+            )
+        self.head += len(samples)
+
+    def close(self):
+        """Closes the file."""
+        if self.file.id.valid:
+            self.file.close()
+
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.close()
+
+
+class BucketedAttributionsDatasetWriter:
+    """Class to write attributions for samples with different shapes to a
+    HDF5 file, which can be read using :class:`AttributionsDataset`.
+
+    The attributions are grouped into the same buckets as the samples
+    (see :class:`BucketedDataset`), and are written by global sample index.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        buckets: Mapping[str, npt.ArrayLike],
+        num_samples: int,
+        dtype: npt.DTypeLike = np.float32,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file.
+        buckets : Mapping[str, npt.ArrayLike]
+            Global indices of the samples in each bucket, e.g.
+            :attr:`BucketedDataset.buckets`.
+        num_samples : int
+            Total number of samples.
+        dtype : npt.DTypeLike, optional
+            Data type used to store the attributions. Must be ``np.float32``
+            or ``np.float16``. Defaults to ``np.float32``.
+        """
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported dtype: {self.dtype}")
+        self.path = path
+        self.num_samples = num_samples
+        self.file = h5py.File(self.path, "w")
+        self.file.attrs["num_samples"] = self.num_samples
+        self.file.attrs["layout"] = BUCKETED
+        self.file.attrs["storage_dtype"] = self.dtype.name
+        for name, indices in buckets.items():
+            self.file.create_dataset(
+                f"{BUCKETS}/{name}/indices",
+                data=np.asarray(indices, dtype=np.int64),
+            )
+        self.index = _BucketIndex(self.file)
+
+    def write(
+        self, indices: npt.NDArray, attributions: npt.NDArray, method_name: str
+    ):
+        """Writes the attributions of a batch of samples for a method.
+        The samples in the batch must have the same shape.
+
+        Parameters
+        ----------
+        indices : npt.NDArray
+            Global indices of the samples. Need not be sorted or contiguous.
+        attributions : npt.NDArray
+            Attributions for the samples.
+            Shape: ``[len(indices), *sample_shape]``
+        method_name : str
+            Name of the attribution method.
+        """
+        buckets, rows = self.index.locate(indices)
+        for bucket in np.unique(buckets):
+            positions = np.flatnonzero(buckets == bucket)
+            group = self.file[f"{BUCKETS}/{self.index.names[bucket]}"]
+            assert isinstance(group, h5py.Group)
+            if method_name not in group:
+                group.create_dataset(
+                    method_name,
+                    shape=(len(group["indices"]), *attributions.shape[1:]),
+                    dtype=self.dtype,
+                )
+            _write_rows(
+                _check_is_dataset(group[method_name]),
+                rows[positions],
+                attributions[positions].astype(self.dtype),
+            )
+
+    def flush(self):
+        """Flushes the file."""
+        self.file.flush()
+
+    def close(self):
+        """Closes the file."""
+        if self.file.id.valid:
+            self.file.close()
+
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.close()
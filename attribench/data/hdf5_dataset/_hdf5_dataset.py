@@ -1,7 +1,32 @@
 from torch.utils.data import Dataset
 from .._typing import _check_is_dataset
-from typing import Tuple
+from .._shared_cache import SharedArrayCache
+from typing import List, Optional, Sequence, Tuple
+from numpy import typing as npt
+import numpy as np
 import h5py
+import torch
+
+
+def _convert_samples(
+    samples: npt.NDArray,
+    sample_ndim: int,
+    scale: Optional[float] = None,
+    mean: Optional[npt.NDArray] = None,
+    std: Optional[npt.NDArray] = None,
+) -> npt.NDArray:
+    # Converts stored samples (a single sample or a batch) to normalized
+    # float32 samples
+    if scale is None and mean is None:
+        return samples
+    samples = samples.astype(np.float32)
+    if scale is not None and scale != 1.0:
+        samples *= np.float32(scale)
+    if mean is not None and std is not None:
+        channel_shape = (-1,) + (1,) * (sample_ndim - 1)
+        samples -= np.asarray(mean, dtype=np.float32).reshape(channel_shape)
+        samples /= np.asarray(std, dtype=np.float32).reshape(channel_shape)
+    return samples
 
 
 class HDF5Dataset(Dataset):
@@ -12,36 +37,165 @@ class HDF5Dataset(Dataset):
 
     - ``samples: [num_samples, *sample_shape]``
     - ``labels: [num_samples]``
+
+    If the samples are stored in a compact format (uint8 or float16,
+    see :class:`HDF5DatasetWriter`), the ``samples`` dataset has attributes
+    ``scale`` and optionally ``mean`` and ``std``. The samples are then
+    converted to normalized float32 samples when they are read.
+
+    The file can also contain the outputs of models on the samples.
+    These can be accessed using :class:`OutputCache`.
+
+    If the dataset fits in memory, it can be preloaded by setting
+    ``preload=True``. The samples and labels are then read once, in large
+    contiguous blocks, into Tensors in shared memory. DataLoader workers
+    and distributed workers on the same node index these Tensors directly,
+    instead of opening the file and reading each sample separately.
     """
 
-    def __init__(self, path: str):
+    # Number of bytes read at once when preloading
+    PRELOAD_BLOCK_BYTES = 2**26
+
+    def __init__(
+        self,
+        path: str,
+        cache: Optional[SharedArrayCache] = None,
+        preload: bool = False,
+    ):
         """
         Parameters
         ----------
         path : str
             Path to the HDF5 file.
+        cache : Optional[SharedArrayCache], optional
+            If not None, samples and labels are cached in the given shared
+            cache, so they can be re-used by other processes and later
+            metric runs. Defaults to None.
+        preload : bool, optional
+            If True, the samples and labels are read into shared memory
+            when the dataset is created. The samples are kept in the
+            storage format and converted when they are read.
+            Defaults to False.
+
+        Raises
+        ------
+        ValueError
+            If both `cache` and `preload` are given.
         """
+        if cache is not None and preload:
+            raise ValueError("A cache cannot be used with preload=True")
         self.path = path
+        self.cache = cache
         self.file: h5py.File | None = None
         self._sample_shape: Tuple | None = None
+        self._scale: float | None = None
+        self._mean: npt.NDArray | None = None
+        self._std: npt.NDArray | None = None
+        self._samples: torch.Tensor | None = None
+        self._labels: torch.Tensor | None = None
+        if preload:
+            self._preload()
+
+    def _preload(self):
+        self._open()
+        assert self.file is not None
+        tensors = []
+        for name in ("samples", "labels"):
+            dataset = _check_is_dataset(self.file[name])
+            # Read directly into shared memory, without intermediate copies
+            tensor = torch.from_numpy(
+                np.empty(dataset.shape, dtype=dataset.dtype)
+            ).share_memory_()
+            array = tensor.numpy()
+            row_bytes = dataset.dtype.itemsize * int(
+                np.prod(dataset.shape[1:])
+            )
+            block_size = max(1, self.PRELOAD_BLOCK_BYTES // max(1, row_bytes))
+            if dataset.chunks is not None:
+                # Read whole chunks at once
+                chunk_rows = dataset.chunks[0]
+                block_size = max(
+                    chunk_rows, block_size // chunk_rows * chunk_rows
+                )
+            for start in range(0, len(dataset), block_size):
+                stop = min(start + block_size, len(dataset))
+                dataset.read_direct(
+                    array, np.s_[start:stop], np.s_[start:stop]
+                )
+            tensors.append(tensor)
+        self._samples, self._labels = tensors
+        self.file.close()
+        self.file = None
+
+    def _open(self):
+        self.file = h5py.File(self.path, "r")
+        attrs = _check_is_dataset(self.file["samples"]).attrs
+        self._scale = attrs.get("scale", None)
+        self._mean = attrs.get("mean", None)
+        self._std = attrs.get("std", None)
+
+    def _convert(self, samples: npt.NDArray) -> npt.NDArray:
+        return _convert_samples(
+            samples, len(self.sample_shape), self._scale, self._mean, self._std
+        )
 
     @property
     def sample_shape(self):
+        if self._samples is not None:
+            return tuple(self._samples.shape[1:])
         if self.file is None:
             with h5py.File(self.path, "r") as fp:
                 return _check_is_dataset(fp["samples"]).shape[1:]
         return _check_is_dataset(self.file["samples"]).shape[1:]
 
+    def _read(self, name: str, indices: npt.NDArray) -> npt.NDArray:
+        assert self.file is not None
+        dataset = _check_is_dataset(self.file[name])
+        if self.cache is not None:
+            return self.cache.read_rows(dataset, indices)
+        # HDF5 only supports increasing indices
+        unique, inverse = np.unique(indices, return_inverse=True)
+        return dataset[unique][inverse]
+
     def __getitem__(self, index):
+        if self._samples is not None and self._labels is not None:
+            return (
+                self._convert(self._samples.numpy()[index]),
+                self._labels.numpy()[index],
+            )
         if self.file is None:
-            self.file = h5py.File(self.path, "r")
+            self._open()
+            assert self.file is not None
+        if self.cache is not None and isinstance(index, (int, np.integer)):
+            return (
+                self._convert(self._read("samples", np.array([index]))[0]),
+                self._read("labels", np.array([index]))[0],
+            )
         return (
-            _check_is_dataset(self.file["samples"])[index],
+            self._convert(_check_is_dataset(self.file["samples"])[index]),
             _check_is_dataset(self.file["labels"])[index],
         )
 
+    def __getitems__(self, indices: Sequence[int]) -> List[Tuple]:
+        """Reads a batch of samples at once. Used by the DataLoader to
+        avoid reading and converting the samples one by one.
+        """
+        if self._samples is not None and self._labels is not None:
+            indices = np.asarray(indices, dtype=np.int64)
+            samples = self._convert(self._samples.numpy()[indices])
+            return list(zip(samples, self._labels.numpy()[indices]))
+        if self.file is None:
+            self._open()
+            assert self.file is not None
+        indices = np.asarray(indices, dtype=np.int64)
+        samples = self._convert(self._read("samples", indices))
+        labels = self._read("labels", indices)
+        return list(zip(samples, labels))
+
     def __len__(self):
+        if self._samples is not None:
+            return len(self._samples)
         if self.file is None:
             with h5py.File(self.path, "r") as fp:
                 return len(_check_is_dataset(fp["samples"]))
-        return len(_check_is_dataset(self.file["samples"]))
\ No newline at end of file
+        return len(_check_is_dataset(self.file["samples"]))
@@ -1,5 +1,7 @@
-from typing import Tuple
+from typing import Tuple, Mapping, Optional, Sequence
 from .._typing import _check_is_dataset
+from ._output_cache import _write_outputs
+from ._hdf5_dataset import _convert_samples
 import h5py
 from numpy import typing as npt
 import numpy as np
@@ -10,30 +12,170 @@ class HDF5DatasetWriter:
     Note that this is not implemented in :class:`HDF5Dataset` because
     we want to avoid having the full dataset in memory. This object writes
     the dataset in chunks as they come in.
+
+    By default, samples are stored as float32. To reduce the size of the
+    file, samples can also be stored as uint8 or float16. In that case,
+    the samples are stored unnormalized, and :class:`HDF5Dataset` converts
+    them back to normalized float32 samples when they are read:
+    ``x = (raw * scale - mean) / std``, where ``scale`` is ``1 / 255`` for
+    uint8 and ``1`` otherwise, and ``mean`` and ``std`` are per-channel.
+    As this conversion is lossy, :meth:`round_trip` can be used to obtain
+    the samples exactly as they will be read from the file.
     """
 
-    def __init__(self, path: str, num_samples: int):
+    SUPPORTED_DTYPES = (np.uint8, np.float16, np.float32)
+
+    def __init__(
+        self,
+        path: str,
+        num_samples: int,
+        dtype: npt.DTypeLike = np.float32,
+        mean: Optional[Sequence[float]] = None,
+        std: Optional[Sequence[float]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file.
+        num_samples : int
+            Number of samples that will be written.
+        dtype : npt.DTypeLike, optional
+            Data type used to store the samples. Must be one of
+            ``np.uint8``, ``np.float16`` or ``np.float32``.
+            Defaults to ``np.float32``.
+        mean : Optional[Sequence[float]], optional
+            Per-channel mean used to normalize the samples when they are
+            read. If None, the samples are not normalized.
+            Defaults to None.
+        std : Optional[Sequence[float]], optional
+            Per-channel standard deviation used to normalize the samples
+            when they are read. Must be given if `mean` is given.
+            Defaults to None.
+
+        Raises
+        ------
+        ValueError
+            If `dtype` is not supported, or if only one of `mean` and `std`
+            is given.
+        """
+        self.file: h5py.File | None = None
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in self.SUPPORTED_DTYPES:
+            raise ValueError(
+                f"Unsupported dtype: {self.dtype}. Supported dtypes:"
+                f" {[np.dtype(d).name for d in self.SUPPORTED_DTYPES]}"
+            )
+        if (mean is None) != (std is None):
+            raise ValueError("mean and std must be given together.")
         self.path: str = path
         self.num_samples = num_samples
         self.head = 0
-
-        self.file: h5py.File | None = None
+        self.scale = (
+            1.0 / np.iinfo(self.dtype).max
+            if np.issubdtype(self.dtype, np.integer)
+            else 1.0
+        )
+        self.mean = (
+            np.asarray(mean, dtype=np.float32) if mean is not None else None
+        )
+        self.std = (
+            np.asarray(std, dtype=np.float32) if std is not None else None
+        )
         self.sample_shape: Tuple[int, ...] | None = None
 
     def init_file(self, sample_shape: Tuple[int, ...]):
         self.sample_shape = sample_shape
         with h5py.File(self.path, "x") as fp:
-            fp.create_dataset(
+            samples_dataset = fp.create_dataset(
                 "samples",
                 shape=(self.num_samples, *self.sample_shape),
-                dtype=np.float32,
+                dtype=self.dtype,
             )
             fp.create_dataset(
                 "labels", shape=(self.num_samples,), dtype=np.int64
             )
+            # Metadata needed to convert the stored samples on read
+            if self.dtype != np.float32:
+                samples_dataset.attrs["scale"] = self.scale
+            if self.mean is not None and self.std is not None:
+                samples_dataset.attrs["mean"] = self.mean
+                samples_dataset.attrs["std"] = self.std
             self.head = 0
 
-    def write(self, samples: npt.NDArray, labels: npt.NDArray):
+    def _to_storage(self, samples: npt.NDArray) -> npt.NDArray:
+        # Integer samples are assumed to be raw already. Other samples are
+        # assumed to be normalized, so the normalization is reverted.
+        if np.issubdtype(samples.dtype, np.integer):
+            return samples.astype(self.dtype)
+        samples = samples.astype(np.float32)
+        if self.mean is not None and self.std is not None:
+            channel_shape = (-1,) + (1,) * (samples.ndim - 2)
+            samples = samples * self.std.reshape(
+                channel_shape
+            ) + self.mean.reshape(channel_shape)
+        if np.issubdtype(self.dtype, np.integer):
+            info = np.iinfo(self.dtype)
+            samples = np.clip(
+                np.rint(samples / self.scale), info.min, info.max
+            )
+        return samples.astype(self.dtype)
+
+    def round_trip(self, samples: npt.NDArray) -> npt.NDArray:
+        """Returns the samples as they will be read from the file by
+        :class:`HDF5Dataset`, after being converted to the storage `dtype`
+        and back. The result only differs from `samples` if the storage is
+        lossy, e.g. for uint8 or float16 samples. This is useful to compute
+        model outputs that match the stored samples.
+
+        Parameters
+        ----------
+        samples : npt.NDArray
+            Samples in the same format as given to :meth:`write`.
+
+        Returns
+        -------
+        npt.NDArray
+            The samples as they will be read from the file.
+        """
+        if np.issubdtype(samples.dtype, np.integer) or (
+            self.dtype == np.float32 and self.mean is None
+        ):
+            return samples
+        return _convert_samples(
+            self._to_storage(samples),
+            samples.ndim - 1,
+            self.scale if self.dtype != np.float32 else None,
+            self.mean,
+            self.std,
+        )
+
+    def write(
+        self,
+        samples: npt.NDArray,
+        labels: npt.NDArray,
+        outputs: Optional[Mapping[str, npt.NDArray]] = None,
+    ):
+        """Writes a batch of samples and labels to the file.
+
+        Parameters
+        ----------
+        samples : npt.NDArray
+            Samples to write. Floating point samples are expected to be
+            normalized, i.e. as they would be given to the model.
+            Integer samples are expected to be raw, i.e. unnormalized and
+            unscaled, and are stored as-is.
+        labels : npt.NDArray
+            Labels of the samples.
+        outputs : Optional[Mapping[str, npt.NDArray]], optional
+            Outputs of models on the samples, keyed by model fingerprint.
+            These are stored in the :class:`OutputCache` of the file.
+            If the samples are stored as uint8 or float16, the outputs
+            should be computed on the samples as they are read from the
+            file, not on the original samples.
+            If outputs are given for a model, they must be given for all
+            batches. Defaults to None.
+        """
         if self.sample_shape is None:
             self.init_file(samples.shape[1:])
         if self.num_samples - self.head < samples.shape[0]:
@@ -47,6 +189,13 @@ class HDF5DatasetWriter:
                 f"Invalid sample shape. Expected: {self.sample_shape}, "
                 f"got: {samples.shape[1:]}"
             )
+        if outputs is not None and any(
+            model_outputs.shape[0] != samples.shape[0]
+            for model_outputs in outputs.values()
+        ):
+            raise ValueError(
+                "Number of samples and number of outputs do not match."
+            )
         if self.file is None:
             self.file = h5py.File(self.path, "a")
 
@@ -55,12 +204,26 @@ class HDF5DatasetWriter:
 
         samples_dataset[
             self.head : self.head + samples.shape[0], ...
-        ] = samples.astype(np.float32)
+        ] = self._to_storage(samples)
         labels_dataset[
             self.head : self.head + labels.shape[0]
         ] = labels.astype(np.int64)
+        if outputs is not None:
+            for fingerprint, model_outputs in outputs.items():
+                _write_outputs(
+                    self.file,
+                    self.num_samples,
+                    self.head,
+                    model_outputs,
+                    fingerprint,
+                )
         self.head += samples.shape[0]
 
-    def __del__(self):
+    def close(self):
+        """Closes the file."""
         if self.file is not None:
             self.file.close()
+            self.file = None
+
+    def __del__(self):
+        self.close()
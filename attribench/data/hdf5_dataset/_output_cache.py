@@ -0,0 +1,164 @@
+import hashlib
+from typing import List, Optional
+import h5py
+import numpy as np
+import torch
+from torch import nn
+from numpy import typing as npt
+from .._typing import _check_is_dataset
+
+
+def model_fingerprint(model: nn.Module) -> str:
+    """Computes a fingerprint of a model, based on its class and the names
+    and values of its parameters and buffers. Two models with the same
+    fingerprint produce the same output.
+
+    Parameters
+    ----------
+    model : nn.Module
+        The model to compute the fingerprint of.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-1 digest of the model.
+    """
+    digest = hashlib.sha1(type(model).__qualname__.encode())
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(str(tuple(tensor.shape)).encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+class CachedOutputs:
+    """Outputs of a single model on the samples of a :class:`HDF5Dataset`.
+    Created using :meth:`OutputCache.for_model`.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.file: h5py.File | None = None
+
+    def __getitem__(self, indices) -> torch.Tensor:
+        """Returns the outputs of the model for the given sample indices.
+
+        Parameters
+        ----------
+        indices : npt.ArrayLike
+            Indices of the samples.
+
+        Returns
+        -------
+        torch.Tensor
+            Output of the model. Shape: ``[len(indices), *output_shape]``
+        """
+        if self.file is None:
+            self.file = h5py.File(self.path, "r")
+        dataset = _check_is_dataset(
+            self.file[f"{OutputCache.GROUP}/{self.fingerprint}"]
+        )
+        indices = np.asarray(indices).reshape(-1)
+        # HDF5 only supports increasing indices, and reads contiguous
+        # ranges faster than lists of indices.
+        unique, inverse = np.unique(indices, return_inverse=True)
+        if len(unique) > 0 and unique[-1] - unique[0] + 1 == len(unique):
+            outputs = dataset[unique[0] : unique[-1] + 1]
+        else:
+            outputs = dataset[unique]
+        return torch.from_numpy(outputs[inverse])
+
+    def __del__(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class OutputCache:
+    """Cache of the outputs of models on the samples of a
+    :class:`HDF5Dataset`.
+
+    The outputs are stored in the same HDF5 file as the samples,
+    in a group ``outputs`` that contains a dataset
+    ``[num_samples, *output_shape]`` for each model. The datasets are keyed
+    by the fingerprint of the model (see :func:`model_fingerprint`),
+    so outputs of a different model are never used.
+
+    The cache is filled by :func:`~attribench.functional.select_samples`
+    and :class:`~attribench.distributed.SelectSamples`, which compute the
+    outputs on the samples anyway. Metrics that need the output of the
+    model on the original samples accept an ``output_cache`` argument,
+    and skip the corresponding forward passes if the model is in the cache.
+    """
+
+    GROUP = "outputs"
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file containing the samples.
+        """
+        self.path = path
+
+    @property
+    def fingerprints(self) -> List[str]:
+        """Fingerprints of the models for which outputs are cached."""
+        with h5py.File(self.path, "r") as fp:
+            if OutputCache.GROUP not in fp:
+                return []
+            return list(fp[OutputCache.GROUP].keys())
+
+    def for_model(self, model: nn.Module) -> Optional[CachedOutputs]:
+        """Returns the cached outputs of the given model, or None if the
+        outputs of this model are not in the cache.
+
+        Parameters
+        ----------
+        model : nn.Module
+            The model to get the outputs of.
+
+        Returns
+        -------
+        Optional[CachedOutputs]
+            The cached outputs, indexable by sample index.
+        """
+        fingerprint = model_fingerprint(model)
+        if fingerprint not in self.fingerprints:
+            return None
+        return CachedOutputs(self.path, fingerprint)
+
+
+def _get_cached_output(
+    cached_outputs: Optional[CachedOutputs],
+    indices: torch.Tensor,
+    device: torch.device,
+) -> Optional[torch.Tensor]:
+    # Looks up the original output for a batch, if it is cached
+    if cached_outputs is None:
+        return None
+    return cached_outputs[indices.cpu().numpy()].to(device)
+
+
+def _write_outputs(
+    file: h5py.File,
+    num_samples: int,
+    head: int,
+    outputs: npt.NDArray,
+    fingerprint: str,
+):
+    # Writes outputs of a model at the given position in the file
+    group = file.require_group(OutputCache.GROUP)
+    if fingerprint not in group:
+        if head != 0:
+            raise ValueError(
+                "Outputs must be written along with the first samples."
+            )
+        group.create_dataset(
+            fingerprint,
+            shape=(num_samples, *outputs.shape[1:]),
+            dtype=np.float32,
+        )
+    dataset = _check_is_dataset(group[fingerprint])
+    dataset[head : head + outputs.shape[0], ...] = outputs.astype(np.float32)
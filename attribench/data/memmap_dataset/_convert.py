@@ -0,0 +1,148 @@
+from .._typing import _check_is_dataset
+from ..attributions_dataset._attributions_dataset_writer import (
+    AttributionsDatasetWriter,
+)
+from ._memmap_dataset import MANIFEST
+from typing import Any, Dict
+import numpy as np
+import h5py
+import os
+import yaml
+
+
+def _copy_to_npy(dataset: h5py.Dataset, path: str, block_size: int):
+    array = np.lib.format.open_memmap(
+        path, mode="w+", dtype=dataset.dtype, shape=dataset.shape
+    )
+    for start in range(0, dataset.shape[0], block_size):
+        array[start : start + block_size] = dataset[start : start + block_size]
+    array.flush()
+    del array
+
+
+def hdf5_to_memmap(hdf5_path: str, path: str, block_size: int = 1024):
+    """Converts a HDF5 file to a directory of memory-mapped ``.npy`` files.
+    The file can either contain samples and labels (as written by
+    :class:`HDF5DatasetWriter`) or attributions (as written by
+    :class:`AttributionsDatasetWriter`). The resulting directory can be
+    read using :class:`MemmapDataset` or :class:`AttributionsDataset`,
+    respectively.
+
+    The :class:`OutputCache` of a samples file is not converted.
+
+    Parameters
+    ----------
+    hdf5_path : str
+        Path to the HDF5 file.
+    path : str
+        Path to the directory to create.
+    block_size : int, optional
+        Number of rows to copy at once. Defaults to 1024.
+
+    Raises
+    ------
+    ValueError
+        If the HDF5 file contains neither samples nor attributions.
+    """
+    os.makedirs(path)
+    manifest: Dict[str, Any]
+    with h5py.File(hdf5_path, "r") as fp:
+        if "num_samples" in fp.attrs and "indices" not in fp:
+            # Attributions file: one dataset per method
+            methods = [
+                name
+                for name in fp.keys()
+                if isinstance(fp[name], h5py.Dataset)
+            ]
+            if len(methods) == 0:
+                raise ValueError(f"{hdf5_path} contains no attributions")
+            for method_name in methods:
+                _copy_to_npy(
+                    _check_is_dataset(fp[method_name]),
+                    os.path.join(path, f"{method_name}.npy"),
+                    block_size,
+                )
+            first = _check_is_dataset(fp[methods[0]])
+            manifest = {
+                "layout": "attributions",
+                "num_samples": int(fp.attrs["num_samples"]),
+                "sample_shape": list(first.shape[1:]),
+                "methods": methods,
+                "dtype": first.dtype.name,
+            }
+        elif "samples" in fp and "labels" in fp:
+            samples = _check_is_dataset(fp["samples"])
+            for name in ("samples", "labels"):
+                _copy_to_npy(
+                    _check_is_dataset(fp[name]),
+                    os.path.join(path, f"{name}.npy"),
+                    block_size,
+                )
+            manifest = {
+                "layout": "samples",
+                "num_samples": samples.shape[0],
+                "sample_shape": list(samples.shape[1:]),
+                "dtype": samples.dtype.name,
+            }
+            for key in ("scale", "mean", "std"):
+                if key in samples.attrs:
+                    manifest[key] = np.asarray(samples.attrs[key]).tolist()
+        else:
+            raise ValueError(
+                f"{hdf5_path} contains neither samples nor attributions"
+            )
+    with open(os.path.join(path, MANIFEST), "w") as fp:
+        yaml.dump(manifest, fp)
+
+
+def memmap_to_hdf5(path: str, hdf5_path: str, block_size: int = 1024):
+    """Converts a directory of memory-mapped ``.npy`` files created by
+    :func:`hdf5_to_memmap` back to a HDF5 file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the directory.
+    hdf5_path : str
+        Path to the HDF5 file to create.
+    block_size : int, optional
+        Number of rows to copy at once. Defaults to 1024.
+
+    Raises
+    ------
+    ValueError
+        If the directory has an unknown layout.
+    """
+    with open(os.path.join(path, MANIFEST), "r") as fp:
+        manifest = yaml.safe_load(fp)
+    num_samples = manifest["num_samples"]
+    if manifest["layout"] == "attributions":
+        writer = AttributionsDatasetWriter(
+            hdf5_path, num_samples, dtype=manifest["dtype"]
+        )
+        for method_name in manifest["methods"]:
+            array = np.load(
+                os.path.join(path, f"{method_name}.npy"), mmap_mode="r"
+            )
+            for start in range(0, num_samples, block_size):
+                stop = min(start + block_size, num_samples)
+                writer.write(
+                    np.arange(start, stop), array[start:stop], method_name
+                )
+        writer.close()
+    elif manifest["layout"] == "samples":
+        with h5py.File(hdf5_path, "x") as fp:
+            for name in ("samples", "labels"):
+                array = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                dataset = fp.create_dataset(
+                    name, shape=array.shape, dtype=array.dtype
+                )
+                for start in range(0, array.shape[0], block_size):
+                    dataset[start : start + block_size] = array[
+                        start : start + block_size
+                    ]
+            for key in ("scale", "mean", "std"):
+                if key in manifest:
+                    fp["samples"].attrs[key] = manifest[key]
+    else:
+        raise ValueError(f"Unknown layout: {manifest['layout']}")
@@ -0,0 +1,95 @@
+from torch.utils.data import Dataset
+from ..hdf5_dataset._hdf5_dataset import _convert_samples
+from typing import Any, Dict, List, Sequence, Tuple
+from numpy import typing as npt
+import numpy as np
+import os
+import yaml
+
+MANIFEST = "metadata.yaml"
+
+
+def _load_manifest(path: str, layout: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST), "r") as fp:
+        manifest = yaml.safe_load(fp)
+    if manifest.get("layout") != layout:
+        raise ValueError(
+            f"Expected a directory with {layout} layout,"
+            f" but got {manifest.get('layout')}"
+        )
+    return manifest
+
+
+def _open_memmap(path: str, name: str) -> npt.NDArray:
+    # Copy-on-write mode: reads are zero-copy, and the arrays are writable
+    # (which torch.from_numpy requires) without modifying the file.
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="c")
+
+
+class MemmapDataset(Dataset):
+    """
+    Dataset stored as memory-mapped ``.npy`` files in a directory.
+    This is an alternative to :class:`HDF5Dataset`: reads are zero-copy
+    slices of the memory map, can be done from any number of processes
+    concurrently, and are served from the page cache on repeated passes.
+
+    The directory must contain the following files:
+
+    - ``samples.npy: [num_samples, *sample_shape]``
+    - ``labels.npy: [num_samples]``
+    - ``metadata.yaml``: manifest containing the layout (``samples``),
+      and optionally the ``scale``, ``mean`` and ``std`` used to convert
+      compactly stored samples (see :class:`HDF5DatasetWriter`).
+
+    Directories of this form can be created from a HDF5 file written by
+    :class:`HDF5DatasetWriter` using :func:`hdf5_to_memmap`.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the directory.
+        """
+        self.path = path
+        self.manifest = _load_manifest(path, "samples")
+        self.samples: npt.NDArray | None = None
+        self.labels: npt.NDArray | None = None
+
+    def _open(self):
+        self.samples = _open_memmap(self.path, "samples")
+        self.labels = _open_memmap(self.path, "labels")
+
+    def _convert(self, samples: npt.NDArray) -> npt.NDArray:
+        return _convert_samples(
+            samples,
+            len(self.sample_shape),
+            self.manifest.get("scale"),
+            self.manifest.get("mean"),
+            self.manifest.get("std"),
+        )
+
+    @property
+    def sample_shape(self) -> Tuple[int, ...]:
+        return tuple(self.manifest["sample_shape"])
+
+    def __getitem__(self, index):
+        if self.samples is None or self.labels is None:
+            self._open()
+            assert self.samples is not None and self.labels is not None
+        return self._convert(self.samples[index]), self.labels[index]
+
+    def __getitems__(self, indices: Sequence[int]) -> List[Tuple]:
+        """Reads a batch of samples at once. Used by the DataLoader to
+        avoid converting the samples one by one.
+        """
+        if self.samples is None or self.labels is None:
+            self._open()
+            assert self.samples is not None and self.labels is not None
+        indices = np.asarray(indices, dtype=np.int64)
+        samples = self._convert(self.samples[indices])
+        return list(zip(samples, self.labels[indices]))
+
+    def __len__(self):
+        return self.manifest["num_samples"]
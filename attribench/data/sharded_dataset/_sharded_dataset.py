@@ -0,0 +1,204 @@
+from torch.utils.data import Dataset
+from ..hdf5_dataset._hdf5_dataset import HDF5Dataset
+from ..memmap_dataset._memmap_dataset import MANIFEST, _load_manifest
+from .._typing import _check_is_dataset
+from typing import Any, Dict, List, Sequence, Tuple
+from numpy import typing as npt
+import numpy as np
+import h5py
+import os
+import yaml
+
+SHARDED_SAMPLES = "sharded_samples"
+SHARDED_ATTRIBUTIONS = "sharded_attributions"
+
+
+def _shard_ranges(num_samples: int, shard_size: int) -> List[Tuple[int, int]]:
+    # Splits the global indices into consecutive ranges of at most
+    # shard_size samples
+    if shard_size < 1:
+        raise ValueError(f"shard_size must be positive, got {shard_size}")
+    return [
+        (start, min(start + shard_size, num_samples))
+        for start in range(0, num_samples, shard_size)
+    ]
+
+
+def _shard_file(shard: int) -> str:
+    return f"shard-{shard:05d}.h5"
+
+
+def _write_manifest(
+    path: str, layout: str, num_samples: int, shard_size: int
+):
+    # All writers of a directory write the same manifest. It is written to
+    # a temporary file first, so readers never see a partial manifest.
+    manifest: Dict[str, Any] = {
+        "layout": layout,
+        "num_samples": num_samples,
+        "shard_size": shard_size,
+        "shards": [
+            {"file": _shard_file(shard), "start": start, "stop": stop}
+            for shard, (start, stop) in enumerate(
+                _shard_ranges(num_samples, shard_size)
+            )
+        ],
+    }
+    tmp_path = os.path.join(path, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as fp:
+        yaml.dump(manifest, fp)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+
+
+def _is_sharded(path: str, layout: str) -> bool:
+    if not os.path.isfile(os.path.join(path, MANIFEST)):
+        return False
+    with open(os.path.join(path, MANIFEST), "r") as fp:
+        return yaml.safe_load(fp).get("layout") == layout
+
+
+def _shard_paths(path: str, manifest: Dict[str, Any]) -> List[str]:
+    return [os.path.join(path, shard["file"]) for shard in manifest["shards"]]
+
+
+def _shard_starts(manifest: Dict[str, Any]) -> npt.NDArray:
+    return np.array(
+        [shard["start"] for shard in manifest["shards"]], dtype=np.int64
+    )
+
+
+class _ShardedArray:
+    """Array-like view on a dataset that is split over the shards.
+    Supports the ``shape`` and ``dtype`` attributes and reading slices of
+    rows, which is what :func:`_read_rows` needs.
+    """
+
+    def __init__(self, sharded_file: "_ShardedFile", key: str):
+        self.sharded_file = sharded_file
+        self.key = key
+
+    def _dataset(self, shard: int) -> h5py.Dataset:
+        return _check_is_dataset(self.sharded_file.shard(shard)[self.key])
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (self.sharded_file.num_samples, *self._dataset(0).shape[1:])
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._dataset(0).dtype
+
+    def __len__(self) -> int:
+        return self.sharded_file.num_samples
+
+    def __getitem__(self, index: slice) -> npt.NDArray:
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise ValueError("Sharded datasets only support reading slices")
+        start, stop, _ = index.indices(self.sharded_file.num_samples)
+        starts = self.sharded_file.starts
+        first = int(np.searchsorted(starts, start, side="right")) - 1
+        parts = []
+        for shard in range(max(first, 0), len(starts)):
+            if starts[shard] >= stop:
+                break
+            offset = starts[shard]
+            parts.append(
+                self._dataset(shard)[
+                    max(start, offset) - offset : stop - offset
+                ]
+            )
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 0:
+            return np.empty((0, *self.shape[1:]), dtype=self.dtype)
+        return np.concatenate(parts)
+
+
+class _ShardedFile:
+    """Read-only view on the shards of a sharded attributions directory.
+    Can be indexed like a HDF5 file, and opens each shard when it is first
+    read from.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        manifest = _load_manifest(path, SHARDED_ATTRIBUTIONS)
+        self.num_samples: int = manifest["num_samples"]
+        self.starts = _shard_starts(manifest)
+        self.paths = _shard_paths(path, manifest)
+        self.files: List[h5py.File | None] = [None] * len(self.paths)
+
+    def shard(self, shard: int) -> h5py.File:
+        file = self.files[shard]
+        if file is None:
+            file = h5py.File(self.paths[shard], "r")
+            self.files[shard] = file
+        return file
+
+    def __getitem__(self, key: str) -> _ShardedArray:
+        return _ShardedArray(self, key)
+
+    def close(self):
+        for file in self.files:
+            if file is not None:
+                file.close()
+        self.files = [None] * len(self.paths)
+
+
+class ShardedDataset(Dataset):
+    """
+    Dataset stored as a directory of HDF5 shards, as written by
+    :class:`ShardedDatasetWriter`.
+
+    Each shard is a HDF5 file in the format of :class:`HDF5Dataset`,
+    containing a consecutive range of samples. The directory contains a
+    manifest (``metadata.yaml``) that maps the global index ranges to the
+    shards. Shards are opened lazily, when a sample is first read from them,
+    so each DataLoader worker only opens the shards it reads from.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the directory.
+        """
+        self.path = path
+        self.manifest = _load_manifest(path, SHARDED_SAMPLES)
+        self.starts = _shard_starts(self.manifest)
+        # HDF5Dataset only opens its file when it is first read from
+        self.shards = [
+            HDF5Dataset(shard_path)
+            for shard_path in _shard_paths(path, self.manifest)
+        ]
+
+    @property
+    def sample_shape(self) -> Tuple[int, ...]:
+        return self.shards[0].sample_shape
+
+    def _locate(self, indices: npt.NDArray) -> Tuple[npt.NDArray, npt.NDArray]:
+        # Returns the shard of each index, and the index within that shard
+        shards = np.searchsorted(self.starts, indices, side="right") - 1
+        return shards, indices - self.starts[shards]
+
+    def __getitem__(self, index):
+        shards, local = self._locate(np.asarray([index], dtype=np.int64))
+        return self.shards[shards[0]][int(local[0])]
+
+    def __getitems__(self, indices: Sequence[int]) -> List[Tuple]:
+        """Reads a batch of samples at once, with one bulk read per shard.
+        Used by the DataLoader to avoid reading the samples one by one.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        shards, local = self._locate(indices)
+        result: List[Tuple] = [()] * len(indices)
+        for shard in np.unique(shards):
+            positions = np.flatnonzero(shards == shard)
+            rows = self.shards[shard].__getitems__(local[positions])
+            for position, row in zip(positions, rows):
+                result[position] = row
+        return result
+
+    def __len__(self):
+        return self.manifest["num_samples"]
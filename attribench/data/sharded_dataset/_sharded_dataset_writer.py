@@ -0,0 +1,275 @@
+from typing import Dict, List, Optional, Sequence
+from ..hdf5_dataset._hdf5_dataset_writer import HDF5DatasetWriter
+from ..attributions_dataset._attributions_dataset_writer import (
+    AttributionsDatasetWriter,
+)
+from ._sharded_dataset import (
+    SHARDED_ATTRIBUTIONS,
+    SHARDED_SAMPLES,
+    _shard_file,
+    _shard_ranges,
+    _write_manifest,
+)
+from numpy import typing as npt
+import numpy as np
+import os
+
+
+class ShardedDatasetWriter:
+    """Class to write a dataset to a directory of HDF5 shards, which can be
+    read using :class:`ShardedDataset`.
+
+    Samples are written in order. Each shard contains at most `shard_size`
+    consecutive samples, and is written using a :class:`HDF5DatasetWriter`,
+    so the same storage options are supported.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_samples: int,
+        shard_size: int,
+        dtype: npt.DTypeLike = np.float32,
+        mean: Optional[Sequence[float]] = None,
+        std: Optional[Sequence[float]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the directory. Created if it does not exist.
+        num_samples : int
+            Number of samples that will be written.
+        shard_size : int
+            Maximal number of samples per shard.
+        dtype : npt.DTypeLike, optional
+            Data type used to store the samples.
+            See :class:`HDF5DatasetWriter`. Defaults to ``np.float32``.
+        mean : Optional[Sequence[float]], optional
+            Per-channel mean used to normalize the samples when they are
+            read. See :class:`HDF5DatasetWriter`. Defaults to None.
+        std : Optional[Sequence[float]], optional
+            Per-channel standard deviation used to normalize the samples
+            when they are read. See :class:`HDF5DatasetWriter`.
+            Defaults to None.
+        """
+        self.path = path
+        self.num_samples = num_samples
+        self.ranges = _shard_ranges(num_samples, shard_size)
+        self.dtype = dtype
+        self.mean = mean
+        self.std = std
+        self.head = 0
+        self.writers: Dict[int, HDF5DatasetWriter] = {}
+        os.makedirs(path, exist_ok=True)
+        _write_manifest(path, SHARDED_SAMPLES, num_samples, shard_size)
+
+    def _writer(self, shard: int) -> HDF5DatasetWriter:
+        if shard not in self.writers:
+            start, stop = self.ranges[shard]
+            self.writers[shard] = HDF5DatasetWriter(
+                os.path.join(self.path, _shard_file(shard)),
+                stop - start,
+                self.dtype,
+                self.mean,
+                self.std,
+            )
+        return self.writers[shard]
+
+    def write(self, samples: npt.NDArray, labels: npt.NDArray):
+        """Writes a batch of samples and labels to the shards.
+
+        Parameters
+        ----------
+        samples : npt.NDArray
+            Samples to write. See :meth:`HDF5DatasetWriter.write`.
+        labels : npt.NDArray
+            Labels of the samples.
+        """
+        if self.num_samples - self.head < samples.shape[0]:
+            raise ValueError("Data size exceeds pre-specified length")
+        if samples.shape[0] != labels.shape[0]:
+            raise ValueError(
+                "Number of samples and number of labels do not match."
+            )
+        written = 0
+        while written < samples.shape[0]:
+            shard = next(
+                shard
+                for shard, (start, stop) in enumerate(self.ranges)
+                if start <= self.head < stop
+            )
+            count = min(
+                samples.shape[0] - written, self.ranges[shard][1] - self.head
+            )
+            self._writer(shard).write(
+                samples[written : written + count],
+                labels[written : written + count],
+            )
+            written += count
+            self.head += count
+            if self.head == self.ranges[shard][1]:
+                # The shard is complete, so its file can be closed
+                self.writers.pop(shard).close()
+
+    def close(self):
+        """Closes the shards that are still open."""
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+
+class ShardedAttributionsDatasetWriter:
+    """Class to write attributions to a directory of HDF5 shards, which can
+    be read using :class:`AttributionsDataset`.
+
+    Each shard contains the attributions of at most `shard_size`
+    consecutive samples for all methods, and is written using an
+    :class:`AttributionsDatasetWriter`, so the same storage profiles are
+    supported. The shards can be processed independently, e.g. by
+    :func:`materialize_aggregation` and :func:`store_rankings`.
+
+    Multiple writers can write to the same directory in parallel, as long
+    as each shard is written by a single writer. This is done by giving
+    each writer the shards it writes, using the `shards` argument.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_samples: int,
+        shard_size: int,
+        shards: Optional[Sequence[int]] = None,
+        dtype: npt.DTypeLike = np.float32,
+        chunking: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        compression: Optional[str] = None,
+        compression_opts: Optional[int] = None,
+        buffer_size: Optional[int] = None,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the directory. Created if it does not exist.
+        num_samples : int
+            Total number of samples for which attributions will be written.
+        shard_size : int
+            Maximal number of samples per shard.
+        shards : Optional[Sequence[int]], optional
+            Shards written by this writer. If None, all shards are written.
+            Defaults to None.
+        dtype : npt.DTypeLike, optional
+            See :class:`AttributionsDatasetWriter`.
+            Defaults to ``np.float32``.
+        chunking : Optional[str], optional
+            See :class:`AttributionsDatasetWriter`. Defaults to None.
+        batch_size : Optional[int], optional
+            See :class:`AttributionsDatasetWriter`. Defaults to None.
+        compression : Optional[str], optional
+            See :class:`AttributionsDatasetWriter`. Defaults to None.
+        compression_opts : Optional[int], optional
+            See :class:`AttributionsDatasetWriter`. Defaults to None.
+        buffer_size : Optional[int], optional
+            Maximal number of bytes to buffer per shard.
+            See :class:`AttributionsDatasetWriter`. Defaults to None.
+
+        Raises
+        ------
+        ValueError
+            If a shard in `shards` does not exist.
+        """
+        self.path = path
+        self.num_samples = num_samples
+        self.ranges = _shard_ranges(num_samples, shard_size)
+        self.shards: List[int] = (
+            list(shards)
+            if shards is not None
+            else list(range(len(self.ranges)))
+        )
+        if any(
+            shard < 0 or shard >= len(self.ranges) for shard in self.shards
+        ):
+            raise ValueError(
+                f"Invalid shards: {self.shards}."
+                f" There are {len(self.ranges)} shards."
+            )
+        self.starts = np.array(
+            [start for start, _ in self.ranges], dtype=np.int64
+        )
+        os.makedirs(path, exist_ok=True)
+        _write_manifest(path, SHARDED_ATTRIBUTIONS, num_samples, shard_size)
+        # The shard files are created immediately, so every shard exists
+        # once all writers are done
+        self.writers: Dict[int, AttributionsDatasetWriter] = {
+            shard: AttributionsDatasetWriter(
+                os.path.join(path, _shard_file(shard)),
+                self.ranges[shard][1] - self.ranges[shard][0],
+                dtype=dtype,
+                chunking=chunking,
+                batch_size=batch_size,
+                compression=compression,
+                compression_opts=compression_opts,
+                buffer_size=buffer_size,
+            )
+            for shard in self.shards
+        }
+
+    def shard_indices(self) -> npt.NDArray:
+        """Returns the global indices of the samples in the shards of this
+        writer, in increasing order.
+
+        Returns
+        -------
+        npt.NDArray
+            The indices of the samples.
+        """
+        return np.concatenate(
+            [np.arange(*self.ranges[shard]) for shard in self.shards]
+            + [np.empty(0, dtype=np.int64)]
+        )
+
+    def write(
+        self, indices: npt.NDArray, attributions: npt.NDArray, method_name: str
+    ):
+        """Writes the attributions of a batch of samples for a method.
+
+        Parameters
+        ----------
+        indices : npt.NDArray
+            Global indices of the samples. Need not be sorted or contiguous,
+            but must be in the shards of this writer.
+        attributions : npt.NDArray
+            Attributions for the samples.
+            Shape: ``[len(indices), *sample_shape]``
+        method_name : str
+            Name of the attribution method.
+
+        Raises
+        ------
+        ValueError
+            If an index is not in the shards of this writer.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        shards = np.searchsorted(self.starts, indices, side="right") - 1
+        for shard in np.unique(shards):
+            if shard not in self.writers:
+                raise ValueError(
+                    f"Shard {shard} is not written by this writer"
+                )
+            positions = np.flatnonzero(shards == shard)
+            self.writers[shard].write(
+                indices[positions] - self.starts[shard],
+                attributions[positions],
+                method_name,
+            )
+
+    def flush(self):
+        """Writes all buffered rows to the shards."""
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        """Flushes all buffered rows and closes the shards."""
+        for writer in self.writers.values():
+            writer.close()
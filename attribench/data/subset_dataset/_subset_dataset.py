@@ -0,0 +1,68 @@
+from torch.utils.data import Dataset
+from .._typing import _check_is_dataset
+from typing import Optional
+from numpy import typing as npt
+import h5py
+
+
+class SubsetDataset(Dataset):
+    """
+    Subset of a dataset, defined by indices stored in a HDF5 file.
+    The samples are read from the original dataset, so selecting samples
+    does not require a copy of the data.
+
+    The HDF5 file must contain the following datasets:
+
+    - ``indices: [num_samples]``: indices of the samples in the original
+      dataset
+    - ``labels: [num_samples]``
+
+    The file can also contain the outputs of models on the samples.
+    These can be accessed using :class:`OutputCache`.
+    Files of this form are written by :class:`SubsetDatasetWriter`.
+    """
+
+    def __init__(self, dataset: Dataset, path: str):
+        """
+        Parameters
+        ----------
+        dataset : Dataset
+            The original dataset. Must return ``(sample, label)`` tuples.
+        path : str
+            Path to the HDF5 file containing the indices.
+        """
+        self.dataset = dataset
+        self.path = path
+        self._indices: Optional[npt.NDArray] = None
+        self._labels: Optional[npt.NDArray] = None
+
+    def _load(self):
+        # Indices and labels are small, so they are kept in memory.
+        with h5py.File(self.path, "r") as fp:
+            num_samples = fp.attrs.get(
+                "num_samples", len(_check_is_dataset(fp["indices"]))
+            )
+            self._indices = _check_is_dataset(fp["indices"])[:num_samples]
+            self._labels = _check_is_dataset(fp["labels"])[:num_samples]
+
+    @property
+    def indices(self) -> npt.NDArray:
+        """Indices of the samples in the original dataset."""
+        if self._indices is None:
+            self._load()
+            assert self._indices is not None
+        return self._indices
+
+    @property
+    def sample_shape(self):
+        return self[0][0].shape
+
+    def __getitem__(self, index):
+        if self._labels is None:
+            self._load()
+            assert self._labels is not None
+        sample, _ = self.dataset[int(self.indices[index])]
+        return sample, self._labels[index]
+
+    def __len__(self):
+        return len(self.indices)
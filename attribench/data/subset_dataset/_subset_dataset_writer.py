@@ -0,0 +1,94 @@
+from typing import Mapping, Optional
+from .._typing import _check_is_dataset
+from ..hdf5_dataset._output_cache import _write_outputs
+import h5py
+from numpy import typing as npt
+import numpy as np
+
+
+class SubsetDatasetWriter:
+    """Class to write the indices of a subset of a dataset to a HDF5 file.
+    The file can be read using :class:`SubsetDataset`.
+    Only the indices and labels of the selected samples are stored, not
+    the samples themselves.
+    """
+
+    def __init__(self, path: str, num_samples: int):
+        self.path: str = path
+        self.num_samples = num_samples
+        self.head = 0
+
+        self.file: h5py.File | None = None
+
+    def init_file(self):
+        with h5py.File(self.path, "x") as fp:
+            fp.create_dataset(
+                "indices", shape=(self.num_samples,), dtype=np.int64
+            )
+            fp.create_dataset(
+                "labels", shape=(self.num_samples,), dtype=np.int64
+            )
+            fp.attrs["num_samples"] = 0
+        self.head = 0
+
+    def write(
+        self,
+        indices: npt.NDArray,
+        labels: npt.NDArray,
+        outputs: Optional[Mapping[str, npt.NDArray]] = None,
+    ):
+        """Writes the indices and labels of a batch of selected samples.
+
+        Parameters
+        ----------
+        indices : npt.NDArray
+            Indices of the samples in the original dataset.
+        labels : npt.NDArray
+            Labels of the samples.
+        outputs : Optional[Mapping[str, npt.NDArray]], optional
+            Outputs of models on the samples, keyed by model fingerprint.
+            These are stored in the :class:`OutputCache` of the file.
+            If outputs are given for a model, they must be given for all
+            batches. Defaults to None.
+        """
+        if self.file is None:
+            self.init_file()
+            self.file = h5py.File(self.path, "a")
+        if self.num_samples - self.head < indices.shape[0]:
+            raise ValueError("Data size exceeds pre-specified length")
+        if indices.shape[0] != labels.shape[0]:
+            raise ValueError(
+                "Number of indices and number of labels do not match."
+            )
+        if outputs is not None and any(
+            model_outputs.shape[0] != indices.shape[0]
+            for model_outputs in outputs.values()
+        ):
+            raise ValueError(
+                "Number of indices and number of outputs do not match."
+            )
+
+        indices_dataset = _check_is_dataset(self.file["indices"])
+        labels_dataset = _check_is_dataset(self.file["labels"])
+        indices_dataset[
+            self.head : self.head + indices.shape[0]
+        ] = indices.astype(np.int64)
+        labels_dataset[
+            self.head : self.head + labels.shape[0]
+        ] = labels.astype(np.int64)
+        if outputs is not None:
+            for fingerprint, model_outputs in outputs.items():
+                _write_outputs(
+                    self.file,
+                    self.num_samples,
+                    self.head,
+                    model_outputs,
+                    fingerprint,
+                )
+        self.head += indices.shape[0]
+        # The selection can end before num_samples samples are found
+        self.file.attrs["num_samples"] = self.head
+
+    def __del__(self):
+        if self.file is not None:
+            self.file.close()
@@ -5,17 +5,26 @@ from ._worker import Worker, WorkerConfig
 from attribench._model_factory import ModelFactory
 
 from attribench._method_factory import MethodFactory
-from attribench.data import AttributionsDatasetWriter, IndexDataset
+from attribench.data import (
+    AttributionsDatasetWriter,
+    IndexDataset,
+    ShardedAttributionsDatasetWriter,
+)
 from torch.utils.data import Dataset, DataLoader
-from typing import Tuple, Optional
+from typing import Any, Dict, Iterable, Tuple, Optional
+import math
 import torch
+import numpy as np
 from numpy import typing as npt
 from tqdm import tqdm
 
 
 class AttributionResult:
     def __init__(
-        self, indices: npt.NDArray, attributions: npt.NDArray, method_name: str
+        self,
+        indices: npt.NDArray,
+        attributions: Optional[npt.NDArray],
+        method_name: str,
     ):
         self.indices = indices
         self.attributions = attributions
@@ -30,20 +39,45 @@ class AttributionsWorker(Worker):
         method_factory: MethodFactory,
         dataset: IndexDataset,
         batch_size: int,
+        shard_writer_kwargs: Optional[Dict[str, Any]] = None,
     ):
         super().__init__(worker_config)
         self.batch_size = batch_size
         self.dataset = dataset
         self.method_factory = method_factory
         self.model_factory = model_factory
+        self.shard_writer_kwargs = shard_writer_kwargs
 
-    def work(self):
-        sampler = DistributedSampler(
-            self.dataset,
-            self.worker_config.world_size,
-            self.worker_config.rank,
-            shuffle=False,
+    def _create_shard_writer(self) -> ShardedAttributionsDatasetWriter:
+        # Each worker writes a contiguous block of shards
+        assert self.shard_writer_kwargs is not None
+        num_shards = math.ceil(
+            len(self.dataset) / self.shard_writer_kwargs["shard_size"]
         )
+        shards = np.array_split(
+            np.arange(num_shards), self.worker_config.world_size
+        )[self.worker_config.rank]
+        return ShardedAttributionsDatasetWriter(
+            num_samples=len(self.dataset),
+            shards=shards.tolist(),
+            **self.shard_writer_kwargs,
+        )
+
+    def work(self):
+        writer: ShardedAttributionsDatasetWriter | None = None
+        sampler: Iterable[int]
+        if self.shard_writer_kwargs is not None:
+            # Attributions are written to the shards of this worker
+            # directly, instead of being sent to the main process
+            writer = self._create_shard_writer()
+            sampler = writer.shard_indices().tolist()
+        else:
+            sampler = DistributedSampler(
+                self.dataset,
+                self.worker_config.world_size,
+                self.worker_config.rank,
+                shuffle=False,
+            )
         dataloader = DataLoader(
             self.dataset,
             sampler=sampler,
@@ -61,14 +95,22 @@ class AttributionsWorker(Worker):
             batch_y = batch_y.to(device)
             for method_name, method in method_dict.items():
                 attrs = method(batch_x, batch_y)
-                result = AttributionResult(
-                    batch_indices.detach().cpu().numpy(),
-                    attrs.detach().cpu().numpy(),
-                    method_name,
-                )
+                indices = batch_indices.detach().cpu().numpy()
+                if writer is not None:
+                    # Only the progress is sent to the main process
+                    writer.write(
+                        indices, attrs.detach().cpu().numpy(), method_name
+                    )
+                    result = AttributionResult(indices, None, method_name)
+                else:
+                    result = AttributionResult(
+                        indices, attrs.detach().cpu().numpy(), method_name
+                    )
                 self.worker_config.send_result(
                     PartialResultMessage(self.worker_config.rank, result)
                 )
+        if writer is not None:
+            writer.close()
 
 
 class ComputeAttributions(DistributedComputation):
@@ -125,23 +167,72 @@ class ComputeAttributions(DistributedComputation):
         self.batch_size = batch_size
         self.prog: tqdm | None = None
         self.writer: AttributionsDatasetWriter | None = None
+        self.shard_writer_kwargs: Dict[str, Any] | None = None
 
-    def run(self, path: str):
+    def run(
+        self,
+        path: str,
+        dtype: npt.DTypeLike = np.float32,
+        chunking: Optional[str] = None,
+        compression: Optional[str] = None,
+        buffer_size: Optional[int] = 2**28,
+        shard_size: Optional[int] = None,
+    ):
         """Run the computation.
 
         Parameters
         ----------
         path : str
-            Path to the HDF5 file to write the attributions to.
+            Path to the HDF5 file to write the attributions to, or to the
+            directory to write the shards to if `shard_size` is given.
+        dtype : npt.DTypeLike, optional
+            Data type used to store the attributions, by default
+            ``np.float32``.
+            See :class:`~attribench.data.AttributionsDatasetWriter`.
+        chunking : Optional[str], optional
+            Chunk layout of the attributions, by default None.
+            If ``"batch"``, chunks of `batch_size` samples are used.
+            See :class:`~attribench.data.AttributionsDatasetWriter`.
+        compression : Optional[str], optional
+            Compression filter to use, by default None.
+            See :class:`~attribench.data.AttributionsDatasetWriter`.
+        buffer_size : Optional[int], optional
+            Number of bytes of attributions to buffer in memory before
+            writing them to the file, by default 256 MiB. Buffered rows are
+            written as sorted, contiguous slices on a background thread.
+            If None, attributions are written as soon as they arrive.
+        shard_size : Optional[int], optional
+            If given, the attributions are written to a directory of shards
+            of at most `shard_size` samples, which can be read using
+            :class:`~attribench.data.AttributionsDataset`. Each subprocess
+            computes the attributions for a contiguous block of shards and
+            writes them itself, in parallel, instead of sending them to the
+            main process. By default None.
+            See :class:`~attribench.data.ShardedAttributionsDatasetWriter`.
         """
-        self.writer = AttributionsDatasetWriter(
-            path,
-            num_samples=len(self.dataset),
+        self.writer = None
+        self.shard_writer_kwargs = None
+        writer_kwargs: Dict[str, Any] = dict(
+            dtype=dtype,
+            chunking=chunking,
+            batch_size=self.batch_size,
+            compression=compression,
+            buffer_size=buffer_size,
         )
+        if shard_size is not None:
+            self.shard_writer_kwargs = dict(
+                path=path, shard_size=shard_size, **writer_kwargs
+            )
+        else:
+            self.writer = AttributionsDatasetWriter(
+                path, num_samples=len(self.dataset), **writer_kwargs
+            )
         self.prog = tqdm(total=len(self.dataset) * len(self.method_factory))
         super().run()
     
     def _cleanup(self):
+        if self.writer is not None:
+            self.writer.close()
         if self.prog is not None:
             self.prog.close()
 
@@ -154,15 +245,18 @@ class ComputeAttributions(DistributedComputation):
             self.method_factory,
             self.dataset,
             self.batch_size,
+            self.shard_writer_kwargs,
         )
 
     def _handle_result(
         self, result_message: PartialResultMessage[AttributionResult]
     ):
-        assert self.writer is not None
         indices = result_message.data.indices
         attributions = result_message.data.attributions
         method_name = result_message.data.method_name
-        self.writer.write(indices, attributions, method_name)
+        if attributions is not None:
+            # Otherwise, the attributions were written by the worker
+            assert self.writer is not None
+            self.writer.write(indices, attributions, method_name)
         if self.prog is not None:
             self.prog.update(len(indices))
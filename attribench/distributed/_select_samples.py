@@ -4,9 +4,18 @@ from ._message import PartialResultMessage
 from ._worker import Worker, WorkerConfig
 from attribench import ModelFactory
 from tqdm import tqdm
-from attribench.data import HDF5DatasetWriter
-from attribench.functional._select_samples import _select_samples_batch
-from typing import Callable, Tuple, Optional
+from attribench.data import (
+    HDF5DatasetWriter,
+    IndexDataset,
+    SubsetDatasetWriter,
+    model_fingerprint,
+)
+from attribench.functional._select_samples import (
+    _select_samples_batch,
+    _check_quotas,
+    _apply_quotas,
+)
+from typing import Callable, Dict, Mapping, Tuple, Optional, Union
 from torch.utils.data import Dataset, DataLoader
 import torch
 from numpy import typing as npt
@@ -15,9 +24,19 @@ from multiprocessing.synchronize import Event
 
 
 class SamplesResult:
-    def __init__(self, samples: npt.NDArray, labels: npt.NDArray):
+    def __init__(
+        self,
+        indices: npt.NDArray,
+        samples: Optional[npt.NDArray],
+        labels: npt.NDArray,
+        outputs: npt.NDArray,
+        fingerprint: str,
+    ):
+        self.indices = indices
         self.samples = samples
         self.labels = labels
+        self.outputs = outputs
+        self.fingerprint = fingerprint
 
 
 class SampleSelectionWorker(Worker):
@@ -28,12 +47,14 @@ class SampleSelectionWorker(Worker):
         batch_size: int,
         dataset: Dataset,
         model_factory: Callable[[], nn.Module],
+        store_indices: bool = False,
     ):
         super().__init__(worker_config)
         self.sufficient_samples = sufficient_samples
         self.model_factory = model_factory
-        self.dataset = dataset
+        self.dataset = IndexDataset(dataset)
         self.batch_size = batch_size
+        self.store_indices = store_indices
 
     def work(self):
         sampler = DistributedSampler(
@@ -51,14 +72,25 @@ class SampleSelectionWorker(Worker):
         device = torch.device(self.worker_config.rank)
         model = self.model_factory()
         model.to(device)
+        fingerprint = model_fingerprint(model)
         it = iter(dataloader)
 
-        for batch_x, batch_y in it:
-            correct_samples, correct_labels = _select_samples_batch(
-                batch_x, batch_y, model, device
+        for batch_indices, batch_x, batch_y in it:
+            (
+                correct_indices,
+                correct_samples,
+                correct_labels,
+                correct_output,
+            ) = _select_samples_batch(
+                batch_indices, batch_x, batch_y, model, device
             )
+            # Samples are not sent if only their indices are stored
             result = SamplesResult(
-                correct_samples.cpu().numpy(), correct_labels.cpu().numpy()
+                correct_indices.numpy(),
+                None if self.store_indices else correct_samples.cpu().numpy(),
+                correct_labels.cpu().numpy(),
+                correct_output.cpu().numpy(),
+                fingerprint,
             )
             self.worker_config.send_result(
                 PartialResultMessage(self.worker_config.rank, result)
@@ -77,6 +109,15 @@ class SelectSamples(DistributedComputation):
     If you want to select correctly classified samples and return them,
     rather than storing them to a HDF5 file, use
     :func:`attribench.functional.select_samples` instead.
+
+    The output of the model on the selected samples is also written to the
+    :class:`~attribench.data.OutputCache` of the HDF5 file, so metrics can
+    skip computing it again.
+
+    If `store_indices` is True, only the indices of the selected samples are
+    written, using a :class:`~attribench.data.SubsetDatasetWriter`. The
+    selected samples can then be read using a
+    :class:`~attribench.data.SubsetDataset` on top of `dataset`.
     """
 
     def __init__(
@@ -88,6 +129,8 @@ class SelectSamples(DistributedComputation):
         address: str = "localhost",
         port: str = "12355",
         devices: Optional[Tuple] = None,
+        store_indices: bool = False,
+        class_quotas: Optional[Mapping[int, int]] = None,
     ):
         """
         Parameters
@@ -97,8 +140,6 @@ class SelectSamples(DistributedComputation):
             Used to instantiate a model for each subprocess.
         dataset : Dataset
             Torch Dataset containing the samples and labels.
-        writer : HDF5DatasetWriter
-            Writer to write the samples and labels to.
         num_samples : int
             Number of correctly classified samples to select.
         batch_size : int
@@ -111,16 +152,36 @@ class SelectSamples(DistributedComputation):
         devices : Tuple, optional
             Devices to use. If None, then all available devices are used.
             By default None.
+        store_indices : bool, optional
+            If True, only the indices and labels of the selected samples are
+            written to the HDF5 file, instead of the samples themselves.
+            By default False.
+        class_quotas : Optional[Mapping[int, int]], optional
+            Maximal number of samples to select for each label. Samples with
+            labels that are not in `class_quotas` are not selected.
+            If None, samples are selected regardless of their label.
+            By default None.
+
+        Raises
+        ------
+        ValueError
+            If `num_samples` is larger than the sum of `class_quotas`.
         """
+        _check_quotas(num_samples, class_quotas)
         super().__init__(address, port, devices)
         self.model_factory = model_factory
         self.dataset = dataset
         self.num_samples = num_samples
         self.batch_size = batch_size
+        self.store_indices = store_indices
+        self.class_quotas = class_quotas
+        self.class_counts: Dict[int, int] = {}
         self.sufficient_samples = self.ctx.Event()
         self.count = 0
         self.prog: tqdm | None = None
-        self.writer: HDF5DatasetWriter | None = None
+        self.writer: Union[
+            HDF5DatasetWriter, SubsetDatasetWriter, None
+        ] = None
 
     def _create_worker(
         self, worker_config: WorkerConfig
@@ -131,6 +192,7 @@ class SelectSamples(DistributedComputation):
             self.batch_size,
             self.dataset,
             self.model_factory,
+            self.store_indices,
         )
 
     def run(self, path: str):
@@ -141,25 +203,38 @@ class SelectSamples(DistributedComputation):
         path : str
             Path to the HDF5 file to write the samples to.
         """
-        self.writer = HDF5DatasetWriter(path, self.num_samples)
+        if self.store_indices:
+            self.writer = SubsetDatasetWriter(path, self.num_samples)
+        else:
+            self.writer = HDF5DatasetWriter(path, self.num_samples)
         self.prog = tqdm(total=self.num_samples)
         super().run()
 
     def _handle_result(self, result: PartialResultMessage[SamplesResult]):
         assert self.writer is not None
-
-        # If too many samples, truncate
-        samples = result.data.samples
-        labels = result.data.labels
-        if self.count + samples.shape[0] > self.num_samples:
-            samples = samples[: self.num_samples - self.count]
-            labels = labels[: self.num_samples - self.count]
-            self.sufficient_samples.set()
+        if self.sufficient_samples.is_set():
+            return
+
+        # Only keep samples within the class quotas, truncate if too many
+        selected = _apply_quotas(
+            result.data.labels,
+            self.class_counts,
+            self.num_samples - self.count,
+            self.class_quotas,
+        )
+        labels = result.data.labels[selected]
+        outputs = {result.data.fingerprint: result.data.outputs[selected]}
 
         # Write to disk
-        self.writer.write(samples, labels)
+        if isinstance(self.writer, SubsetDatasetWriter):
+            self.writer.write(result.data.indices[selected], labels, outputs)
+        else:
+            assert result.data.samples is not None
+            self.writer.write(result.data.samples[selected], labels, outputs)
 
         # Update progress bar
-        self.count += samples.shape[0]
+        self.count += labels.shape[0]
         if self.prog is not None:
-            self.prog.update(samples.shape[0])
+            self.prog.update(labels.shape[0])
+        if self.count >= self.num_samples:
+            self.sufficient_samples.set()
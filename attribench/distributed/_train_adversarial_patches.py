@@ -8,7 +8,10 @@ from attribench.distributed._distributed_computation import (
 )
 from attribench.distributed._message import PartialResultMessage
 from attribench.distributed._worker import Worker, WorkerConfig
-from attribench.functional._train_adversarial_patches import _make_patch
+from attribench.functional._train_adversarial_patches import (
+    _make_patches,
+    _get_patch_labels,
+)
 from attribench import ModelFactory
 
 
@@ -31,56 +34,80 @@ class AdversarialPatchTrainingWorker(Worker):
         dataset: Dataset,
         model_factory: ModelFactory,
         labels: Optional[Tuple[int]] = None,
+        patches_per_pass: Optional[int] = None,
+        target_success_rate: Optional[float] = None,
     ):
         super().__init__(worker_config)
         # Create a list of patch labels.
-        # If the number of available labels is smaller than the number of
-        # patches, the labels are repeated.
-        if labels is None:
-            labels = tuple(range(total_num_patches))
-        num_repeats = total_num_patches // len(labels)
-        labels = labels * (num_repeats + 1)
+        labels = _get_patch_labels(total_num_patches, labels)
 
         # Each worker only trains a subset of the patches.
         rank = self.worker_config.rank
         world_size = self.worker_config.world_size
-        self.patch_labels = labels[
-            rank : total_num_patches : world_size
-        ]
+        self.patch_labels = labels[rank::world_size]
+        self.patches_per_pass = (
+            patches_per_pass
+            if patches_per_pass is not None
+            else max(len(self.patch_labels), 1)
+        )
         self.dataset = dataset
         self.model_factory = model_factory
         self.batch_size = batch_size
         self.path = path
+        self.target_success_rate = target_success_rate
 
     def work(self):
         device = torch.device(self.worker_config.rank)
         model = self.model_factory()
         model.to(device)
 
-        for patch_label in self.patch_labels:
-            # Train patch
-            patch, val_loss, percent_successful = _make_patch(
-                self.dataset, self.batch_size, model, patch_label, device
+        # Range of the data is computed during the first pass and re-used
+        data_min, data_max = None, None
+        for i in range(0, len(self.patch_labels), self.patches_per_pass):
+            # Train patches simultaneously
+            pass_labels = self.patch_labels[i : i + self.patches_per_pass]
+            patch_results, (data_min, data_max) = _make_patches(
+                self.dataset,
+                self.batch_size,
+                model,
+                pass_labels,
+                device,
+                data_min=data_min,
+                data_max=data_max,
+                target_success_rate=self.target_success_rate,
             )
 
-            # Save patch to disk
-            torch.save(
-                patch, os.path.join(self.path, f"patch_{patch_label}.pt")
-            )
+            for patch_label, (patch, val_loss, percent_successful) in zip(
+                pass_labels, patch_results
+            ):
+                # Save patch to disk
+                torch.save(
+                    patch, os.path.join(self.path, f"patch_{patch_label}.pt")
+                )
 
-            # Send message to main process
-            self.worker_config.send_result(
-                PartialResultMessage(
-                    self.worker_config.rank,
-                    PatchResult(patch_label, val_loss, percent_successful),
+                # Send message to main process
+                self.worker_config.send_result(
+                    PartialResultMessage(
+                        self.worker_config.rank,
+                        PatchResult(
+                            patch_label, val_loss, percent_successful
+                        ),
+                    )
                 )
-            )
 
 
 class TrainAdversarialPatches(DistributedComputation):
     """Train adversarial patches for a given model and dataset and save
     them to disk. The patches are trained in parallel on multiple
     processes. Each process trains a subset of the patches.
+
+    Within each process, patches for different labels are trained
+    simultaneously: each batch of data is replicated for each patch,
+    and all patches are optimized in the same forward and backward pass.
+
+    If `target_success_rate` is given, the patches are validated after each
+    epoch, and training of a patch stops early once its success rate
+    reaches `target_success_rate`.
     """
 
     def __init__(
@@ -94,6 +121,8 @@ class TrainAdversarialPatches(DistributedComputation):
         address: str = "localhost",
         port: str = "12355",
         devices: Optional[Tuple[int]] = None,
+        patches_per_pass: Optional[int] = None,
+        target_success_rate: Optional[float] = None,
     ):
         """
         Parameters
@@ -121,10 +150,22 @@ class TrainAdversarialPatches(DistributedComputation):
         devices : Optional[Tuple[int]], optional
             Devices to use. If None, then all available devices are used.
             By default None.
+        patches_per_pass : Optional[int], optional
+            Maximal number of patches to train simultaneously in each
+            subprocess. The effective batch size is
+            `batch_size * patches_per_pass`. If `None`, all patches of a
+            subprocess are trained simultaneously.
+            Default: `None`.
+        target_success_rate : Optional[float], optional
+            Success rate at which training of a patch is stopped.
+            If `None`, patches are trained for the full number of epochs.
+            Default: `None`.
         """
         super().__init__(address, port, devices)
         self.num_patches = num_patches
         self.labels = labels
+        self.patches_per_pass = patches_per_pass
+        self.target_success_rate = target_success_rate
         self.path = path
         self.prog = None
         self.model_factory = model_factory
@@ -142,6 +183,8 @@ class TrainAdversarialPatches(DistributedComputation):
             self.dataset,
             self.model_factory,
             self.labels,
+            self.patches_per_pass,
+            self.target_success_rate,
         )
 
     def _handle_result(self, result: PartialResultMessage[PatchResult]):
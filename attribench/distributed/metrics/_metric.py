@@ -6,6 +6,10 @@ from .._message import PartialResultMessage
 from .._distributed_computation import DistributedComputation
 from ._metric_worker import MetricWorker, WorkerConfig
 from attribench.result._metric_result import MetricResult
+from attribench.result._batch_result import BatchResult
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
 from typing import Tuple, Optional
 from attribench._model_factory import ModelFactory
 
@@ -83,7 +87,13 @@ class Metric(DistributedComputation):
         if self._result is not None:
             self._result.add(result_message.data)
         if self.prog is not None:
-            self.prog.update(len(result_message.data.indices))
+            num_done = len(result_message.data.indices)
+            if isinstance(
+                self.dataset, GroupedAttributionsDataset
+            ) and isinstance(result_message.data, BatchResult):
+                # Sample-major results contain a row for each method
+                num_done //= len(self.dataset.method_names)
+            self.prog.update(num_done)
 
     @property
     def result(self) -> MetricResult:
@@ -4,12 +4,16 @@ from .._worker import Worker, WorkerConfig
 from .._message import PartialResultMessage
 from attribench.result._batch_result import BatchResult
 from attribench.result._grouped_batch_result import GroupedBatchResult
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional
 from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
     AttributionsDataset,
 )
-from attribench.data import IndexDataset
+from attribench.data import IndexDataset, OutputCache
+from attribench.data.hdf5_dataset._output_cache import (
+    CachedOutputs,
+    _get_cached_output,
+)
 from torch import nn
 from torch.utils.data import DataLoader
 import torch
@@ -22,11 +26,14 @@ class MetricWorker(Worker):
         model_factory: Callable[[], nn.Module],
         dataset: IndexDataset,
         batch_size: int,
+        output_cache: Optional[OutputCache] = None,
     ):
         super().__init__(worker_config)
         self.batch_size = batch_size
         self.dataset = dataset
         self.model_factory = model_factory
+        self.output_cache = output_cache
+        self.cached_outputs: Optional[CachedOutputs] = None
 
         sampler = DistributedSampler(
             self.dataset,
@@ -50,8 +57,24 @@ class MetricWorker(Worker):
     def setup(self):
         self.model = self._get_model()
 
+    def _setup_output_cache(self):
+        # Must be called after setup, as it needs the model
+        if self.output_cache is not None:
+            self.cached_outputs = self.output_cache.for_model(self.model)
+
+    def _get_cached_output(
+        self, batch_indices: torch.Tensor
+    ) -> Optional[torch.Tensor]:
+        return _get_cached_output(
+            self.cached_outputs, batch_indices, self.device
+        )
+
     def work(self):
         self.setup()
+        self._setup_output_cache()
+        if isinstance(self.dataset, GroupedAttributionsDataset):
+            self._work_sample_major()
+            return
 
         for (
             batch_indices,
@@ -67,6 +90,7 @@ class MetricWorker(Worker):
                 batch_x,
                 batch_y,
                 batch_attr,
+                self._get_cached_output(batch_indices),
             )
             self.worker_config.send_result(
                 PartialResultMessage(
@@ -75,15 +99,65 @@ class MetricWorker(Worker):
                 )
             )
 
+    def _work_sample_major(self):
+        # The dataset yields the attributions of all methods for each
+        # batch of samples. Results are sent as a regular BatchResult.
+        for (
+            batch_indices,
+            batch_x,
+            batch_y,
+            batch_attr,
+        ) in self.dataloader:
+            batch_x = batch_x.to(self.device)
+            batch_y = batch_y.to(self.device)
+
+            method_results = self.process_grouped_batch(
+                batch_x,
+                batch_y,
+                batch_attr,
+                self._get_cached_output(batch_indices),
+            )
+            self.worker_config.send_result(
+                PartialResultMessage(
+                    self.worker_config.rank,
+                    BatchResult.from_method_dict(
+                        batch_indices, method_results
+                    ),
+                )
+            )
+
     @abstractmethod
     def process_batch(
         self,
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: torch.Tensor,
+        orig_output: Optional[torch.Tensor] = None,
     ):
+        """Computes the metric for a batch. `orig_output` is the output of
+        the model on the original samples, if it is cached.
+        """
         raise NotImplementedError
 
+    def process_grouped_batch(
+        self,
+        batch_x: torch.Tensor,
+        batch_y: torch.Tensor,
+        batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
+    ) -> Dict[str, Dict]:
+        """Computes the metric for a batch of samples and the attributions
+        of all methods for these samples. Subclasses can override this to
+        share work between the methods. By default, :meth:`process_batch`
+        is called for each method.
+        """
+        return {
+            method_name: self.process_batch(
+                batch_x, batch_y, method_attrs, orig_output
+            )
+            for method_name, method_attrs in batch_attr.items()
+        }
+
 
 class GroupedMetricWorker(MetricWorker):
     def __init__(
@@ -92,16 +166,19 @@ class GroupedMetricWorker(MetricWorker):
         model_factory: Callable[[], nn.Module],
         dataset: GroupedAttributionsDataset,
         batch_size: int,
+        output_cache: Optional[OutputCache] = None,
     ):
         super().__init__(
             worker_config,
             model_factory,
             dataset,
             batch_size,
+            output_cache,
         )
 
     def work(self):
         self.setup()
+        self._setup_output_cache()
 
         for (
             batch_indices,
@@ -116,6 +193,7 @@ class GroupedMetricWorker(MetricWorker):
                 batch_x,
                 batch_y,
                 batch_attr,
+                self._get_cached_output(batch_indices),
             )
             self.worker_config.send_result(
                 PartialResultMessage(
@@ -130,5 +208,6 @@ class GroupedMetricWorker(MetricWorker):
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
     ):
         raise NotImplementedError
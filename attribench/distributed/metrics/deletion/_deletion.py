@@ -4,7 +4,10 @@ from ._deletion_worker import DeletionWorker
 from ..._worker import WorkerConfig
 from attribench.result import DeletionResult
 from .._metric import Metric
-from attribench.data import AttributionsDataset
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
 from attribench import ModelFactory
 
 
@@ -46,6 +49,10 @@ class Deletion(Metric):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        tolerance: Optional[float] = None,
+        num_coarse_steps: int = 11,
+        sample_major: bool = False,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -85,11 +92,35 @@ class Deletion(Metric):
         devices : Optional[Tuple], optional
             Devices to use. If None, then all available devices are used.
             Default: None
+        tolerance : Optional[float], optional
+            If given, the curve is computed adaptively: a coarse grid of
+            `num_coarse_steps` steps is evaluated first, and intervals are
+            refined only where the output changes by more than `tolerance`.
+            If None, all `num_steps` steps are evaluated.
+            Default: None
+        num_coarse_steps : int, optional
+            Number of steps in the coarse grid.
+            Only used if `tolerance` is given.
+            Default: 11
+        sample_major : bool, optional
+            If True, the metric is computed for all methods on each batch of
+            samples before moving on to the next batch. Work that does not
+            depend on the attributions (loading the samples, the output of the
+            model on the original samples and the baselines of the maskers) is
+            then done once per batch instead of once per method.
+            Default: False
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, they are used for the
+            steps in which no features are masked.
+            Default: None
         """
         super().__init__(
             model_factory, attributions_dataset, batch_size, address, port, devices
         )
         self.num_steps = num_steps
+        self.tolerance = tolerance
+        self.num_coarse_steps = num_coarse_steps
         self.stop = stop
         self._start = start
         self.mode = mode
@@ -97,6 +128,7 @@ class Deletion(Metric):
             activation_fns = [activation_fns]
         self.activation_fns: List[str] = activation_fns
         self.maskers = maskers
+        self.output_cache = output_cache
         self._result = DeletionResult(
             attributions_dataset.method_names,
             list(maskers.keys()),
@@ -105,7 +137,11 @@ class Deletion(Metric):
             attributions_dataset.num_samples,
             num_steps,
         )
-        self.dataset = attributions_dataset
+        self.dataset = (
+            GroupedAttributionsDataset(attributions_dataset)
+            if sample_major
+            else attributions_dataset
+        )
 
     def _create_worker(self, worker_config: WorkerConfig) -> DeletionWorker:
         return DeletionWorker(
@@ -119,4 +155,7 @@ class Deletion(Metric):
             self._start,
             self.stop,
             self.num_steps,
+            self.tolerance,
+            self.num_coarse_steps,
+            self.output_cache,
         )
@@ -1,9 +1,15 @@
 import torch
 from .._metric_worker import MetricWorker, WorkerConfig
-from typing import Mapping, List
+from typing import Dict, Mapping, List, Optional, Union
 from attribench.masking import Masker
-from attribench.data import AttributionsDataset
-from attribench.functional.metrics.deletion._deletion import _deletion_batch
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
+from attribench.functional.metrics.deletion._deletion import (
+    _deletion_batch,
+    _deletion_grouped_batch,
+)
 from attribench._model_factory import ModelFactory
 
 
@@ -12,7 +18,7 @@ class DeletionWorker(MetricWorker):
         self,
         worker_config: WorkerConfig,
         model_factory: ModelFactory,
-        dataset: AttributionsDataset,
+        dataset: Union[AttributionsDataset, GroupedAttributionsDataset],
         batch_size: int,
         maskers: Mapping[str, Masker],
         activation_fns: List[str],
@@ -20,20 +26,28 @@ class DeletionWorker(MetricWorker):
         start: float = 0.0,
         stop: float = 1.0,
         num_steps: int = 100,
+        tolerance: Optional[float] = None,
+        num_coarse_steps: int = 11,
+        output_cache: Optional[OutputCache] = None,
     ):
-        super().__init__(worker_config, model_factory, dataset, batch_size)
+        super().__init__(
+            worker_config, model_factory, dataset, batch_size, output_cache
+        )
         self.maskers = maskers
         self.activation_fns = activation_fns
         self.mode = mode
         self.start = start
         self.stop = stop
         self.num_steps = num_steps
+        self.tolerance = tolerance
+        self.num_coarse_steps = num_coarse_steps
 
     def process_batch(
         self,
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: torch.Tensor,
+        orig_output: Optional[torch.Tensor] = None,
     ):
         return _deletion_batch(
             batch_x,
@@ -46,4 +60,30 @@ class DeletionWorker(MetricWorker):
             self.start,
             self.stop,
             self.num_steps,
-        )
\ No newline at end of file
+            self.tolerance,
+            self.num_coarse_steps,
+            orig_output,
+        )
+
+    def process_grouped_batch(
+        self,
+        batch_x: torch.Tensor,
+        batch_y: torch.Tensor,
+        batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
+    ):
+        return _deletion_grouped_batch(
+            batch_x,
+            batch_y,
+            self.model,
+            batch_attr,
+            self.maskers,
+            self.activation_fns,
+            self.mode,
+            self.start,
+            self.stop,
+            self.num_steps,
+            self.tolerance,
+            self.num_coarse_steps,
+            orig_output,
+        )
@@ -4,7 +4,7 @@ from ..._worker import WorkerConfig
 from attribench.result import ImpactCoverageResult
 from typing import Tuple, Optional
 from torch.utils.data import Dataset
-from attribench.data import IndexDataset
+from attribench.data import IndexDataset, OutputCache
 from attribench._method_factory import MethodFactory
 from attribench._model_factory import ModelFactory
 from ._impact_coverage_worker import ImpactCoverageWorker
@@ -46,6 +46,8 @@ class ImpactCoverage(Metric):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        num_candidates: int = 4,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -71,6 +73,13 @@ class ImpactCoverage(Metric):
         devices : Optional[Tuple], optional
             Devices to use. If None, then all available devices are used.
             By default None.
+        num_candidates : int, optional
+            Number of (patch, location) pairs to try for each sample in a
+            single forward pass, by default 4
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, the original predictions of the
+            model are not computed again, by default None
         """
         index_dataset = IndexDataset(samples_dataset)
         super().__init__(
@@ -83,6 +92,8 @@ class ImpactCoverage(Metric):
         )
         self.method_factory = method_factory
         self.patch_folder = patch_folder
+        self.num_candidates = num_candidates
+        self.output_cache = output_cache
         self._result = ImpactCoverageResult(
             method_factory.get_method_names(), len(index_dataset)
         )
@@ -97,4 +108,6 @@ class ImpactCoverage(Metric):
             self.batch_size,
             self.method_factory,
             self.patch_folder,
+            self.num_candidates,
+            self.output_cache,
         )
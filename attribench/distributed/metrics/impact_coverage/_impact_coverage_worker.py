@@ -1,15 +1,14 @@
-from attribench.data import IndexDataset
-from itertools import cycle
-import os
+from attribench.data import IndexDataset, OutputCache
 from ..._message import PartialResultMessage
 from .._metric_worker import MetricWorker, WorkerConfig
-from typing import Callable
+from typing import Callable, Optional
 from torch import nn
 
 from attribench.result._grouped_batch_result import GroupedBatchResult
 from attribench._method_factory import MethodFactory
 from attribench.functional.metrics._impact_coverage import (
     _impact_coverage_batch,
+    _PatchBank,
 )
 
 
@@ -22,28 +21,29 @@ class ImpactCoverageWorker(MetricWorker):
         batch_size: int,
         method_factory: MethodFactory,
         patch_folder: str,
+        num_candidates: int = 4,
+        output_cache: Optional[OutputCache] = None,
     ):
         super().__init__(
             worker_config,
             model_factory,
             dataset,
             batch_size,
+            output_cache,
         )
         self.patch_folder = patch_folder
         self.method_factory = method_factory
-        patch_names = [
-            filename
-            for filename in os.listdir(self.patch_folder)
-            if filename.endswith(".pt")
-        ]
-        self.patch_names_cycle = cycle(patch_names)
+        self.num_candidates = num_candidates
 
     def setup(self):
         self.model = self._get_model()
         self.method_dict = self.method_factory(self.model)
+        # Load all patches onto the device once
+        self.patch_bank = _PatchBank(self.patch_folder, self.device)
 
     def work(self):
         self.setup()
+        self._setup_output_cache()
 
         for batch_indices, batch_x, batch_y in self.dataloader:
             # Compute batch result
@@ -52,9 +52,10 @@ class ImpactCoverageWorker(MetricWorker):
                 self.method_dict,
                 batch_x,
                 batch_y,
-                self.patch_folder,
-                self.patch_names_cycle,
+                self.patch_bank,
                 self.device,
+                self.num_candidates,
+                orig_output=self._get_cached_output(batch_indices),
             )
             # Return batch result
             self.worker_config.send_result(
@@ -1,6 +1,11 @@
 from .._metric import Metric
 from typing import Dict, Tuple, Optional, List
-from attribench.data.attributions_dataset._attributions_dataset import GroupedAttributionsDataset, AttributionsDataset
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+    AttributionsDataset,
+    _check_attribution_values,
+)
+from attribench.data import OutputCache
 from ._infidelity_worker import InfidelityWorker
 from ..._worker import WorkerConfig
 from attribench.result import InfidelityResult
@@ -51,6 +56,9 @@ class Infidelity(Metric):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        tolerance: Optional[float] = None,
+        min_perturbations: int = 10,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -79,7 +87,23 @@ class Infidelity(Metric):
         devices : Optional[Tuple], optional
             Devices to use. If None, then all available devices are used.
             By default None.
+        tolerance : Optional[float], optional
+            Relative tolerance for adaptive early stopping. If given,
+            `num_perturbations` is the maximal number of perturbations and
+            a sample is no longer perturbed once the 95% confidence interval
+            of its mean squared error is tight enough.
+            If None, exactly `num_perturbations` perturbations are used.
+            By default None.
+        min_perturbations : int, optional
+            Minimal number of perturbations to use for each sample before
+            checking for convergence. Only used if `tolerance` is given.
+            By default 10.
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, the output of the model on the
+            original samples is not computed again. By default None.
         """
+        _check_attribution_values(attributions_dataset, "Infidelity")
         super().__init__(
             model_factory, attributions_dataset, batch_size, address, port, devices
         )
@@ -87,11 +111,15 @@ class Infidelity(Metric):
         self.activation_fns = activation_fns
         self.num_perturbations = num_perturbations
         self.perturbation_generators = perturbation_generators
+        self.tolerance = tolerance
+        self.min_perturbations = min_perturbations
+        self.output_cache = output_cache
         self._result = InfidelityResult(
             self.dataset.method_names,
             list(self.perturbation_generators.keys()),
             self.activation_fns,
             num_samples=self.dataset.num_samples,
+            adaptive=tolerance is not None,
         )
 
     def _create_worker(self, worker_config: WorkerConfig) -> InfidelityWorker:
@@ -103,4 +131,7 @@ class Infidelity(Metric):
             self.perturbation_generators,
             self.num_perturbations,
             self.activation_fns,
+            self.tolerance,
+            self.min_perturbations,
+            self.output_cache,
         )
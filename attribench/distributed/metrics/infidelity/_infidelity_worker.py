@@ -1,6 +1,7 @@
 import torch
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional
 from torch import nn
+from attribench.data import OutputCache
 from attribench.data.attributions_dataset._attributions_dataset import GroupedAttributionsDataset
 from .._metric_worker import GroupedMetricWorker, WorkerConfig
 from attribench.functional.metrics.infidelity._perturbation_generator import (
@@ -21,22 +22,29 @@ class InfidelityWorker(GroupedMetricWorker):
         perturbation_generators: Dict[str, PerturbationGenerator],
         num_perturbations: int,
         activation_fns: List[str],
+        tolerance: Optional[float] = None,
+        min_perturbations: int = 10,
+        output_cache: Optional[OutputCache] = None,
     ):
         super().__init__(
             worker_config,
             model_factory,
             dataset,
             batch_size,
+            output_cache,
         )
         self.activation_fns = activation_fns
         self.num_perturbations = num_perturbations
         self.perturbation_generators = perturbation_generators
+        self.tolerance = tolerance
+        self.min_perturbations = min_perturbations
 
     def process_batch(
         self,
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
     ):
         return _infidelity_batch(
             self.model,
@@ -47,4 +55,7 @@ class InfidelityWorker(GroupedMetricWorker):
             self.num_perturbations,
             self.activation_fns,
             self.device,
+            self.tolerance,
+            self.min_perturbations,
+            orig_output,
         )
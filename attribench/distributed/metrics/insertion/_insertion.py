@@ -1,7 +1,7 @@
 from ..deletion._deletion import Deletion
 from attribench._model_factory import ModelFactory
 from attribench.masking import Masker
-from attribench.data import AttributionsDataset
+from attribench.data import AttributionsDataset, OutputCache
 from attribench.result._insertion_result import InsertionResult
 from typing import Dict, List, Optional, Tuple, Union
 
@@ -54,6 +54,10 @@ class Insertion(Deletion):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        tolerance: Optional[float] = None,
+        num_coarse_steps: int = 11,
+        sample_major: bool = False,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -93,6 +97,28 @@ class Insertion(Deletion):
         devices : Optional[Tuple], optional
             Devices to use. If None, then all available devices are used.
             Default: None
+        tolerance : Optional[float], optional
+            If given, the curve is computed adaptively: a coarse grid of
+            `num_coarse_steps` steps is evaluated first, and intervals are
+            refined only where the output changes by more than `tolerance`.
+            If None, all `num_steps` steps are evaluated.
+            Default: None
+        num_coarse_steps : int, optional
+            Number of steps in the coarse grid.
+            Only used if `tolerance` is given.
+            Default: 11
+        sample_major : bool, optional
+            If True, the metric is computed for all methods on each batch of
+            samples before moving on to the next batch. Work that does not
+            depend on the attributions (loading the samples, the output of the
+            model on the original samples and the baselines of the maskers) is
+            then done once per batch instead of once per method.
+            Default: False
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, they are used for the
+            steps in which all features are revealed.
+            Default: None
         """
         super().__init__(
             model_factory,
@@ -107,6 +133,10 @@ class Insertion(Deletion):
             address,
             port,
             devices,
+            tolerance,
+            num_coarse_steps,
+            sample_major,
+            output_cache,
         )
         self._result = InsertionResult(
             attributions_dataset.method_names,
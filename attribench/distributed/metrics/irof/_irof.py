@@ -4,7 +4,10 @@ from attribench._model_factory import ModelFactory
 from ..._worker import Worker, WorkerConfig
 from ._irof_worker import IrofWorker
 from ..deletion._deletion import Deletion
-from attribench.data import AttributionsDataset
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.attributions_dataset._attributions_dataset import (
+    _check_attribution_values,
+)
 
 
 class Irof(Deletion):
@@ -46,6 +49,10 @@ class Irof(Deletion):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        tolerance: Optional[float] = None,
+        num_coarse_steps: int = 11,
+        sample_major: bool = False,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -85,7 +92,31 @@ class Irof(Deletion):
         devices : Optional[Tuple], optional
             Devices to use. If None, then all available devices are used.
             Default: None
+        tolerance : Optional[float], optional
+            If given, the curve is computed adaptively: a coarse grid of
+            `num_coarse_steps` steps is evaluated first, and intervals are
+            refined only where the output changes by more than `tolerance`.
+            If None, all `num_steps` steps are evaluated.
+            Default: None
+        num_coarse_steps : int, optional
+            Number of steps in the coarse grid.
+            Only used if `tolerance` is given.
+            Default: 11
+        sample_major : bool, optional
+            If True, the metric is computed for all methods on each batch of
+            samples before moving on to the next batch. Work that does not
+            depend on the attributions (loading and segmenting the samples,
+            the output of the model on the original samples and the baselines
+            of the maskers) is then done once per batch instead of once per
+            method.
+            Default: False
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, they are used for the
+            steps in which no segments are masked.
+            Default: None
         """
+        _check_attribution_values(attributions_dataset, "IROF")
         super().__init__(
             model_factory,
             attributions_dataset,
@@ -99,6 +130,10 @@ class Irof(Deletion):
             address,
             port,
             devices,
+            tolerance,
+            num_coarse_steps,
+            sample_major,
+            output_cache,
         )
         self.maskers = maskers
 
@@ -114,4 +149,7 @@ class Irof(Deletion):
             self._start,
             self.stop,
             self.num_steps,
+            self.tolerance,
+            self.num_coarse_steps,
+            self.output_cache,
         )
@@ -1,11 +1,17 @@
-from typing import List, Mapping
+from typing import Dict, List, Mapping, Optional, Union
 import torch
 from attribench.masking.image import ImageMasker
 from attribench._model_factory import ModelFactory
 from ..deletion._deletion_worker import DeletionWorker
 from .._metric_worker import WorkerConfig
-from attribench.data import AttributionsDataset
-from attribench.functional.metrics._irof import _irof_batch
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
+from attribench.functional.metrics._irof import (
+    _irof_batch,
+    _irof_grouped_batch,
+)
 
 
 class IrofWorker(DeletionWorker):
@@ -13,7 +19,7 @@ class IrofWorker(DeletionWorker):
         self,
         worker_config: WorkerConfig,
         model_factory: ModelFactory,
-        dataset: AttributionsDataset,
+        dataset: Union[AttributionsDataset, GroupedAttributionsDataset],
         batch_size: int,
         maskers: Mapping[str, ImageMasker],
         activation_fns: List[str],
@@ -21,6 +27,9 @@ class IrofWorker(DeletionWorker):
         start: float = 0,
         stop: float = 1,
         num_steps: int = 100,
+        tolerance: Optional[float] = None,
+        num_coarse_steps: int = 11,
+        output_cache: Optional[OutputCache] = None,
     ):
         super().__init__(
             worker_config,
@@ -33,6 +42,9 @@ class IrofWorker(DeletionWorker):
             start,
             stop,
             num_steps,
+            tolerance,
+            num_coarse_steps,
+            output_cache,
         )
         self.maskers = maskers
 
@@ -41,6 +53,7 @@ class IrofWorker(DeletionWorker):
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: torch.Tensor,
+        orig_output: Optional[torch.Tensor] = None,
     ):
         return _irof_batch(
             batch_x,
@@ -53,4 +66,30 @@ class IrofWorker(DeletionWorker):
             self.start,
             self.stop,
             self.num_steps,
+            self.tolerance,
+            self.num_coarse_steps,
+            orig_output=orig_output,
+        )
+
+    def process_grouped_batch(
+        self,
+        batch_x: torch.Tensor,
+        batch_y: torch.Tensor,
+        batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
+    ):
+        return _irof_grouped_batch(
+            batch_x,
+            batch_y,
+            self.model,
+            batch_attr,
+            self.maskers,
+            self.activation_fns,
+            self.mode,
+            self.start,
+            self.stop,
+            self.num_steps,
+            self.tolerance,
+            self.num_coarse_steps,
+            orig_output=orig_output,
         )
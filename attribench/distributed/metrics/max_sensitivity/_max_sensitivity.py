@@ -1,6 +1,7 @@
 from attribench.data.attributions_dataset._attributions_dataset import (
     AttributionsDataset,
-    GroupedAttributionsDataset
+    GroupedAttributionsDataset,
+    _check_attribution_values,
 )
 from .._metric_worker import MetricWorker
 from ..._worker import WorkerConfig
@@ -44,6 +45,8 @@ class MaxSensitivity(Metric):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        tolerance: Optional[float] = None,
+        patience: int = 5,
     ):
         """
         Parameters
@@ -71,7 +74,20 @@ class MaxSensitivity(Metric):
         devices : Optional[Tuple], optional
             Tuple of devices to use for multiprocessing.
             If `None`, all available devices are used.
+        tolerance : Optional[float], optional
+            Relative tolerance for adaptive early stopping. If given,
+            `num_perturbations` is the maximal number of perturbations and
+            a sample is no longer perturbed once its running maximum has
+            been stable for `patience` perturbations.
+            If None, exactly `num_perturbations` perturbations are used.
+            Default: None
+        patience : int, optional
+            Number of consecutive perturbations for which the running maximum
+            must be stable before a sample is stopped.
+            Only used if `tolerance` is given.
+            Default: 5
         """
+        _check_attribution_values(attributions_dataset, "Max-Sensitivity")
         super().__init__(
             model_factory,
             attributions_dataset,
@@ -83,9 +99,13 @@ class MaxSensitivity(Metric):
         self.method_factory = method_factory
         self.num_perturbations = num_perturbations
         self.radius = radius
+        self.tolerance = tolerance
+        self.patience = patience
         self.dataset = GroupedAttributionsDataset(attributions_dataset)
         self._result = MaxSensitivityResult(
-            method_factory.get_method_names(), num_samples=attributions_dataset.num_samples
+            method_factory.get_method_names(),
+            num_samples=attributions_dataset.num_samples,
+            adaptive=tolerance is not None,
         )
 
     def _create_worker(self, worker_config: WorkerConfig) -> MetricWorker:
@@ -97,4 +117,6 @@ class MaxSensitivity(Metric):
             self.method_factory,
             self.num_perturbations,
             self.radius,
+            self.tolerance,
+            self.patience,
         )
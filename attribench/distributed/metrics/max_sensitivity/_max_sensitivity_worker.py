@@ -3,7 +3,7 @@ from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
 )
 from .._metric_worker import GroupedMetricWorker, WorkerConfig
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional
 from torch import nn
 from attribench.functional.metrics._max_sensitivity import (
     _max_sensitivity_batch,
@@ -22,6 +22,8 @@ class MaxSensitivityWorker(GroupedMetricWorker):
         method_factory: MethodFactory,
         num_perturbations: int,
         radius: float,
+        tolerance: Optional[float] = None,
+        patience: int = 5,
     ):
         super().__init__(
             worker_config,
@@ -32,6 +34,8 @@ class MaxSensitivityWorker(GroupedMetricWorker):
         self.method_factory = method_factory
         self.num_perturbations = num_perturbations
         self.radius = radius
+        self.tolerance = tolerance
+        self.patience = patience
 
     def setup(self):
         self.model = self._get_model()
@@ -42,6 +46,7 @@ class MaxSensitivityWorker(GroupedMetricWorker):
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
     ):
         return _max_sensitivity_batch(
             batch_x,
@@ -51,4 +56,6 @@ class MaxSensitivityWorker(GroupedMetricWorker):
             self.num_perturbations,
             self.radius,
             self.device,
+            self.tolerance,
+            self.patience,
         )
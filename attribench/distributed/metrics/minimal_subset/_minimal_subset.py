@@ -4,7 +4,10 @@ from attribench.masking import Masker
 from ._minimal_subset_worker import MinimalSubsetWorker
 from attribench.result import MinimalSubsetResult
 from .._metric import Metric
-from attribench.data import AttributionsDataset
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
 from attribench._model_factory import ModelFactory
 
 
@@ -38,6 +41,8 @@ class MinimalSubset(Metric):
         address="localhost",
         port="12355",
         devices: Optional[Tuple] = None,
+        sample_major: bool = False,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -70,16 +75,32 @@ class MinimalSubset(Metric):
         ------
         ValueError
             If `mode` is not "deletion" or "insertion".
+        sample_major : bool, optional
+            If True, the metric is computed for all methods on each batch of
+            samples before moving on to the next batch. Work that does not
+            depend on the attributions (loading the samples, the original
+            predictions of the model and the baselines of the maskers) is
+            then done once per batch instead of once per method,
+            by default False.
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, they are used as the original
+            predictions, by default None.
         """
         super().__init__(
             model_factory, attributions_dataset, batch_size, address, port, devices
         )
-        self.dataset = attributions_dataset
+        self.dataset = (
+            GroupedAttributionsDataset(attributions_dataset)
+            if sample_major
+            else attributions_dataset
+        )
         self.num_steps = num_steps
         if mode not in ["deletion", "insertion"]:
             raise ValueError("Mode must be deletion or insertion. Got:", mode)
         self.mode = mode
         self.maskers = maskers
+        self.output_cache = output_cache
         self._result = MinimalSubsetResult(
             attributions_dataset.method_names,
             list(maskers.keys()),
@@ -98,4 +119,5 @@ class MinimalSubset(Metric):
             self.maskers,
             self.mode,
             self.num_steps,
+            self.output_cache,
         )
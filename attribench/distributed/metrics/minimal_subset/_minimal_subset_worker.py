@@ -2,29 +2,44 @@ from numpy import typing as npt
 import torch
 from .._metric_worker import MetricWorker
 from ..._worker import WorkerConfig
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional, Union
 
 from torch import nn
 
 from attribench.masking import Masker
-from attribench.data import AttributionsDataset
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
 from attribench.functional.metrics.minimal_subset._minimal_subset import (
     minimal_subset_batch,
+    minimal_subset_grouped_batch,
 )
 
 
+def _to_predictions(
+    orig_output: Optional[torch.Tensor],
+) -> Optional[torch.Tensor]:
+    if orig_output is None:
+        return None
+    return torch.argmax(orig_output, dim=1)
+
+
 class MinimalSubsetWorker(MetricWorker):
     def __init__(
         self,
         worker_config: WorkerConfig,
         model_factory: Callable[[], nn.Module],
-        dataset: AttributionsDataset,
+        dataset: Union[AttributionsDataset, GroupedAttributionsDataset],
         batch_size: int,
         maskers: Dict[str, Masker],
         mode: str,
         num_steps: int,
+        output_cache: Optional[OutputCache] = None,
     ):
-        super().__init__(worker_config, model_factory, dataset, batch_size)
+        super().__init__(
+            worker_config, model_factory, dataset, batch_size, output_cache
+        )
         self.maskers = maskers
         self.mode = mode
         self.num_steps = num_steps
@@ -34,6 +49,7 @@ class MinimalSubsetWorker(MetricWorker):
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: torch.Tensor,
+        orig_output: Optional[torch.Tensor] = None,
     ):
         return minimal_subset_batch(
             batch_x,
@@ -42,4 +58,22 @@ class MinimalSubsetWorker(MetricWorker):
             self.num_steps,
             self.maskers,
             self.mode,
+            _to_predictions(orig_output),
+        )
+
+    def process_grouped_batch(
+        self,
+        batch_x: torch.Tensor,
+        batch_y: torch.Tensor,
+        batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
+    ):
+        return minimal_subset_grouped_batch(
+            batch_x,
+            self.model,
+            batch_attr,
+            self.num_steps,
+            self.maskers,
+            self.mode,
+            _to_predictions(orig_output),
         )
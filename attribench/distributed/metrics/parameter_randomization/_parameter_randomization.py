@@ -6,6 +6,11 @@ from .._metric import Metric
 from ._parameter_randomization_worker import ParameterRandomizationWorker
 from attribench.result import ParameterRandomizationResult
 from attribench import MethodFactory
+from attribench.functional.metrics._parameter_randomization import (
+    _get_cascading_layers,
+    _layer_name,
+    _draw_seed,
+)
 
 
 class ParameterRandomization(Metric):
@@ -23,6 +28,19 @@ class ParameterRandomization(Metric):
     Source: Adebayo, J., Gilmer, J., Muelly, M., Goodfellow, I.,
     Hardt, M., & Kim, B. (2018). Sanity checks for saliency maps.
     Advances in neural information processing systems, 31.
+
+    If `cascading` is True, the cascading variant of the metric is computed.
+    Layers are randomized one by one, from the top (output) layer down to the
+    bottom (input) layer, and the metric is computed after each layer is
+    randomized. Each subprocess processes its samples once per layer.
+
+    If `num_seeds` is larger than 1, the metric is computed for `num_seeds`
+    independent re-initializations of the model in the same pass over the
+    dataset. For each batch, the parameter sets are loaded into the model one
+    after the other, and every attribution method is applied for each of
+    them. The methods are created by calling `method_factory` on the model
+    returned by `model_factory`, so methods that refer to specific layers of
+    the model (e.g. GradCAM) are supported.
     """
 
     def __init__(
@@ -34,6 +52,9 @@ class ParameterRandomization(Metric):
         address="localhost",
         port=12355,
         devices: Tuple | None = None,
+        cascading: bool = False,
+        num_seeds: int = 1,
+        seed: int | None = None,
     ):
         """
         Parameters
@@ -47,6 +68,9 @@ class ParameterRandomization(Metric):
             the Parameter Randomization metric for.
         batch_size : int
             Batch size per subprocess to use when computing the metric.
+        method_factory : MethodFactory
+            MethodFactory instance or callable that returns a dictionary
+            mapping method names to AttributionMethod objects.
         address : str
             Address to use for the distributed computation.
         port : str | int
@@ -54,6 +78,18 @@ class ParameterRandomization(Metric):
         devices : Tuple | None, optional
             Tuple of devices to use for the distributed computation.
             If None, then all available devices are used.
+        cascading : bool, optional
+            Whether to compute the cascading variant of the metric,
+            by default False
+        num_seeds : int, optional
+            Number of independent random re-initializations of the model,
+            by default 1
+        seed : int | None, optional
+            Seed for the random re-initializations. Re-initialization ``i``
+            uses seed ``seed + i``. All subprocesses use the same seed, so
+            every sample is evaluated on the same randomized models.
+            If None, the seed is drawn from the global random number
+            generator when the metric is created. By default None
         """
         super().__init__(
             model_factory,
@@ -64,10 +100,24 @@ class ParameterRandomization(Metric):
             devices,
         )
         self.dataset = GroupedAttributionsDataset(attributions_dataset)
+        layers = None
+        if cascading:
+            # The layer names are needed up front to initialize the result
+            layers = [
+                _layer_name(name)
+                for name, _ in _get_cascading_layers(model_factory())
+            ]
         self._result = ParameterRandomizationResult(
-            attributions_dataset.method_names, attributions_dataset.num_samples
+            attributions_dataset.method_names,
+            attributions_dataset.num_samples,
+            layers,
+            num_seeds,
         )
         self.method_factory = method_factory
+        self.cascading = cascading
+        self.num_seeds = num_seeds
+        # The seed is fixed here, so that all subprocesses share it
+        self.seed = seed if seed is not None else _draw_seed()
         
         self.agg_fn = None
         self.agg_dim = None
@@ -87,4 +137,7 @@ class ParameterRandomization(Metric):
             self.method_factory,
             self.agg_fn,
             self.agg_dim,
+            self.cascading,
+            self.num_seeds,
+            self.seed,
         )
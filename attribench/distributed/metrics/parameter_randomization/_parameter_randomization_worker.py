@@ -3,12 +3,16 @@ import torch
 from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
 )
+from ..._message import PartialResultMessage
 from .._metric_worker import GroupedMetricWorker, WorkerConfig
-from typing import Callable, Dict
-from torch import nn
+from typing import Callable, Dict, Optional
 from attribench.functional.metrics._parameter_randomization import (
     _parameter_randomization_batch,
+    _get_randomized_model,
+    _layer_name,
+    _add_layer_level,
 )
+from attribench.result._grouped_batch_result import GroupedBatchResult
 from attribench._method_factory import MethodFactory
 from attribench._model_factory import ModelFactory
 
@@ -30,26 +34,76 @@ class ParameterRandomizationWorker(GroupedMetricWorker):
         ]
         | None = None,
         agg_dim: int | None = None,
+        cascading: bool = False,
+        num_seeds: int = 1,
+        seed: int | None = None,
     ):
         super().__init__(worker_config, model_factory, dataset, batch_size)
         self.method_factory = method_factory
         self.agg_fn = agg_fn
         self.agg_dim = agg_dim
+        self.cascading = cascading
+        self.num_seeds = num_seeds
+        self.seed = seed
 
     def setup(self):
-        self.randomized_model = self._get_model()
+        # The methods are created for the model itself, the randomized
+        # parameter sets are loaded into it for each batch
+        (
+            self.randomized_model,
+            self.randomized_parameters,
+        ) = _get_randomized_model(
+            self.model_factory, self.device, self.num_seeds, self.seed
+        )
         self.method_dict_rand = self.method_factory(self.randomized_model)
+        # If cascading, the parameter sets are replaced for each layer
+        self.parameter_sets = self.randomized_parameters.parameter_sets()
+
+    def work(self):
+        if not self.cascading:
+            super().work()
+            return
+
+        self.setup()
+        layers = self.randomized_parameters.layers
+        for layer_idx, (name, _) in enumerate(layers):
+            self.parameter_sets = self.randomized_parameters.parameter_sets(
+                layer_idx + 1
+            )
+            for (
+                batch_indices,
+                batch_x,
+                batch_y,
+                batch_attr,
+            ) in self.dataloader:
+                batch_x = batch_x.to(self.device)
+                batch_y = batch_y.to(self.device)
+                batch_result = self.process_batch(batch_x, batch_y, batch_attr)
+                self.worker_config.send_result(
+                    PartialResultMessage(
+                        self.worker_config.rank,
+                        GroupedBatchResult(
+                            batch_indices,
+                            _add_layer_level(batch_result, _layer_name(name)),
+                        ),
+                    )
+                )
 
     def process_batch(
         self,
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
     ):
+        # The original output is not needed: only the randomized model is
+        # evaluated
         return _parameter_randomization_batch(
             batch_x,
             batch_y,
             batch_attr,
+            self.randomized_model,
+            self.parameter_sets,
             self.method_dict_rand,
             self.device,
             self.agg_fn,
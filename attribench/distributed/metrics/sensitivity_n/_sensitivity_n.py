@@ -1,9 +1,11 @@
 from .._metric import Metric
-from typing import Dict, Union, Tuple, List
+from typing import Dict, Optional, Union, Tuple, List
 from attribench.data.attributions_dataset._attributions_dataset import (
     AttributionsDataset,
     GroupedAttributionsDataset,
+    _check_attribution_values,
 )
+from attribench.data import OutputCache
 from attribench.masking import Masker
 from attribench.result._sensitivity_n_result import SensitivityNResult
 from ._sensitivity_n_worker import SensitivityNWorker
@@ -57,6 +59,7 @@ class SensitivityN(Metric):
         address="localhost",
         port="12355",
         devices: Tuple | None = None,
+        output_cache: Optional[OutputCache] = None,
     ):
         """
         Parameters
@@ -92,7 +95,12 @@ class SensitivityN(Metric):
         devices : Tuple | None
             Devices to use for the distributed computation. If None, then all
             available devices are used.
+        output_cache : Optional[OutputCache], optional
+            Cache of the outputs of models on the samples. If the outputs
+            of the model are in the cache, the output of the model on the
+            original samples is not computed again. Defaults to None.
         """
+        _check_attribution_values(attributions_dataset, "Sensitivity-n")
         super().__init__(
             model_factory,
             attributions_dataset,
@@ -111,6 +119,7 @@ class SensitivityN(Metric):
         self.max_subset_size = max_subset_size
         self.min_subset_size = min_subset_size
         self.segmented = segmented
+        self.output_cache = output_cache
         self._result = SensitivityNResult(
             attributions_dataset.method_names,
             list(maskers.keys()),
@@ -134,4 +143,5 @@ class SensitivityN(Metric):
             self.maskers,
             self.activation_fns,
             self.segmented,
+            self.output_cache,
         )
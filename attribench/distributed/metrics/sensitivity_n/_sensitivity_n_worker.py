@@ -1,11 +1,12 @@
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import torch
 from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
 )
 from attribench.masking import Masker
+from attribench.data import OutputCache
 from .._metric_worker import GroupedMetricWorker, WorkerConfig
 from attribench._model_factory import ModelFactory
 from attribench.functional.metrics.sensitivity_n._sensitivity_n import (
@@ -27,8 +28,11 @@ class SensitivityNWorker(GroupedMetricWorker):
         maskers: Dict[str, Masker],
         activation_fns: List[str],
         segmented=False,
+        output_cache: Optional[OutputCache] = None,
     ):
-        super().__init__(worker_config, model_factory, dataset, batch_size)
+        super().__init__(
+            worker_config, model_factory, dataset, batch_size, output_cache
+        )
         self.dataset = dataset
         self.activation_fns = activation_fns
         self.maskers: Dict[str, Masker] = maskers
@@ -52,6 +56,7 @@ class SensitivityNWorker(GroupedMetricWorker):
         batch_x: torch.Tensor,
         batch_y: torch.Tensor,
         batch_attr: Dict[str, torch.Tensor],
+        orig_output: Optional[torch.Tensor] = None,
     ):
         return _sens_n_batch(
             batch_x,
@@ -63,4 +68,5 @@ class SensitivityNWorker(GroupedMetricWorker):
             self.n_range,
             self.num_subsets,
             self.segmented,
+            orig_output,
         )
@@ -1,8 +1,14 @@
 from tqdm import tqdm
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Union
 from torch import nn
-from torch.utils.data import Dataset, DataLoader
-from attribench.data import AttributionsDatasetWriter, IndexDataset
+from torch.utils.data import Dataset
+from attribench.data._dataloader import _get_dataloader
+from attribench.data import (
+    AttributionsDatasetWriter,
+    BucketedAttributionsDatasetWriter,
+    BucketedDataset,
+    IndexDataset,
+)
 from attribench import AttributionMethod
 import torch
 
@@ -12,7 +18,9 @@ def compute_attributions(
     method_dict: Dict[str, AttributionMethod],
     dataset: Dataset,
     batch_size: int,
-    writer: Optional[AttributionsDatasetWriter] = None,
+    writer: Optional[
+        Union[AttributionsDatasetWriter, BucketedAttributionsDatasetWriter]
+    ] = None,
     device: Optional[torch.device] = None,
 ) -> Optional[Dict[str, torch.Tensor]]:
     """Compute attributions for a given model and dataset using a dictionary of
@@ -30,9 +38,12 @@ def compute_attributions(
         Torch Dataset to use for computing the attributions.
     batch_size : int
         The batch size to use for computing the attributions.
-    writer : Optional[AttributionsDatasetWriter], optional
+    writer : Optional[Union[AttributionsDatasetWriter, BucketedAttributionsDatasetWriter]], optional
         AttributionsDatasetWriter to write the attributions to, by default `None`.
         If `None`, the attributions are returned in a dictionary.
+        If `dataset` is a :class:`~attribench.data.BucketedDataset`, a
+        :class:`~attribench.data.BucketedAttributionsDatasetWriter` must
+        be given.
     device : Optional[torch.device], optional
         Device to use, by default `None`.
         If `None`, the CPU is used.
@@ -41,14 +52,25 @@ def compute_attributions(
     -------
     Optional[Dict[str, torch.Tensor]]
         If `writer` is `None`, a dictionary of attributions.
+
+    Raises
+    ------
+    ValueError
+        If `dataset` contains samples with different shapes and `writer`
+        is `None`.
     """
+    if writer is None and isinstance(dataset, BucketedDataset):
+        raise ValueError(
+            "Attributions for samples with different shapes must be written"
+            " using a BucketedAttributionsDatasetWriter"
+        )
     if device is None:
         device = torch.device("cpu")
     model.to(device)
     model.eval()
 
     index_dataset = IndexDataset(dataset)
-    dataloader = DataLoader(
+    dataloader = _get_dataloader(
         index_dataset,
         batch_size=batch_size,
         num_workers=4,
@@ -81,3 +103,4 @@ def compute_attributions(
                 )
     if writer is None:
         return result_dict
+    writer.flush()
@@ -1,20 +1,31 @@
 from torch import nn
-from torch.utils.data import Dataset, DataLoader
-from attribench.data import HDF5DatasetWriter
+from torch.utils.data import Dataset
+from attribench.data._dataloader import _get_dataloader
+from attribench.data import (
+    HDF5DatasetWriter,
+    IndexDataset,
+    SubsetDatasetWriter,
+    model_fingerprint,
+)
+import numpy as np
+from numpy import typing as npt
 import torch
-from typing import Optional, Tuple
+from typing import Dict, Mapping, Optional, Tuple, Union
 
 
 def _select_samples_batch(
+    batch_indices: torch.Tensor,
     batch_x: torch.Tensor,
     batch_y: torch.Tensor,
     model: nn.Module,
     device: torch.device,
 ):
-    """Returns the correctly classified samples and their labels.
+    """Returns the indices of the correctly classified samples, the samples
+    themselves, their labels and the output of the model on them.
 
     Parameters
     ----------
+    batch_indices : torch.Tensor
     batch_x : torch.Tensor
     batch_y : torch.Tensor
     model : nn.Module
@@ -22,16 +33,54 @@ def _select_samples_batch(
 
     Returns
     -------
-    Tuple[torch.Tensor, torch.Tensor]
-        The correctly classified samples and their labels.
+    Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]
+        The indices of the correctly classified samples, the samples,
+        their labels and the output of the model on them.
     """
     batch_x = batch_x.to(device)
     batch_y = batch_y.to(device)
     with torch.no_grad():
-        output = torch.argmax(model(batch_x), dim=1)
-    correct_samples = batch_x[output == batch_y, ...]
-    correct_labels = batch_y[output == batch_y]
-    return correct_samples, correct_labels
+        output = model(batch_x)
+    correct = torch.argmax(output, dim=1) == batch_y
+    return (
+        batch_indices[correct.cpu()],
+        batch_x[correct, ...],
+        batch_y[correct],
+        output[correct, ...],
+    )
+
+
+def _check_quotas(
+    num_samples: int, class_quotas: Optional[Mapping[int, int]]
+):
+    if class_quotas is not None and num_samples > sum(class_quotas.values()):
+        raise ValueError(
+            f"Cannot select {num_samples} samples with class quotas that"
+            f" sum to {sum(class_quotas.values())}."
+        )
+
+
+def _apply_quotas(
+    labels: npt.NDArray,
+    class_counts: Dict[int, int],
+    num_remaining: int,
+    class_quotas: Optional[Mapping[int, int]] = None,
+) -> npt.NDArray:
+    """Returns a boolean mask of the samples that can still be selected,
+    given the number of samples that is still needed and the per-class
+    quotas. Selected samples are counted in `class_counts`.
+    """
+    selected = np.zeros(labels.shape[0], dtype=bool)
+    for i, label in enumerate(labels.tolist()):
+        if num_remaining == 0:
+            break
+        count = class_counts.get(label, 0)
+        if class_quotas is not None and count >= class_quotas.get(label, 0):
+            continue
+        class_counts[label] = count + 1
+        selected[i] = True
+        num_remaining -= 1
+    return selected
 
 
 def select_samples(
@@ -39,13 +88,29 @@ def select_samples(
     dataset: Dataset,
     num_samples: int,
     batch_size: int,
-    writer: Optional[HDF5DatasetWriter] = None,
+    writer: Optional[Union[HDF5DatasetWriter, SubsetDatasetWriter]] = None,
     device: Optional[torch.device] = None,
+    class_quotas: Optional[Mapping[int, int]] = None,
 ) -> Optional[Tuple[torch.Tensor, torch.Tensor]]:
     """Select correctly classified samples from a dataset and optionally
     write them to a HDF5 file. If the `writer` is `None`, the
     samples and labels are simply returned. Otherwise, the samples and
     labels are written to the HDF5 file and `None` is returned.
+    The output of the model on the selected samples is then also written
+    to the :class:`~attribench.data.OutputCache` of the file, so metrics
+    can skip computing it again. If the writer stores the samples as uint8
+    or float16, the samples are classified as they are stored in the file,
+    so the cached outputs match the stored samples.
+
+    If `writer` is a :class:`~attribench.data.SubsetDatasetWriter`, only the
+    indices of the selected samples are written, rather than the samples
+    themselves. The selected samples can then be read using a
+    :class:`~attribench.data.SubsetDataset` on top of `dataset`.
+
+    If `class_quotas` is given, at most ``class_quotas[label]`` samples are
+    selected for each label. Samples with labels that are not in
+    `class_quotas` are not selected. The dataset is scanned only until
+    `num_samples` samples are selected.
 
     TODO this function should just return the samples and labels. Use the
     distributed class to write the samples and labels to a file.
@@ -56,46 +121,89 @@ def select_samples(
         Model to use for classification.
     dataset : Dataset
         Torch Dataset containing the samples and labels.
-    writer : HDF5DatasetWriter
-        Writer to write the samples and labels to, by default None.
     num_samples : int
         Number of correctly classified samples to select.
     batch_size : int
         Batch size to use for the dataloader.
+    writer : Optional[Union[HDF5DatasetWriter, SubsetDatasetWriter]]
+        Writer to write the samples and labels to, or the indices and labels
+        of the samples. By default None.
     device : Optional[torch.device], optional
         Device to use, by default None.
+    class_quotas : Optional[Mapping[int, int]], optional
+        Maximal number of samples to select for each label.
+        If None, samples are selected regardless of their label.
+        By default None.
 
     Returns
     -------
     Tuple[torch.Tensor, torch.Tensor] | None
         If `writer` is `None`, a tuple containing the correctly classified
         samples and their labels. Otherwise, `None`.
+
+    Raises
+    ------
+    ValueError
+        If `num_samples` is larger than the sum of `class_quotas`.
     """
+    _check_quotas(num_samples, class_quotas)
     if device is None:
         device = torch.device("cpu")
 
     model.to(device)
     model.eval()
 
-    dataloader = DataLoader(
-        dataset, batch_size=batch_size, num_workers=4, pin_memory=True
+    dataloader = _get_dataloader(
+        IndexDataset(dataset),
+        batch_size=batch_size,
+        num_workers=4,
+        pin_memory=True,
     )
 
+    fingerprint = model_fingerprint(model)
     samples_count = 0
+    class_counts: Dict[int, int] = {}
     all_correct_samples, all_correct_labels = [], []
-    for batch_x, batch_y in dataloader:
-        correct_samples, correct_labels = _select_samples_batch(
-            batch_x, batch_y, model, device
+    for batch_indices, batch_x, batch_y in dataloader:
+        if isinstance(writer, HDF5DatasetWriter):
+            # Select the samples as they are stored in the file, so the
+            # cached outputs match the stored samples if the storage dtype
+            # is lossy
+            batch_x = torch.from_numpy(writer.round_trip(batch_x.numpy()))
+        (
+            correct_indices,
+            correct_samples,
+            correct_labels,
+            correct_output,
+        ) = _select_samples_batch(
+            batch_indices, batch_x, batch_y, model, device
         )
-        if len(correct_samples) > 0:
+        selected = _apply_quotas(
+            correct_labels.cpu().numpy(),
+            class_counts,
+            num_samples - samples_count,
+            class_quotas,
+        )
+        num_selected = int(selected.sum())
+        if num_selected > 0:
+            selected_samples = correct_samples[torch.from_numpy(selected)]
+            selected_labels = correct_labels[torch.from_numpy(selected)]
             if writer is None:
-                all_correct_samples.append(correct_samples)
-                all_correct_labels.append(correct_labels)
+                all_correct_samples.append(selected_samples)
+                all_correct_labels.append(selected_labels)
+            elif isinstance(writer, SubsetDatasetWriter):
+                writer.write(
+                    correct_indices.numpy()[selected],
+                    selected_labels.cpu().numpy(),
+                    {fingerprint: correct_output.cpu().numpy()[selected]},
+                )
             else:
                 writer.write(
-                    correct_samples.cpu().numpy(), correct_labels.cpu().numpy()
+                    selected_samples.cpu().numpy(),
+                    selected_labels.cpu().numpy(),
+                    {fingerprint: correct_output.cpu().numpy()[selected]},
                 )
-            samples_count += len(correct_samples)
+            samples_count += num_selected
         if samples_count >= num_samples:
             break
     if writer is None:
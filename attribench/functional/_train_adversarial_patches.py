@@ -1,5 +1,4 @@
 import numpy as np
-from tqdm import tqdm
 import torch
 import random
 from torch import nn
@@ -23,113 +22,176 @@ def _init_patch_square(
     return patch
 
 
+def _apply_patches(images, patches, indx, indy):
+    """Pastes ``patches[i]`` into ``images[i]`` at location
+    ``(indx[i], indy[i])`` for each i. Pasting is done using a single
+    indexing operation, and is differentiable with respect to the patches.
+    """
+    num_images, num_channels = images.shape[:2]
+    patch_size = patches.shape[-1]
+    offsets = torch.arange(patch_size, device=images.device)
+    # Index tensors broadcast to [num_images, num_channels, ps, ps]
+    batch_idx = torch.arange(num_images, device=images.device)
+    batch_idx = batch_idx[:, None, None, None]
+    channel_idx = torch.arange(num_channels, device=images.device)
+    channel_idx = channel_idx[None, :, None, None]
+    rows = (indx[:, None] + offsets)[:, None, :, None]
+    cols = (indy[:, None] + offsets)[:, None, None, :]
+    return images.index_put(
+        (batch_idx, channel_idx, rows, cols),
+        patches.to(images.dtype).expand(num_images, -1, -1, -1),
+    )
+
+
 def _train_epoch(
     model,
-    patch,
+    patches,
     train_dl,
     loss_function,
     optimizer,
-    target_label,
+    target_labels,
     data_min,
     data_max,
     device,
+    active=None,
+    update_range=False,
 ):
-    patch_size = patch.shape[-1]
+    # patches: [num_patches, num_channels, patch_size, patch_size]
+    # Only the patches with indices in active are trained.
+    if active is None:
+        active = list(range(patches.shape[0]))
+    num_active = len(active)
+    patch_size = patches.shape[-1]
+    # [num_active]
+    targets = torch.tensor(
+        [target_labels[i] for i in active], dtype=torch.long, device=device
+    )
     train_loss = []
-    target = None
     for x, y in train_dl:
-        # x, y = torch.tensor(x), torch.tensor(y)
         optimizer.zero_grad()
-        if target is None:
-            target = torch.tensor(
-                np.full(y.shape[0], target_label),
-                dtype=torch.long,
-                device=device,
-            )
+        if update_range:
+            # Data range is computed during the first epoch
+            data_min = min(data_min, x.min().item())
+            data_max = max(data_max, x.max().item())
+        batch_size = y.shape[0]
         image_size = x.shape[-1]
+        num_images = num_active * batch_size
 
-        indx = np.random.randint(0, image_size - patch_size, size=y.shape[0])
-        indy = np.random.randint(0, image_size - patch_size, size=y.shape[0])
+        indx = torch.randint(
+            image_size - patch_size, (num_images,), device=device
+        )
+        indy = torch.randint(
+            image_size - patch_size, (num_images,), device=device
+        )
 
-        images = x.to(device)
-        for i in range(y.shape[0]):
-            images[
-                i,
-                :,
-                indx[i] : indx[i] + patch_size,
-                indy[i] : indy[i] + patch_size,
-            ] = patch
+        # Replicate the batch for each patch
+        # [num_active * batch_size, *sample_shape]
+        images = x.to(device).repeat(num_active, *[1] * (x.dim() - 1))
+        # The copies of the batch for a patch are consecutive
+        images = _apply_patches(
+            images,
+            patches[active].repeat_interleave(batch_size, dim=0),
+            indx,
+            indy,
+        )
 
         adv_out = model(images)
 
-        loss = loss_function(adv_out, target[: y.shape[0]])
-        loss.backward()
+        # Loss is computed separately for each patch and summed,
+        # so the gradient for each patch is the same as if it was
+        # trained separately.
+        # [num_active]
+        loss = loss_function(
+            adv_out, targets.repeat_interleave(batch_size)
+        ).reshape(num_active, batch_size).mean(dim=1)
+        loss.sum().backward()
         optimizer.step()
         with torch.no_grad():
-            patch.data = torch.clamp(patch.data, min=data_min, max=data_max)
-        train_loss.append(loss.item())
-    epoch_loss = np.array(train_loss).mean()
-    return epoch_loss
+            patches.data = torch.clamp(
+                patches.data, min=data_min, max=data_max
+            )
+        train_loss.append(loss.detach().cpu().numpy())
+    # [num_active]
+    epoch_loss = np.stack(train_loss).mean(axis=0)
+    return epoch_loss, data_min, data_max
 
 
-def _validate(model, patch, data_loader, loss_function, target_label, device):
-    patch_size = patch.shape[-1]
+def _validate(
+    model, patches, data_loader, loss_function, target_labels, device
+):
+    num_patches = patches.shape[0]
+    patch_size = patches.shape[-1]
+    targets = torch.tensor(target_labels, dtype=torch.long, device=device)
     val_loss = []
     preds = []
     with torch.no_grad():
         for x, y in data_loader:
-            y = torch.tensor(
-                np.full(y.shape[0], target_label), dtype=torch.long
-            ).to(device)
+            batch_size = y.shape[0]
             image_size = x.shape[-1]
 
             indx = random.randint(0, image_size - patch_size)
             indy = random.randint(0, image_size - patch_size)
 
-            images = x.to(device)
+            # [num_patches, batch_size, *sample_shape]
+            images = x.to(device).repeat(num_patches, *[1] * x.dim())
+            images = images.reshape(num_patches, *x.shape)
             images[
-                :, :, indx : indx + patch_size, indy : indy + patch_size
-            ] = patch
-            adv_out = model(images)
-            loss = loss_function(adv_out, y)
-
-            val_loss.append(loss.item())
-            preds.append(adv_out.argmax(axis=1).detach().cpu().numpy())
-        val_loss = np.array(val_loss).mean()
-        preds = np.concatenate(preds)
-        percent_successful = (
-            np.count_nonzero(preds == target_label) / preds.shape[0]
-        )
+                :, :, :, indx : indx + patch_size, indy : indy + patch_size
+            ] = patches.unsqueeze(1)
+            adv_out = model(images.flatten(0, 1))
+            loss = loss_function(
+                adv_out, targets.repeat_interleave(batch_size)
+            ).reshape(num_patches, batch_size)
+
+            val_loss.append(loss.sum(dim=1).cpu().numpy())
+            # [num_patches, batch_size]
+            preds.append(
+                adv_out.argmax(axis=1)
+                .reshape(num_patches, batch_size)
+                .cpu()
+                .numpy()
+            )
+        preds = np.concatenate(preds, axis=1)
+        # [num_patches]
+        val_loss = np.stack(val_loss).sum(axis=0) / preds.shape[1]
+        percent_successful = np.count_nonzero(
+            preds == np.array(target_labels)[:, np.newaxis], axis=1
+        ) / preds.shape[1]
         return val_loss, percent_successful
 
 
-def _make_patch(
+def _make_patches(
     dataset,
     batch_size,
     model,
-    target_label,
+    target_labels,
     device,
     patch_percent=0.1,
     epochs=5,
     data_min=None,
     data_max=None,
     lr=0.05,
+    target_success_rate=None,
 ):
-    print(f"Training patch for label {target_label}...")
+    """Trains a patch for each of the given target labels simultaneously.
+    Each batch of data is replicated for each patch, and all patches are
+    optimized in the same forward and backward pass.
+
+    If `data_min` or `data_max` is None, the range of the data is computed
+    during the first epoch.
+
+    If `target_success_rate` is not None, the patches are validated after
+    each epoch. Patches that reach the target success rate are not trained
+    any further, and training stops when all patches reach it.
+
+    Returns a list containing a tuple ``(patch, val_loss, percent_successful)``
+    for each target label, and the range of the data ``(data_min, data_max)``.
+    """
+    target_labels = list(target_labels)
+    num_patches = len(target_labels)
+    print(f"Training patches for labels {target_labels}...")
     dataloader = DataLoader(dataset, batch_size=batch_size, num_workers=4,
                             pin_memory=True)
-    # patch values will be clipped between data_min and data_max
-    # so that patch will be valid image data.
-    if data_max is None or data_min is None:
-        for x, _ in tqdm(dataloader):
-            if data_max is None:
-                data_max = x.max().item()
-            if data_min is None:
-                data_min = x.min().item()
-            if x.min() < data_min:
-                data_min = x.min().item()
-            if x.max() > data_max:
-                data_max = x.max().item()
 
     model.to(device)
     for param in model.parameters():
@@ -139,37 +201,114 @@ def _make_patch(
     x, _ = next(iter(dataloader))
     sample_shape = x.shape
 
-    patch = _init_patch_square(
-        sample_shape[-1], sample_shape[1], patch_percent, data_min, data_max
+    # patch values will be clipped between data_min and data_max
+    # so that patch will be valid image data.
+    # If the range of the data is not known, it is initialized using the
+    # first batch and updated during the first epoch.
+    update_range = data_min is None or data_max is None
+    if data_min is None:
+        data_min = x.min().item()
+    if data_max is None:
+        data_max = x.max().item()
+
+    # [num_patches, num_channels, patch_size, patch_size]
+    patches = np.concatenate(
+        [
+            _init_patch_square(
+                sample_shape[-1],
+                sample_shape[1],
+                patch_percent,
+                data_min,
+                data_max,
+            )
+            for _ in range(num_patches)
+        ]
     )
-    patch = torch.tensor(patch, requires_grad=True, device=device)
-    optim = torch.optim.Adam([patch], lr=lr, weight_decay=0.0)
+    patches = torch.tensor(patches, requires_grad=True, device=device)
+    # Adam updates each parameter independently, so optimizing all patches
+    # with one optimizer is equivalent to optimizing them separately
+    optim = torch.optim.Adam([patches], lr=lr, weight_decay=0.0)
 
-    loss = torch.nn.CrossEntropyLoss()
-    min_loss = None
-    best_patch = None
+    loss = torch.nn.CrossEntropyLoss(reduction="none")
+    min_loss = np.full(num_patches, np.inf)
+    best_patches = [None] * num_patches
+    active = list(range(num_patches))
 
     for epoch in range(epochs):
-        epoch_loss = _train_epoch(
+        epoch_loss, data_min, data_max = _train_epoch(
             model,
-            patch,
+            patches,
             dataloader,
             loss,
             optim,
-            target_label=target_label,
+            target_labels=target_labels,
             data_min=data_min,
             data_max=data_max,
             device=device,
+            active=active,
+            update_range=update_range and epoch == 0,
         )
-        print(f"Patch {target_label} epoch {epoch} loss: {epoch_loss}")
-        if min_loss is None or epoch_loss < min_loss:
-            min_loss = epoch_loss
-            best_patch = patch.cpu()
+        for i, patch_idx in enumerate(active):
+            print(
+                f"Patch {target_labels[patch_idx]} epoch {epoch}"
+                f" loss: {epoch_loss[i]}"
+            )
+            if epoch_loss[i] < min_loss[patch_idx]:
+                min_loss[patch_idx] = epoch_loss[i]
+                # Patches are saved with a leading batch dimension
+                best_patches[patch_idx] = (
+                    patches[patch_idx : patch_idx + 1].detach().cpu()
+                )
+
+        if target_success_rate is not None:
+            _, percent_successful = _validate(
+                model,
+                patches[active].detach(),
+                dataloader,
+                loss,
+                [target_labels[i] for i in active],
+                device,
+            )
+            done = [
+                patch_idx
+                for i, patch_idx in enumerate(active)
+                if percent_successful[i] >= target_success_rate
+            ]
+            for patch_idx in done:
+                print(
+                    f"Patch {target_labels[patch_idx]} reached target"
+                    f" success rate after epoch {epoch}."
+                )
+                best_patches[patch_idx] = (
+                    patches[patch_idx : patch_idx + 1].detach().cpu()
+                )
+            active = [i for i in active if i not in done]
+            if len(active) == 0:
+                break
 
     val_loss, percent_successful = _validate(
-        model, patch, dataloader, loss, target_label, device
+        model,
+        torch.cat(best_patches).to(device),
+        dataloader,
+        loss,
+        target_labels,
+        device,
     )
-    return best_patch, val_loss, percent_successful
+    return [
+        (best_patches[i], val_loss[i], percent_successful[i])
+        for i in range(num_patches)
+    ], (data_min, data_max)
+
+
+def _get_patch_labels(
+    num_patches: int, labels: Optional[Tuple[int, ...]] = None
+) -> List[int]:
+    # If the number of available labels is smaller than the number of
+    # patches, the labels are repeated.
+    if labels is None:
+        return list(range(num_patches))
+    return [label for label, _ in zip(cycle(labels), range(num_patches))]
+
 
 def train_adversarial_patches(
         model: nn.Module,
@@ -179,11 +318,26 @@ def train_adversarial_patches(
         path: Optional[str],
         labels: Optional[Tuple[int]] = None,
         device: Optional[torch.device] = None,
+        patches_per_pass: Optional[int] = None,
+        target_success_rate: Optional[float] = None,
 ) -> List[torch.Tensor] | None:
     """Train adversarial patches for a given model and dataset.
     If `path` is not `None`, the patches are saved to disk.
     Otherwise, they are returned as a list.
 
+    Patches for different labels are trained simultaneously: each batch of
+    data is replicated for each patch, and all patches are optimized in the
+    same forward and backward pass. This way, the dataset is only traversed
+    once per epoch for all patches. The number of patches that are trained
+    simultaneously can be limited using `patches_per_pass`, as the effective
+    batch size is `batch_size * patches_per_pass`.
+
+    If `target_success_rate` is given, the patches are validated after each
+    epoch, and training of a patch stops early once the fraction of
+    samples for which it flips the prediction to its target label reaches
+    `target_success_rate`. Note that validation requires an additional pass
+    over the dataset per epoch.
+
     Parameters
     ----------
     model : nn.Module
@@ -204,6 +358,14 @@ def train_adversarial_patches(
         Default: `None`.
     device : Optional[torch.device], optional
         Device to use, by default None.
+    patches_per_pass : Optional[int], optional
+        Maximal number of patches to train simultaneously.
+        If `None`, all patches are trained simultaneously.
+        Default: `None`.
+    target_success_rate : Optional[float], optional
+        Success rate at which training of a patch is stopped.
+        If `None`, patches are trained for the full number of epochs.
+        Default: `None`.
 
     Returns
     -------
@@ -216,20 +378,35 @@ def train_adversarial_patches(
     model.to(device)
     model.eval()
 
-    patch_labels = cycle(labels) if labels is not None else range(num_patches)
+    patch_labels = _get_patch_labels(num_patches, labels)
+    if patches_per_pass is None:
+        patches_per_pass = len(patch_labels)
     all_patches = []
-    for patch_label in patch_labels:
-        patch, val_loss, percent_successful = _make_patch(
-            dataset, batch_size, model, patch_label, device
-        )
-        print(
-            f"Patch label: {patch_label}.",
-            f"Loss: {val_loss:.3f}.",
-            f"Success rate: {percent_successful:.3f}.",
+    # Range of the data is computed during the first pass and re-used
+    data_min, data_max = None, None
+    for i in range(0, len(patch_labels), patches_per_pass):
+        pass_labels = patch_labels[i : i + patches_per_pass]
+        patch_results, (data_min, data_max) = _make_patches(
+            dataset,
+            batch_size,
+            model,
+            pass_labels,
+            device,
+            data_min=data_min,
+            data_max=data_max,
+            target_success_rate=target_success_rate,
         )
-        if path is not None:
-            torch.save(patch, path + f"_{patch_label}.pt")
-        else:
-            all_patches.append(patch)
+        for patch_label, (patch, val_loss, percent_successful) in zip(
+            pass_labels, patch_results
+        ):
+            print(
+                f"Patch label: {patch_label}.",
+                f"Loss: {val_loss:.3f}.",
+                f"Success rate: {percent_successful:.3f}.",
+            )
+            if path is not None:
+                torch.save(patch, path + f"_{patch_label}.pt")
+            else:
+                all_patches.append(patch)
     if path is None:
-        return all_patches
\ No newline at end of file
+        return all_patches
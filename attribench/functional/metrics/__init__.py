@@ -1,9 +1,12 @@
-from .deletion import deletion
-from ._insertion import insertion
-from ._irof import irof
-from ._impact_coverage import impact_coverage
-from .infidelity import infidelity
-from ._max_sensitivity import max_sensitivity
-from .minimal_subset import minimal_subset
-from .sensitivity_n import sensitivity_n
-from ._parameter_randomization import parameter_randomization
\ No newline at end of file
+from .deletion import deletion, iter_deletion
+from ._insertion import insertion, iter_insertion
+from ._irof import irof, iter_irof
+from ._impact_coverage import impact_coverage, iter_impact_coverage
+from .infidelity import infidelity, iter_infidelity
+from ._max_sensitivity import max_sensitivity, iter_max_sensitivity
+from .minimal_subset import minimal_subset, iter_minimal_subset
+from .sensitivity_n import sensitivity_n, iter_sensitivity_n
+from ._parameter_randomization import (
+    parameter_randomization,
+    iter_parameter_randomization,
+)
@@ -1,17 +1,87 @@
-import random
 import logging
 import re
 import os
-from typing import Dict
+from typing import Dict, Generator, Optional, Sequence, Tuple
 from torch import nn
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset
+from attribench.data._dataloader import _get_dataloader
 from attribench._attribution_method import AttributionMethod
-from attribench.result import ImpactCoverageResult
+from attribench.result import ImpactCoverageResult, ResultSink
 from attribench.result._grouped_batch_result import GroupedBatchResult
-from attribench.data import IndexDataset
+from attribench.data import IndexDataset, OutputCache
+from attribench.data.hdf5_dataset._output_cache import _get_cached_output
+from ._stream import _collect
 import torch
-from itertools import cycle
-import numpy as np
+
+
+class _PatchBank:
+    """Holds all adversarial patches from a folder on a given device,
+    along with their target labels. The patches are loaded from disk only
+    once, when the bank is created.
+    """
+
+    def __init__(self, patch_folder: str, device: torch.device):
+        target_expr = re.compile(r".*_([0-9]*)\.pt")
+        patch_names = sorted(
+            filename
+            for filename in os.listdir(patch_folder)
+            if filename.endswith(".pt")
+        )
+        if len(patch_names) == 0:
+            raise ValueError(f"No patches found in {patch_folder}.")
+        patches, targets = [], []
+        for patch_name in patch_names:
+            match_expr = target_expr.match(patch_name)
+            if match_expr is None:
+                raise ValueError(
+                    f"Patch name {patch_name} does not match"
+                    " expected format."
+                )
+            targets.append(int(match_expr.group(1)))
+            patch = torch.load(
+                os.path.join(patch_folder, patch_name),
+                map_location=lambda storage, _: storage,
+            )
+            # Patches are saved with a leading batch dimension of size 1
+            patches.append(patch.detach().float().reshape(patch.shape[-3:]))
+        if len(set(patch.shape for patch in patches)) > 1:
+            raise ValueError("All patches must have the same shape.")
+        # [num_patches, num_channels, patch_size, patch_size]
+        self.patches = torch.stack(patches).to(device)
+        # [num_patches]
+        self.targets = torch.tensor(targets, device=device)
+        self.patch_size = self.patches.shape[-1]
+
+    def __len__(self):
+        return self.patches.shape[0]
+
+
+def _apply_patches(
+    images: torch.Tensor,
+    patches: torch.Tensor,
+    indx: torch.Tensor,
+    indy: torch.Tensor,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Pastes a patch into each image at the given locations.
+    Returns the patched images and the corresponding patch masks.
+    """
+    patch_size = patches.shape[-1]
+    offsets = torch.arange(patch_size, device=images.device)
+    # [num_images, 1, 1, 1]
+    batch_idx = torch.arange(images.shape[0], device=images.device)
+    batch_idx = batch_idx[:, None, None, None]
+    # [1, num_channels, 1, 1]
+    channel_idx = torch.arange(images.shape[1], device=images.device)
+    channel_idx = channel_idx[None, :, None, None]
+    # [num_images, 1, patch_size, 1] and [num_images, 1, 1, patch_size]
+    rows = (indx[:, None] + offsets)[:, None, :, None]
+    cols = (indy[:, None] + offsets)[:, None, None, :]
+
+    patched = images.clone()
+    patched[batch_idx, channel_idx, rows, cols] = patches
+    mask = torch.zeros_like(images, dtype=torch.bool)
+    mask[batch_idx, channel_idx, rows, cols] = True
+    return patched, mask
 
 
 def _impact_coverage_batch(
@@ -19,98 +89,105 @@ def _impact_coverage_batch(
     method_dict: Dict[str, AttributionMethod],
     batch_x: torch.Tensor,
     batch_y: torch.Tensor,
-    patch_folder: str,
-    patch_names_cycle: cycle,
+    patch_bank: _PatchBank,
     device: torch.device,
+    num_candidates: int = 4,
+    max_tries: int = 50,
+    orig_output: Optional[torch.Tensor] = None,
 ) -> Dict[str, torch.Tensor]:
-    target_expr = re.compile(r".*_([0-9]*)\.pt")
     batch_result: Dict[str, torch.Tensor] = {
         method_name: torch.zeros(1) for method_name in method_dict.keys()
     }
     batch_x = batch_x.to(device)
     batch_y = batch_y.to(device)
+    batch_size = batch_x.shape[0]
+    image_size = batch_x.shape[-1]
+    patch_size = patch_bank.patch_size
 
-    # Get original output and initialize datastructures
-    with torch.no_grad():
-        original_output = model(batch_x).detach().cpu()
-    successful = torch.zeros(batch_x.shape[0]).bool()
+    # Get original output, unless it was given, and initialize datastructures
+    if orig_output is None:
+        with torch.no_grad():
+            orig_output = model(batch_x)
+    original_pred = orig_output.argmax(dim=1)
+    successful = torch.zeros(batch_size, dtype=torch.bool, device=device)
     attacked_samples = batch_x.clone()
-    targets = torch.zeros(batch_y.shape).long()
-    patch_mask = torch.zeros(batch_x.shape)
-    max_tries = 50
+    targets = torch.zeros_like(batch_y)
+    patch_mask = torch.zeros_like(batch_x, dtype=torch.bool)
     num_tries = 0
 
-    # Apply patches to images
+    # Apply patches to images. In each iteration, up to num_candidates random
+    # (patch, location) pairs are tried for each sample that was not yet
+    # successfully attacked, in a single forward pass.
     while not torch.all(successful):
-        num_tries += 1
-        # Load next patch
-        patch_name = next(patch_names_cycle)
-        match_expr = target_expr.match(patch_name)
-        if match_expr is None:
-            raise ValueError(
-                f"Patch name {patch_name} does not match" " expected format."
-            )
-        target = int(match_expr.group(1))
-        patch = torch.load(
-            os.path.join(patch_folder, patch_name),
-            map_location=lambda storage, _: storage,
-        ).to(device)
-        image_size = batch_x.shape[-1]
-        patch_size = patch.shape[-1]
-
-        # Apply patch to all images in batch (random location,
-        # but same for each image in batch)
-        indx = random.randint(0, image_size - patch_size)
-        indy = random.randint(0, image_size - patch_size)
-        attacked_samples[~successful, ...] = batch_x[~successful, ...].clone()
-        attacked_samples[
-            ~successful,
-            :,
-            indx : indx + patch_size,
-            indy : indy + patch_size,
-        ] = patch.float()
+        remaining = torch.nonzero(~successful).flatten()
+        num_remaining = remaining.shape[0]
+        # The last iteration only uses the remaining tries, so at most
+        # max_tries candidates are tried for each sample
+        batch_candidates = min(num_candidates, max_tries - num_tries)
+        num_trials = num_remaining * batch_candidates
+        # Candidates for the same sample are consecutive
+        # [num_remaining * batch_candidates]
+        sample_idx = remaining.repeat_interleave(batch_candidates)
+        patch_idx = torch.randint(
+            len(patch_bank), (num_trials,), device=device
+        )
+        indx = torch.randint(
+            image_size - patch_size + 1, (num_trials,), device=device
+        )
+        indy = torch.randint(
+            image_size - patch_size + 1, (num_trials,), device=device
+        )
+        candidate_samples, candidate_masks = _apply_patches(
+            batch_x[sample_idx], patch_bank.patches[patch_idx], indx, indy
+        )
+        candidate_targets = patch_bank.targets[patch_idx]
         with torch.no_grad():
-            adv_out = model(attacked_samples).detach().cpu()
+            adv_pred = model(candidate_samples).argmax(dim=1)
 
-        # Set the patch mask and targets for the samples that were
-        # successful this iteration
-        # We set the patch mask for all samples that weren't yet
-        # successful
-        # This way, if any samples can't be attacked,
-        # they will still have a patch on them
-        # (even though it didn't flip the prediction)
-        patch_mask[~successful, ...] = 0
-        patch_mask[
-            ~successful,
-            :,
-            indx : indx + patch_size,
-            indy : indy + patch_size,
-        ] = 1
-        targets[~successful] = target
-
-        # Add the currently successful samples to all successful samples
+        # [num_remaining, batch_candidates]
         successful_now = (
             # Output was originally not equal to target
-            (original_output.argmax(axis=1) != target)
+            (original_pred[sample_idx] != candidate_targets)
             # Output is now equal to target
-            & (adv_out.argmax(axis=1) == target)
+            & (adv_pred == candidate_targets)
             # Ground truth is not equal to target
-            & (batch_y.cpu() != target)
+            & (batch_y[sample_idx] != candidate_targets)
+        ).reshape(num_remaining, batch_candidates)
+
+        # Select the first successful candidate for each sample.
+        # If no candidate was successful, the last candidate is selected.
+        # This way, if any samples can't be attacked,
+        # they will still have a patch on them
+        # (even though it didn't flip the prediction)
+        any_successful = successful_now.any(dim=1)
+        first_successful = successful_now.int().argmax(dim=1)
+        chosen = torch.where(
+            any_successful,
+            first_successful,
+            torch.full_like(first_successful, batch_candidates - 1),
+        )
+        chosen = (
+            torch.arange(num_remaining, device=device) * batch_candidates
+            + chosen
         )
-        successful = successful | successful_now
+        attacked_samples[remaining] = candidate_samples[chosen]
+        patch_mask[remaining] = candidate_masks[chosen]
+        targets[remaining] = candidate_targets[chosen]
+        successful[remaining] = any_successful
 
-        if num_tries > max_tries:
-            logging.warning(
-                "Not all samples could be attacked:"
-                f"{torch.sum(successful)}/{batch_x.size(0)}"
-                " were successful."
-            )
+        num_tries += batch_candidates
+        if num_tries >= max_tries:
+            if not torch.all(successful):
+                logging.warning(
+                    "Not all samples could be attacked:"
+                    f"{torch.sum(successful)}/{batch_size}"
+                    " were successful."
+                )
             break
-    targets = targets.to(device)
 
     # Compute impact coverage for each method
     for method_name, method in method_dict.items():
-        attrs = method(attacked_samples, targets).detach().cpu().numpy()
+        attrs = method(attacked_samples, targets).detach()
 
         # Check attributions shape
         if attrs.shape[1] not in (1, 3):
@@ -121,42 +198,85 @@ def _impact_coverage_batch(
             )
         # If attributions have only 1 color channel,
         # we need a single-channel patch mask as well
+        method_patch_mask = patch_mask
         if attrs.shape[1] == 1:
-            patch_mask = patch_mask[:, 0, :, :]
+            method_patch_mask = patch_mask[:, :1, :, :]
+        # [batch_size, num_features]
+        method_patch_mask = method_patch_mask.flatten(1)
 
-        # Get indices of top k attributions
-        flattened_attrs = attrs.reshape(attrs.shape[0], -1)
-        sorted_indices = flattened_attrs.argsort()
         # Number of top attributions is equal to number of features
         # masked by the patch
         # We assume here that the mask is the same size for all samples!
-        nr_top_attributions = patch_mask[0, ...].long().sum().item()
+        nr_top_attributions = int(method_patch_mask[0].sum().item())
 
         # Create mask of critical factors (most important
         # pixels/features according to attributions)
-        to_mask = sorted_indices[:, -nr_top_attributions:]
-        critical_factor_mask = np.zeros(attrs.shape).reshape(
-            attrs.shape[0], -1
-        )
-        batch_size = attrs.shape[0]
-        batch_dim = np.tile(
-            range(batch_size), (nr_top_attributions, 1)
-        ).transpose()
-        critical_factor_mask[batch_dim, to_mask] = 1
-        critical_factor_mask = critical_factor_mask.astype(bool)
+        flattened_attrs = attrs.flatten(1)
+        to_mask = torch.topk(
+            flattened_attrs, nr_top_attributions, dim=1, sorted=False
+        ).indices
+        critical_factor_mask = torch.zeros_like(
+            flattened_attrs, dtype=torch.bool
+        ).scatter_(1, to_mask, True)
 
         # Calculate IoU of critical factors (top n attributions) with
         # adversarial patch
-        patch_mask_flattened = patch_mask.flatten(1).bool().numpy()
-        intersection = (patch_mask_flattened & critical_factor_mask).sum(
-            axis=1
-        )
-        union = (patch_mask_flattened | critical_factor_mask).sum(axis=1)
-        iou = intersection.astype(float) / union.astype(float)
-        batch_result[method_name] = iou
+        intersection = (method_patch_mask & critical_factor_mask).sum(dim=1)
+        union = (method_patch_mask | critical_factor_mask).sum(dim=1)
+        iou = intersection.double() / union.double()
+        batch_result[method_name] = iou.cpu()
     return batch_result
 
 
+def iter_impact_coverage(
+    model: nn.Module,
+    samples_dataset: Dataset,
+    batch_size: int,
+    method_dict: Dict[str, AttributionMethod],
+    patch_folder: str,
+    device: torch.device = torch.device("cpu"),
+    num_candidates: int = 4,
+    output_cache: Optional[OutputCache] = None,
+) -> Generator[GroupedBatchResult, None, None]:
+    """Computes the Impact Coverage metric batch by batch, and yields the
+    result of each batch as soon as it is computed.
+    See :func:`impact_coverage` for a description of the metric and of the
+    parameters.
+
+    Yields
+    ------
+    GroupedBatchResult
+        Result of Impact Coverage on a batch of samples.
+    """
+    # Load all patches onto the device
+    patch_bank = _PatchBank(patch_folder, device)
+    model.to(device)
+    model.eval()
+    cached_outputs = (
+        output_cache.for_model(model) if output_cache is not None else None
+    )
+
+    index_dataset = IndexDataset(samples_dataset)
+    dataloader = _get_dataloader(
+        index_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
+    )
+
+    for batch_indices, batch_x, batch_y in dataloader:
+        batch_result = _impact_coverage_batch(
+            model,
+            method_dict,
+            batch_x,
+            batch_y,
+            patch_bank,
+            device,
+            num_candidates,
+            orig_output=_get_cached_output(
+                cached_outputs, batch_indices, device
+            ),
+        )
+        yield GroupedBatchResult(batch_indices, batch_result)
+
+
 def impact_coverage(
     model: nn.Module,
     samples_dataset: Dataset,
@@ -164,7 +284,10 @@ def impact_coverage(
     method_dict: Dict[str, AttributionMethod],
     patch_folder: str,
     device: torch.device = torch.device("cpu"),
-) -> ImpactCoverageResult:
+    num_candidates: int = 4,
+    output_cache: Optional[OutputCache] = None,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[ImpactCoverageResult]:
     """Computes the Impact Coverage metric for a given dataset, model, and
     set of attribution methods.
 
@@ -186,6 +309,13 @@ def impact_coverage(
     or :class:`~attribench.distributed.TrainAdversarialPatches` class
     can be used.
 
+    All patches are loaded onto the device once. For each sample,
+    `num_candidates` random (patch, location) pairs are tried in a single
+    forward pass, until a patch is found that changes the prediction
+    of the model to the target of the patch. At most 50 pairs are tried
+    for each sample: the last forward pass tries fewer candidates if
+    `num_candidates` does not divide 50.
+
     Parameters
     ----------
     model : nn.Module
@@ -201,37 +331,38 @@ def impact_coverage(
     device : torch.device, optional
         Device to use for computing Impact Coverage.
         Default: torch.device("cpu")
+    num_candidates : int, optional
+        Number of (patch, location) pairs to try for each sample in a single
+        forward pass. The effective batch size of these forward passes is
+        `batch_size * num_candidates`.
+        Default: 4
+    output_cache : Optional[OutputCache], optional
+        Cache of the outputs of models on the samples. If the outputs of
+        `model` are in the cache, the original predictions of the model are
+        not computed again.
+        Default: None
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
 
     Returns
     -------
-    ImpactCoverageResult
-        Result of the Impact Coverage metric.
+    Optional[ImpactCoverageResult]
+        If `sinks` is None, the result of Impact Coverage.
     """
-    # Get names of patches and compile regular expression for deriving
-    # target labels
-    patch_names = [
-        filename
-        for filename in os.listdir(patch_folder)
-        if filename.endswith(".pt")
-    ]
-    patch_names_cycle = cycle(patch_names)
-
-    index_dataset = IndexDataset(samples_dataset)
-    dataloader = DataLoader(
-        index_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
+    result = ImpactCoverageResult(
+        list(method_dict.keys()), len(IndexDataset(samples_dataset))
     )
-
-    result = ImpactCoverageResult(list(method_dict.keys()), len(index_dataset))
-
-    for batch_indices, batch_x, batch_y in dataloader:
-        batch_result = _impact_coverage_batch(
-            model,
-            method_dict,
-            batch_x,
-            batch_y,
-            patch_folder,
-            patch_names_cycle,
-            device,
-        )
-        result.add(GroupedBatchResult(batch_indices, batch_result))
-    return result
+    batch_results = iter_impact_coverage(
+        model,
+        samples_dataset,
+        batch_size,
+        method_dict,
+        patch_folder,
+        device,
+        num_candidates,
+        output_cache,
+    )
+    return _collect(result, batch_results, sinks)
@@ -1,13 +1,117 @@
 from tqdm import tqdm
-from typing import List, Mapping, Optional, Union
+from typing import Generator, List, Mapping, Optional, Sequence, Union
 from attribench.masking import Masker
 from attribench.data import AttributionsDataset
+from attribench.data import OutputCache
+from attribench.data.hdf5_dataset._output_cache import _get_cached_output
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
 from torch import nn
 import torch
-from attribench.functional.metrics.deletion._deletion import _deletion_batch
-from attribench.result import InsertionResult
+from attribench.functional.metrics.deletion._deletion import (
+    _deletion_batch,
+    _deletion_grouped_batch,
+)
+from attribench.result import InsertionResult, ResultSink
 from attribench.result._batch_result import BatchResult
-from torch.utils.data import DataLoader
+from attribench.data._dataloader import _get_dataloader
+from ._stream import _collect
+
+
+def iter_insertion(
+    model: nn.Module,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    maskers: Mapping[str, Masker],
+    activation_fns: Union[List[str], str] = "linear",
+    mode: str = "morf",
+    start: float = 0.0,
+    stop: float = 1.0,
+    num_steps: int = 100,
+    device: Optional[torch.device] = None,
+    tolerance: Optional[float] = None,
+    num_coarse_steps: int = 11,
+    sample_major: bool = False,
+    output_cache: Optional[OutputCache] = None,
+) -> Generator[BatchResult, None, None]:
+    """Computes the Insertion metric batch by batch, and yields the result
+    of each batch as soon as it is computed. See :func:`insertion` for a
+    description of the metric and of the parameters.
+
+    Yields
+    ------
+    BatchResult
+        Result of Insertion on a batch of samples.
+    """
+    if device is None:
+        device = torch.device("cpu")
+    if isinstance(activation_fns, str):
+        activation_fns = [activation_fns]
+    cached_outputs = (
+        output_cache.for_model(model) if output_cache is not None else None
+    )
+
+    if sample_major:
+        dataloader = _get_dataloader(
+            GroupedAttributionsDataset(attributions_dataset),
+            batch_size=batch_size,
+            num_workers=4,
+            pin_memory=True,
+        )
+        for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
+            batch_x = batch_x.to(device)
+            batch_y = batch_y.to(device)
+            method_results = _deletion_grouped_batch(
+                batch_x,
+                batch_y,
+                model,
+                batch_attr,
+                maskers,
+                activation_fns,
+                "morf" if mode == "lerf" else "lerf",  # swap mode
+                1 - start,  # swap start
+                1 - stop,  # swap stop
+                num_steps,
+                tolerance,
+                num_coarse_steps,
+                _get_cached_output(cached_outputs, batch_indices, device),
+            )
+            yield BatchResult.from_method_dict(batch_indices, method_results)
+        return
+
+    dataloader = _get_dataloader(
+        attributions_dataset,
+        batch_size=batch_size,
+        num_workers=4,
+        pin_memory=True,
+    )
+
+    for (
+        batch_indices,
+        batch_x,
+        batch_y,
+        batch_attr,
+        method_names,
+    ) in tqdm(dataloader):
+        batch_x = batch_x.to(device)
+        batch_y = batch_y.to(device)
+        batch_result = _deletion_batch(
+            batch_x,
+            batch_y,
+            model,
+            batch_attr,
+            maskers,
+            activation_fns,
+            "morf" if mode == "lerf" else "lerf",  # swap mode
+            1 - start,  # swap start
+            1 - stop,  # swap stop
+            num_steps,
+            tolerance,
+            num_coarse_steps,
+            _get_cached_output(cached_outputs, batch_indices, device),
+        )
+        yield BatchResult(batch_indices, batch_result, method_names)
 
 
 def insertion(
@@ -21,7 +125,12 @@ def insertion(
     stop: float = 1.0,
     num_steps: int = 100,
     device: Optional[torch.device] = None,
-):
+    tolerance: Optional[float] = None,
+    num_coarse_steps: int = 11,
+    sample_major: bool = False,
+    output_cache: Optional[OutputCache] = None,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[InsertionResult]:
     """Computes the Insertion metric for a given :class:`~attribench.data.AttributionsDataset` and model.
     Insertion can be viewed as an opposite version of the Deletion metric.
 
@@ -39,6 +148,12 @@ def insertion(
     the total number of features. `num_steps` is the number of steps to take
     between `start` and `stop`.
 
+    If `tolerance` is given, the curve is computed adaptively. A coarse grid
+    of `num_coarse_steps` steps is evaluated first. Each interval between
+    evaluated steps is then split in half, as long as the output changes by
+    more than `tolerance` over the interval. The steps are a subset of the
+    `num_steps` steps, so `num_steps` is the finest resolution of the curve.
+
     The Insertion metric is computed for each masker in `maskers` and for each
     activation function in `activation_fns`.
 
@@ -72,21 +187,42 @@ def insertion(
     device : Optional[torch.device], optional
         Device to use, by default `None`.
         If `None`, the CPU is used.
+    tolerance : Optional[float], optional
+        If given, the curve is computed adaptively: a coarse grid of
+        `num_coarse_steps` steps is evaluated first, and intervals are
+        refined only where the output changes by more than `tolerance`.
+        Steps that are not evaluated are stored as NaN, and are linearly
+        interpolated when computing the AUC/AOC.
+        If None, all `num_steps` steps are evaluated.
+        Default: None
+    num_coarse_steps : int, optional
+        Number of steps in the coarse grid. Only used if `tolerance` is given.
+        Default: 11
+    sample_major : bool, optional
+        If True, the metric is computed for all methods on each batch of
+        samples before moving on to the next batch. Work that does not depend
+        on the attributions (loading the samples, the output of the model on
+        the original samples and the baselines of the maskers) is then done
+        once per batch instead of once per method.
+        Default: False
+    output_cache : Optional[OutputCache], optional
+        Cache of the outputs of models on the samples. If the outputs of
+        `model` are in the cache, they are used for the steps
+        in which all features are revealed.
+        Default: None
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
 
     Returns
     -------
-    InsertionResult
-        Result of the Insertion metric.
+    Optional[InsertionResult]
+        If `sinks` is None, the result of Insertion.
     """
-    if device is None:
-        device = torch.device("cpu")
     if isinstance(activation_fns, str):
         activation_fns = [activation_fns]
-
-    dataloader = DataLoader(
-        attributions_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
-    )
-
     result = InsertionResult(
         attributions_dataset.method_names,
         list(maskers.keys()),
@@ -96,26 +232,20 @@ def insertion(
         num_steps,
     )
 
-    for (
-        batch_indices,
-        batch_x,
-        batch_y,
-        batch_attr,
-        method_names,
-    ) in tqdm(dataloader):
-        batch_x = batch_x.to(device)
-        batch_y = batch_y.to(device)
-        batch_result = _deletion_batch(
-            batch_x,
-            batch_y,
-            model,
-            batch_attr,
-            maskers,
-            activation_fns,
-            "morf" if mode == "lerf" else "lerf",  # swap mode
-            1 - start,  # swap start
-            1 - stop,  # swap stop
-            num_steps,
-        )
-        result.add(BatchResult(batch_indices, batch_result, method_names))
-    return result
+    batch_results = iter_insertion(
+        model,
+        attributions_dataset,
+        batch_size,
+        maskers,
+        activation_fns,
+        mode,
+        start,
+        stop,
+        num_steps,
+        device,
+        tolerance,
+        num_coarse_steps,
+        sample_major,
+        output_cache,
+    )
+    return _collect(result, batch_results, sinks)
@@ -1,15 +1,33 @@
 import torch
 from torch import nn
-from typing import List, Union, Mapping, Dict
+from typing import (
+    Dict,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
 from attribench.masking.image import ImageMasker
+from attribench._segmentation import segment_samples
 from attribench.functional.metrics.deletion._dataset import IrofDataset
 from attribench.functional.metrics.deletion._get_predictions import (
-    get_predictions,
+    get_deduplicated_predictions,
+    get_adaptive_predictions,
 )
 from attribench.data import AttributionsDataset
-from torch.utils.data import DataLoader
+from attribench.data import OutputCache
+from attribench.data.hdf5_dataset._output_cache import _get_cached_output
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+    _check_attribution_values,
+)
+from attribench.data._dataloader import _get_dataloader
 from attribench.result._deletion_result import DeletionResult
 from attribench.result._batch_result import BatchResult
+from attribench.result import ResultSink
+from ._stream import _collect
 
 
 def _irof_batch(
@@ -23,19 +41,192 @@ def _irof_batch(
     start: float,
     stop: float,
     num_steps: int,
+    tolerance: Optional[float] = None,
+    num_coarse_steps: int = 11,
+    segmented_images: Optional[torch.Tensor] = None,
+    orig_output: Optional[torch.Tensor] = None,
 ) -> Dict:
     result_dict = {}
+    if segmented_images is None:
+        # Segment once, the segmentation is the same for all maskers
+        segmented_images = torch.tensor(
+            segment_samples(samples.cpu().numpy()), device=samples.device
+        )
     for masker_name, masker in maskers.items():
         masking_dataset = IrofDataset(
-            mode, start, stop, num_steps, samples, masker
+            mode,
+            start,
+            stop,
+            num_steps,
+            samples,
+            masker,
+            segmented_images,
         )
         masking_dataset.set_attrs(attrs)
-        result_dict[masker_name] = get_predictions(
-            masking_dataset, labels, model, activation_fns
-        )
+        if tolerance is None:
+            # Many steps can mask the same segments, especially for images
+            # with few segments. Each distinct state is only evaluated once.
+            result_dict[masker_name] = get_deduplicated_predictions(
+                masking_dataset, labels, model, activation_fns, orig_output
+            )
+        else:
+            result_dict[masker_name] = get_adaptive_predictions(
+                masking_dataset,
+                labels,
+                model,
+                activation_fns,
+                tolerance,
+                num_coarse_steps,
+                orig_output,
+            )
     return result_dict
 
 
+def _irof_grouped_batch(
+    samples: torch.Tensor,
+    labels: torch.Tensor,
+    model: nn.Module,
+    attrs: Mapping[str, torch.Tensor],
+    maskers: Mapping[str, ImageMasker],
+    activation_fns: List[str],
+    mode: str,
+    start: float,
+    stop: float,
+    num_steps: int,
+    tolerance: Optional[float] = None,
+    num_coarse_steps: int = 11,
+    orig_output: Optional[torch.Tensor] = None,
+) -> Dict[str, Dict]:
+    """Computes IROF for a batch of samples and the attributions of all
+    methods for these samples. The segmentation of the samples, the output
+    of the model on the original samples and the baselines of the maskers
+    are computed once, and shared between the methods.
+    """
+    segmented_images = torch.tensor(
+        segment_samples(samples.cpu().numpy()), device=samples.device
+    )
+    if orig_output is None:
+        with torch.no_grad():
+            orig_output = model(samples)
+    return {
+        method_name: _irof_batch(
+            samples,
+            labels,
+            model,
+            method_attrs,
+            maskers,
+            activation_fns,
+            mode,
+            start,
+            stop,
+            num_steps,
+            tolerance,
+            num_coarse_steps,
+            segmented_images,
+            orig_output,
+        )
+        for method_name, method_attrs in attrs.items()
+    }
+
+
+def iter_irof(
+    model: nn.Module,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    maskers: Mapping[str, ImageMasker],
+    activation_fns: Union[List[str], str] = "linear",
+    mode: str = "morf",
+    start: float = 0.0,
+    stop: float = 1.0,
+    num_steps: int = 100,
+    device: torch.device = torch.device("cpu"),
+    tolerance: Optional[float] = None,
+    num_coarse_steps: int = 11,
+    sample_major: bool = False,
+    output_cache: Optional[OutputCache] = None,
+) -> Generator[BatchResult, None, None]:
+    """Computes the IROF metric batch by batch, and yields the result
+    of each batch as soon as it is computed. See :func:`irof` for a
+    description of the metric and of the parameters.
+
+    Yields
+    ------
+    BatchResult
+        Result of IROF on a batch of samples.
+    """
+    _check_attribution_values(attributions_dataset, "IROF")
+    if isinstance(activation_fns, str):
+        activation_fns = [activation_fns]
+
+    model.to(device)
+    model.eval()
+    cached_outputs = (
+        output_cache.for_model(model) if output_cache is not None else None
+    )
+
+    if sample_major:
+        dataloader = _get_dataloader(
+            GroupedAttributionsDataset(attributions_dataset),
+            batch_size=batch_size,
+            num_workers=4,
+            pin_memory=True,
+        )
+        for batch_indices, batch_x, batch_y, batch_attr in dataloader:
+            batch_x = batch_x.to(device)
+            batch_y = batch_y.to(device)
+            method_results = _irof_grouped_batch(
+                batch_x,
+                batch_y,
+                model,
+                batch_attr,
+                maskers,
+                activation_fns,
+                mode,
+                start,
+                stop,
+                num_steps,
+                tolerance,
+                num_coarse_steps,
+                _get_cached_output(cached_outputs, batch_indices, device),
+            )
+            yield BatchResult.from_method_dict(batch_indices, method_results)
+        return
+
+    dataloader = _get_dataloader(
+        attributions_dataset,
+        batch_size=batch_size,
+        num_workers=4,
+        pin_memory=True,
+    )
+
+    for (
+        batch_indices,
+        batch_x,
+        batch_y,
+        batch_attr,
+        method_names,
+    ) in dataloader:
+        batch_x = batch_x.to(device)
+        batch_y = batch_y.to(device)
+        batch_result = _irof_batch(
+            batch_x,
+            batch_y,
+            model,
+            batch_attr,
+            maskers,
+            activation_fns,
+            mode,
+            start,
+            stop,
+            num_steps,
+            tolerance,
+            num_coarse_steps,
+            None,
+            _get_cached_output(cached_outputs, batch_indices, device),
+        )
+        yield BatchResult(batch_indices, batch_result, method_names)
+
+
 def irof(
     model: nn.Module,
     attributions_dataset: AttributionsDataset,
@@ -47,7 +238,12 @@ def irof(
     stop: float = 1.0,
     num_steps: int = 100,
     device: torch.device = torch.device("cpu"),
-):
+    tolerance: Optional[float] = None,
+    num_coarse_steps: int = 11,
+    sample_major: bool = False,
+    output_cache: Optional[OutputCache] = None,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[DeletionResult]:
     """Computes the IROF metric for a given :class:`~attribench.data.AttributionsDataset` and model.
 
     IROF starts segmenting the input image using SLIC. Then, it iteratively
@@ -64,6 +260,12 @@ def irof(
     the total number of segments. `num_steps` is the number of steps to take
     between `start` and `stop`.
 
+    If `tolerance` is given, the curve is computed adaptively. A coarse grid
+    of `num_coarse_steps` steps is evaluated first. Each interval between
+    evaluated steps is then split in half, as long as the output changes by
+    more than `tolerance` over the interval. The steps are a subset of the
+    `num_steps` steps, so `num_steps` is the finest resolution of the curve.
+
     The IROF metric is computed for each masker in `maskers` and for each
     activation function in `activation_fns`.
 
@@ -94,17 +296,46 @@ def irof(
     num_steps : int, optional
         Number of steps to take between `start` and `stop`.
         Default: 100
+    device : torch.device, optional
+        Device to use.
+        Default: `torch.device("cpu")`
+    tolerance : Optional[float], optional
+        If given, the curve is computed adaptively: a coarse grid of
+        `num_coarse_steps` steps is evaluated first, and intervals are
+        refined only where the output changes by more than `tolerance`.
+        Steps that are not evaluated are stored as NaN, and are linearly
+        interpolated when computing the AUC/AOC.
+        If None, all `num_steps` steps are evaluated.
+        Default: None
+    num_coarse_steps : int, optional
+        Number of steps in the coarse grid. Only used if `tolerance` is given.
+        Default: 11
+    sample_major : bool, optional
+        If True, the metric is computed for all methods on each batch of
+        samples before moving on to the next batch. Work that does not depend
+        on the attributions (loading and segmenting the samples, the output of
+        the model on the original samples and the baselines of the maskers) is
+        then done once per batch instead of once per method.
+        Default: False
+    output_cache : Optional[OutputCache], optional
+        Cache of the outputs of models on the samples. If the outputs of
+        `model` are in the cache, they are used for the steps
+        in which no segments are masked.
+        Default: None
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
+
+    Returns
+    -------
+    Optional[DeletionResult]
+        If `sinks` is None, the result of IROF.
     """
+    _check_attribution_values(attributions_dataset, "IROF")
     if isinstance(activation_fns, str):
         activation_fns = [activation_fns]
-
-    model.to(device)
-    model.eval()
-
-    dataloader = DataLoader(
-        attributions_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
-    )
-
     result = DeletionResult(
         attributions_dataset.method_names,
         list(maskers.keys()),
@@ -114,25 +345,20 @@ def irof(
         num_steps=num_steps,
     )
 
-    for (
-        batch_indices,
-        batch_x,
-        batch_y,
-        batch_attr,
-        method_names,
-    ) in dataloader:
-        batch_x = batch_x.to(device)
-        batch_y = batch_y.to(device)
-        batch_result = _irof_batch(
-            batch_x,
-            batch_y,
-            model,
-            batch_attr,
-            maskers,
-            activation_fns,
-            mode,
-            start,
-            stop,
-            num_steps,
-        )
-        result.add(BatchResult(batch_indices, batch_result, method_names))
+    batch_results = iter_irof(
+        model,
+        attributions_dataset,
+        batch_size,
+        maskers,
+        activation_fns,
+        mode,
+        start,
+        stop,
+        num_steps,
+        device,
+        tolerance,
+        num_coarse_steps,
+        sample_major,
+        output_cache,
+    )
+    return _collect(result, batch_results, sinks)
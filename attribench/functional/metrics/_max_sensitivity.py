@@ -1,13 +1,15 @@
-from attribench.result import MaxSensitivityResult
+from attribench.result import MaxSensitivityResult, ResultSink
 from attribench.result._grouped_batch_result import GroupedBatchResult
-from typing import Dict
+from typing import Dict, Generator, Optional, Sequence
 from attribench.data import AttributionsDataset
 from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
+    _check_attribution_values,
 )
 import torch
 from attribench._attribution_method import AttributionMethod
-from torch.utils.data import DataLoader
+from attribench.data._dataloader import _get_dataloader
+from ._stream import _collect
 import math
 from tqdm import tqdm
 
@@ -26,7 +28,9 @@ def _max_sensitivity_batch(
     num_perturbations: int,
     radius: float,
     device: torch.device,
-) -> Dict[str, torch.Tensor]:
+    tolerance: Optional[float] = None,
+    patience: int = 5,
+) -> Dict[str, torch.Tensor] | Dict[str, Dict[str, torch.Tensor]]:
     if set(method_dict.keys()) != set(batch_attr.keys()):
         print(method_dict.keys())
         print(batch_attr.keys())
@@ -34,11 +38,12 @@ def _max_sensitivity_batch(
             "Method dictionary and batch attributions dictionary"
             " must have the same keys."
         )
-    result: Dict[str, torch.Tensor] = {
+    result: Dict = {
         method_name: torch.zeros(1) for method_name in method_dict.keys()
     }
     batch_x = batch_x.to(device)
     batch_y = batch_y.to(device)
+    batch_size = batch_x.shape[0]
 
     # Compute Max-Sensitivity for each method
     for method_name, method in method_dict.items():
@@ -46,30 +51,114 @@ def _max_sensitivity_batch(
         # TODO we are not taking into account the aggregation here
         # TODO also the AttributionsDataset is not being used
         attrs = _normalize_attrs(method(batch_x, batch_y).detach()).cpu()
-        diffs = []
+
+        # Running maximum of the attribution differences and number of
+        # perturbations used for each sample
+        # [batch_size]
+        max_diffs = torch.zeros(batch_size)
+        used = torch.zeros(batch_size, dtype=torch.long)
+        # Number of consecutive perturbations for which the running maximum
+        # did not increase by more than the tolerance
+        # [batch_size]
+        num_stable = torch.zeros(batch_size, dtype=torch.long)
+        # Samples that still need to be perturbed
+        active = torch.arange(batch_size)
 
         for _ in range(num_perturbations):
+            if len(active) == 0:
+                break
+            active_x = batch_x[active.to(device)]
             # Add uniform noise with infinity norm <= radius
             # torch.rand generates noise between 0 and 1
             # => This generates noise between -radius and radius
             noise = (
-                torch.rand(batch_x.shape, device=device) * 2 * radius - radius
+                torch.rand(active_x.shape, device=device) * 2 * radius - radius
             )
-            noisy_samples = batch_x + noise
+            noisy_samples = active_x + noise
             # Get new attributions from noisy samples
             noisy_attrs = _normalize_attrs(
-                method(noisy_samples, batch_y).detach()
+                method(noisy_samples, batch_y[active.to(device)]).detach()
             )
             # Get relative norm of attribution difference
+            # [num_active]
+            diffs = torch.norm(noisy_attrs.cpu() - attrs[active], dim=1)
+            new_max = torch.maximum(max_diffs[active], diffs)
+            used[active] += 1
+
+            if tolerance is not None:
+                # A sample is stable if its running maximum did not grow
+                # by more than the relative tolerance during the
+                # last `patience` perturbations
+                increased = new_max - max_diffs[active] > tolerance * new_max
+                num_stable[active] = torch.where(
+                    increased,
+                    torch.zeros_like(num_stable[active]),
+                    num_stable[active] + 1,
+                )
+                max_diffs[active] = new_max
+                # Compact the active set
+                active = active[num_stable[active] < patience]
+            else:
+                max_diffs[active] = new_max
+
+        if tolerance is None:
             # [batch_size]
-            diffs.append(torch.norm(noisy_attrs.cpu() - attrs, dim=1).detach())
-        # [batch_size, num_perturbations]
-        diffs = torch.stack(diffs, 1)
-        # [batch_size]
-        result[method_name] = diffs.max(dim=1)[0].cpu()
+            result[method_name] = max_diffs
+        else:
+            result[method_name] = {
+                "value": max_diffs,
+                "num_perturbations": used,
+            }
     return result
 
 
+def iter_max_sensitivity(
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    method_dict: Dict[str, AttributionMethod],
+    num_perturbations: int,
+    radius: float,
+    device: torch.device = torch.device("cpu"),
+    tolerance: Optional[float] = None,
+    patience: int = 5,
+) -> Generator[GroupedBatchResult, None, None]:
+    """Computes the Max-Sensitivity metric batch by batch, and yields the
+    result of each batch as soon as it is computed.
+    See :func:`max_sensitivity` for a description of the metric and of the
+    parameters.
+
+    Yields
+    ------
+    GroupedBatchResult
+        Result of Max-Sensitivity on a batch of samples.
+    """
+    _check_attribution_values(attributions_dataset, "Max-Sensitivity")
+    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
+    dataloader = _get_dataloader(
+        grouped_dataset,
+        batch_size=batch_size,
+        num_workers=4,
+        pin_memory=True,
+    )
+
+    for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
+        batch_x = batch_x.to(device)
+        batch_y = batch_y.to(device)
+
+        batch_result = _max_sensitivity_batch(
+            batch_x,
+            batch_y,
+            batch_attr,
+            method_dict,
+            num_perturbations,
+            radius,
+            device,
+            tolerance,
+            patience,
+        )
+        yield GroupedBatchResult(batch_indices, batch_result)
+
+
 def max_sensitivity(
     attributions_dataset: AttributionsDataset,
     batch_size: int,
@@ -77,7 +166,10 @@ def max_sensitivity(
     num_perturbations: int,
     radius: float,
     device: torch.device = torch.device("cpu"),
-) -> MaxSensitivityResult:
+    tolerance: Optional[float] = None,
+    patience: int = 5,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[MaxSensitivityResult]:
     """Computes the Max-Sensitivity metric for a given `Dataset` and attribution
     methods. Max-Sensitivity is computed by adding a small amount of uniform noise
     to the input samples and computing the norm of the difference in attributions
@@ -89,6 +181,13 @@ def max_sensitivity(
     is large, then the attributions are not robust to small perturbations in the
     input.
 
+    If `tolerance` is given, Max-Sensitivity is computed adaptively:
+    `num_perturbations` is then the maximal number of perturbations per
+    sample. A sample is no longer perturbed as soon as its running maximum
+    has not increased by more than a fraction `tolerance` of its value
+    during the last `patience` perturbations. The number of perturbations
+    that was actually used for each sample is stored in the result.
+
     Parameters
     ----------
     attributions_dataset : Dataset
@@ -104,32 +203,39 @@ def max_sensitivity(
         The radius of the uniform noise to add to the input samples.
     device : torch.device, optional
         Device to use, by default `torch.device("cpu")`.
-    """
-    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
-    dataloader = DataLoader(
-        grouped_dataset,
-        batch_size=batch_size,
-        num_workers=4,
-        pin_memory=True,
-    )
+    tolerance : Optional[float], optional
+        Relative tolerance for adaptive early stopping.
+        If None, exactly `num_perturbations` perturbations are used for
+        each sample. By default None.
+    patience : int, optional
+        Number of consecutive perturbations for which the running maximum
+        must be stable before a sample is stopped. Only used if `tolerance`
+        is given. By default 5.
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
 
-    method_names = list(method_dict.keys())
+    Returns
+    -------
+    Optional[MaxSensitivityResult]
+        If `sinks` is None, the result of Max-Sensitivity.
+    """
+    _check_attribution_values(attributions_dataset, "Max-Sensitivity")
     result = MaxSensitivityResult(
-        method_names,
-        num_samples=len(grouped_dataset),
+        list(method_dict.keys()),
+        num_samples=attributions_dataset.num_samples,
+        adaptive=tolerance is not None,
     )
-    for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
-        batch_x = batch_x.to(device)
-        batch_y = batch_y.to(device)
-
-        batch_result = _max_sensitivity_batch(
-            batch_x,
-            batch_y,
-            batch_attr,
-            method_dict,
-            num_perturbations,
-            radius,
-            device,
-        )
-        result.add(GroupedBatchResult(batch_indices, batch_result))
-    return result
\ No newline at end of file
+    batch_results = iter_max_sensitivity(
+        attributions_dataset,
+        batch_size,
+        method_dict,
+        num_perturbations,
+        radius,
+        device,
+        tolerance,
+        patience,
+    )
+    return _collect(result, batch_results, sinks)
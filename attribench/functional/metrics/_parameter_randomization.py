@@ -4,26 +4,179 @@ from ...data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
 )
 from ... import MethodFactory, AttributionMethod, ModelFactory
-from ...result import ParameterRandomizationResult
+from ...result import ParameterRandomizationResult, ResultSink
 from ...result._grouped_batch_result import GroupedBatchResult
-from typing import Dict, Callable
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 import torch
-from torch.utils.data import DataLoader
+from torch import nn
+from ...data._dataloader import _get_dataloader
 from ..._stat import rowwise_spearmanr
+from ._stream import _collect
+
+
+def _get_randomizable_layers(
+    model: nn.Module,
+) -> List[Tuple[str, nn.Module]]:
+    """Returns the layers of the model that can be randomized, along with
+    their names in the model, in the order in which they were registered.
+    """
+    return [
+        (name, module)
+        for name, module in model.named_modules()
+        if hasattr(module, "reset_parameters")
+    ]
+
+
+def _get_cascading_layers(model: nn.Module) -> List[Tuple[str, nn.Module]]:
+    """Returns the layers of the model that can be randomized, from top
+    (output) to bottom (input). The order is derived from the order in which
+    the modules were registered in the model.
+    """
+    return _get_randomizable_layers(model)[::-1]
+
+
+def _layer_name(name: str) -> str:
+    # The root module has an empty name
+    return name if name != "" else "model"
+
+
+def _clone_state(model: nn.Module) -> Dict[str, torch.Tensor]:
+    return {
+        key: value.detach().clone()
+        for key, value in model.state_dict().items()
+    }
+
+
+class _RandomizedParameters:
+    """Original parameters of a model and `num_seeds` independent random
+    re-initializations of the layers that can be randomized.
+
+    Parameter sets are full state dicts that are loaded into the original
+    model object. This way, attribution methods are created for the model
+    itself, and can refer to its layers (e.g. GradCAM).
+
+    Re-initialization ``i`` is computed on the CPU using seed ``seed + i``,
+    without affecting the global random state. The parameter sets therefore
+    only depend on `seed`, not on the device or the process.
+    """
+
+    def __init__(
+        self, model: nn.Module, num_seeds: int = 1, seed: int | None = None
+    ):
+        """
+        Parameters
+        ----------
+        model : nn.Module
+            Model to randomize. Must be on the CPU. Its parameters are
+            restored afterwards.
+        num_seeds : int, optional
+            Number of independent random re-initializations, by default 1
+        seed : int | None, optional
+            Seed for the first re-initialization. If None, a seed is drawn
+            from the global random number generator. By default None
+        """
+        if seed is None:
+            seed = _draw_seed()
+        self.layers = _get_cascading_layers(model)
+        self.original = _clone_state(model)
+        # Keys of the parameters and buffers of each layer
+        self.layer_keys = [
+            set(layer.state_dict(prefix=f"{name}." if name else "").keys())
+            for name, layer in self.layers
+        ]
+        all_keys = set().union(*self.layer_keys)
+        self.randomized: List[Dict[str, torch.Tensor]] = []
+        for i in range(num_seeds):
+            with torch.random.fork_rng(devices=[]):
+                torch.random.default_generator.manual_seed(seed + i)
+                for _, layer in self.layers:
+                    layer.reset_parameters()
+            self.randomized.append(
+                {
+                    key: value
+                    for key, value in _clone_state(model).items()
+                    if key in all_keys
+                }
+            )
+        model.load_state_dict(self.original)
+
+    def to(self, device: torch.device) -> "_RandomizedParameters":
+        """Moves the parameter sets to the given device."""
+        self.original = {
+            key: value.to(device) for key, value in self.original.items()
+        }
+        self.randomized = [
+            {key: value.to(device) for key, value in randomized.items()}
+            for randomized in self.randomized
+        ]
+        return self
 
+    def parameter_sets(
+        self, num_layers: Optional[int] = None
+    ) -> List[Dict[str, torch.Tensor]]:
+        """Returns a state dict for each re-initialization, in which the
+        top `num_layers` layers are randomized. If `num_layers` is None,
+        all layers are randomized. The tensors are shared, not copied.
+        """
+        keys = set().union(*self.layer_keys[:num_layers])
+        return [
+            {
+                key: randomized[key] if key in keys else value
+                for key, value in self.original.items()
+            }
+            for randomized in self.randomized
+        ]
 
-def _randomize_parameters(model_factory: ModelFactory) -> torch.nn.Module:
-    randomized_model = model_factory()
-    for layer in randomized_model.modules():
-        if hasattr(layer, "reset_parameters"):
-            layer.reset_parameters()
-    return randomized_model
+
+def _draw_seed() -> int:
+    """Draws a seed for the random re-initializations from the global
+    random number generator, so results follow ``torch.manual_seed``.
+    """
+    return int(torch.randint(2**31, ()).item())
+
+
+def _get_randomized_model(
+    model_factory: ModelFactory,
+    device: torch.device,
+    num_seeds: int = 1,
+    seed: int | None = None,
+) -> Tuple[nn.Module, _RandomizedParameters]:
+    """Creates a model to compute randomized attributions with, along with
+    the randomized parameter sets to load into it.
+    """
+    model = model_factory()
+    model.eval()
+    # The model is randomized on the CPU, so that the same seed gives the
+    # same parameters on every device
+    model.to("cpu")
+    randomized_parameters = _RandomizedParameters(model, num_seeds, seed)
+    model.to(device)
+    return model, randomized_parameters.to(device)
+
+
+def _add_layer_level(
+    batch_result: Dict[str, torch.Tensor], layer_name: str
+) -> Dict[str, Dict[str, torch.Tensor]]:
+    return {
+        method_name: {layer_name: method_result}
+        for method_name, method_result in batch_result.items()
+    }
 
 
 def _parameter_randomization_batch(
     batch_x: torch.Tensor,
     batch_y: torch.Tensor,
     batch_attr: Dict[str, torch.Tensor],
+    model: nn.Module,
+    parameter_sets: List[Dict[str, torch.Tensor]],
     method_dict_rand: Dict[str, AttributionMethod],
     device: torch.device,
     agg_fn: Callable[
@@ -41,38 +194,166 @@ def _parameter_randomization_batch(
             "Method dictionary and batch attributions dictionary"
             " must have the same keys."
         )
-    result: Dict[str, torch.Tensor] = {
-        method_name: torch.zeros(1) for method_name in method_dict_rand.keys()
-    }
     batch_x = batch_x.to(device)
     batch_y = batch_y.to(device)
+    num_seeds = len(parameter_sets)
 
-    for method_name, method in method_dict_rand.items():
-        # If attributions were aggregated, we need to perform the same
-        # aggregations on the randomized attributions
-        attrs_rand = method(batch_x, batch_y).detach().cpu()
-        if agg_fn is not None:
-            assert agg_dim is not None
-            # agg_dim is expressed in terms of sample dimension, need to add
-            # 1 to account for batch dimension
-            attrs_rand = agg_fn(attrs_rand, agg_dim+1)
-        attrs_rand = attrs_rand.flatten(1)
-
-        attrs_orig = batch_attr[method_name].cpu().flatten(1)
-        result[method_name] = torch.tensor(
-            rowwise_spearmanr(attrs_rand.numpy(), attrs_orig.numpy())
-        )
+    method_names = list(method_dict_rand.keys())
+    # method index -> seed -> [batch_size, num_features]
+    attrs_rand_list: List[List[torch.Tensor]] = [[] for _ in method_names]
+    for state in parameter_sets:
+        # The methods were created for this model, so loading the
+        # parameter set is enough to apply them to the randomized model
+        model.load_state_dict(state)
+        for method_idx, method_name in enumerate(method_names):
+            attrs_rand = method_dict_rand[method_name](
+                batch_x, batch_y
+            ).detach()
+            # If attributions were aggregated, we need to perform the same
+            # aggregations on the randomized attributions
+            if agg_fn is not None:
+                assert agg_dim is not None
+                # agg_dim is expressed in terms of sample dimension, need to
+                # add 1 to account for batch dimension
+                attrs_rand = agg_fn(attrs_rand, agg_dim + 1)
+            attrs_rand_list[method_idx].append(attrs_rand.flatten(1))
+    attrs_orig_list = [
+        batch_attr[method_name].to(device).flatten(1)
+        for method_name in method_names
+    ]
+
+    # Compute correlations for all methods and seeds at once
+    # [num_methods, num_seeds, batch_size, num_features]
+    attrs_rand = torch.stack(
+        [torch.stack(method_attrs) for method_attrs in attrs_rand_list]
+    )
+    # [num_methods, 1, batch_size, num_features]
+    attrs_orig = torch.stack(attrs_orig_list).unsqueeze(1)
+    # [num_methods, num_seeds, batch_size]
+    corrs = rowwise_spearmanr(attrs_rand, attrs_orig.to(attrs_rand.device))
+    assert isinstance(corrs, torch.Tensor)
+    corrs = corrs.cpu()
 
+    result: Dict[str, torch.Tensor] = {}
+    for method_idx, method_name in enumerate(method_names):
+        if num_seeds > 1:
+            # [batch_size, num_seeds]
+            result[method_name] = corrs[method_idx].transpose(0, 1)
+        else:
+            # [batch_size]
+            result[method_name] = corrs[method_idx, 0]
     return result
 
 
+def _iter_parameter_randomization(
+    model: nn.Module,
+    randomized_parameters: _RandomizedParameters,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    method_factory: MethodFactory,
+    device: torch.device,
+    cascading: bool,
+) -> Generator[GroupedBatchResult, None, None]:
+    # The methods are created once for the model, the randomized parameter
+    # sets are loaded into it for each batch
+    method_dict_rand = method_factory(model)
+    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
+    dataloader = _get_dataloader(
+        grouped_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
+    )
+
+    agg_fn = None
+    agg_dim = None
+    if attributions_dataset.aggregate_fn is not None:
+        agg_fn = attributions_dataset.aggregate_fn
+        agg_dim = attributions_dataset.aggregate_dim
+
+    if not cascading:
+        parameter_sets = randomized_parameters.parameter_sets()
+        for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
+            batch_result = _parameter_randomization_batch(
+                batch_x,
+                batch_y,
+                batch_attr,
+                model,
+                parameter_sets,
+                method_dict_rand,
+                device,
+                agg_fn,
+                agg_dim,
+            )
+            yield GroupedBatchResult(batch_indices, batch_result)
+        return
+
+    # Cascading randomization: layers are randomized one at a time, and all
+    # methods are evaluated on the full dataset at each stage.
+    for layer_idx, (name, _) in enumerate(randomized_parameters.layers):
+        parameter_sets = randomized_parameters.parameter_sets(layer_idx + 1)
+        layer_name = _layer_name(name)
+        for batch_indices, batch_x, batch_y, batch_attr in tqdm(
+            dataloader, desc=layer_name
+        ):
+            batch_result = _parameter_randomization_batch(
+                batch_x,
+                batch_y,
+                batch_attr,
+                model,
+                parameter_sets,
+                method_dict_rand,
+                device,
+                agg_fn,
+                agg_dim,
+            )
+            yield GroupedBatchResult(
+                batch_indices, _add_layer_level(batch_result, layer_name)
+            )
+
+
+def iter_parameter_randomization(
+    model_factory: ModelFactory,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    method_factory: MethodFactory,
+    device: torch.device = torch.device("cpu"),
+    cascading: bool = False,
+    num_seeds: int = 1,
+    seed: Optional[int] = None,
+) -> Generator[GroupedBatchResult, None, None]:
+    """Computes the Parameter Randomization metric batch by batch, and
+    yields the result of each batch as soon as it is computed.
+    See :func:`parameter_randomization` for a description of the metric and
+    of the parameters.
+
+    Yields
+    ------
+    GroupedBatchResult
+        Result of Parameter Randomization on a batch of samples.
+    """
+    model, randomized_parameters = _get_randomized_model(
+        model_factory, device, num_seeds, seed
+    )
+    yield from _iter_parameter_randomization(
+        model,
+        randomized_parameters,
+        attributions_dataset,
+        batch_size,
+        method_factory,
+        device,
+        cascading,
+    )
+
+
 def parameter_randomization(
     model_factory: ModelFactory,
     attributions_dataset: AttributionsDataset,
     batch_size: int,
     method_factory: MethodFactory,
     device: torch.device = torch.device("cpu"),
-) -> ParameterRandomizationResult:
+    cascading: bool = False,
+    num_seeds: int = 1,
+    sinks: Optional[Sequence[ResultSink]] = None,
+    seed: Optional[int] = None,
+) -> Optional[ParameterRandomizationResult]:
     """
     Computes the Parameter Randomization metric for a given
     :class:`~attribench.data.AttributionsDataset`.
@@ -88,6 +369,23 @@ def parameter_randomization(
     Hardt, M., & Kim, B. (2018). Sanity checks for saliency maps.
     Advances in neural information processing systems, 31.
 
+    If `cascading` is True, the cascading variant of the metric is computed.
+    Layers are randomized one by one, from the top (output) layer down to the
+    bottom (input) layer, and the metric is computed after each layer is
+    randomized. The dataset is processed once per layer. The result then
+    contains an additional ``layer`` level.
+
+    As a single random re-initialization gives a noisy result, the metric
+    can be computed for `num_seeds` independent re-initializations in the
+    same pass over the dataset. For each batch, the parameter sets are loaded
+    into the model one after the other, and every attribution method is
+    applied for each of them. The methods are created only once, by calling
+    `method_factory` on the model returned by `model_factory`, so methods
+    that refer to specific layers of the model (e.g. GradCAM) are supported.
+    The result then contains the correlation for each seed, and its mean and
+    standard deviation can be retrieved using
+    :meth:`~attribench.result.ParameterRandomizationResult.get_df`.
+
     Parameters
     ----------
     model_factory : ModelFactory
@@ -103,43 +401,49 @@ def parameter_randomization(
         method names to AttributionMethod objects.
     device : torch.device, optional
         Device to use when computing the metric, by default torch.device("cpu")
+    cascading : bool, optional
+        Whether to compute the cascading variant of the metric,
+        by default False
+    num_seeds : int, optional
+        Number of independent random re-initializations of the model,
+        by default 1
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`. By default None
+    seed : Optional[int], optional
+        Seed for the random re-initializations. Re-initialization ``i`` uses
+        seed ``seed + i``, so a run with ``num_seeds=1`` and seed ``s + i``
+        reproduces seed ``i`` of a run with seed ``s``. The global random
+        state is not affected. If None, the seed is drawn from the global
+        random number generator. By default None
 
     Returns
     -------
-    ParameterRandomizationResult
-        Result of the Parameter Randomization metric computation.
+    Optional[ParameterRandomizationResult]
+        If `sinks` is None, the result of the Parameter Randomization metric
+        computation.
     """
-    
-    randomized_model = _randomize_parameters(model_factory)
-    randomized_model.to(device)
-    randomized_model.eval()
-
-    method_dict_rand = method_factory(randomized_model)
-    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
-    dataloader = DataLoader(
-        grouped_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
+    model, randomized_parameters = _get_randomized_model(
+        model_factory, device, num_seeds, seed
     )
-
-    method_names = method_factory.get_method_names()
     result = ParameterRandomizationResult(
-        method_names, num_samples=len(grouped_dataset)
+        method_factory.get_method_names(),
+        num_samples=attributions_dataset.num_samples,
+        layers=(
+            [_layer_name(name) for name, _ in randomized_parameters.layers]
+            if cascading
+            else None
+        ),
+        num_seeds=num_seeds,
     )
-
-    for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
-        agg_fn = None
-        agg_dim = None
-        if attributions_dataset.aggregate_fn is not None:
-            agg_fn = attributions_dataset.aggregate_fn
-            agg_dim = attributions_dataset.aggregate_dim
-
-        batch_result = _parameter_randomization_batch(
-            batch_x,
-            batch_y,
-            batch_attr,
-            method_dict_rand,
-            device,
-            agg_fn,
-            agg_dim,
-        )
-        result.add(GroupedBatchResult(batch_indices, batch_result))
-    return result
+    batch_results = _iter_parameter_randomization(
+        model,
+        randomized_parameters,
+        attributions_dataset,
+        batch_size,
+        method_factory,
+        device,
+        cascading,
+    )
+    return _collect(result, batch_results, sinks)
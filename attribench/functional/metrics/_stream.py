@@ -0,0 +1,43 @@
+from typing import Generator, Optional, Sequence, TypeVar, Union
+from attribench.result import MetricResult, ResultSink
+from attribench.result._batch_result import BatchResult
+from attribench.result._grouped_batch_result import GroupedBatchResult
+
+ResultType = TypeVar("ResultType", bound=MetricResult)
+
+
+def _collect(
+    result: ResultType,
+    batch_results: Generator[
+        Union[BatchResult, GroupedBatchResult], None, None
+    ],
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[ResultType]:
+    """Consumes the results of a metric computed by one of the iterator
+    variants of the functional metrics (e.g. ``iter_deletion``).
+
+    If `sinks` is None, the batch results are added to `result`, which is
+    returned. Otherwise, the batch results are passed to the sinks and None
+    is returned. `result` is then only used to describe the structure of the
+    results to the sinks. The computation stops as soon as any sink
+    requests it.
+    """
+    if sinks is None:
+        for batch_result in batch_results:
+            result.add(batch_result)
+        return result
+
+    for sink in sinks:
+        sink.open(result)
+    try:
+        for batch_result in batch_results:
+            for sink in sinks:
+                sink.add(batch_result)
+            if any(sink.stop for sink in sinks):
+                break
+    finally:
+        # Closing the generator stops the underlying DataLoader
+        batch_results.close()
+        for sink in sinks:
+            sink.close()
+    return None
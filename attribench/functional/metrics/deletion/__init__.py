@@ -1 +1 @@
-from ._deletion import deletion
\ No newline at end of file
+from ._deletion import deletion, iter_deletion
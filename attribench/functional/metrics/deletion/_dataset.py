@@ -1,3 +1,4 @@
+from typing import Optional
 import numpy as np
 import torch
 
@@ -6,6 +7,12 @@ from attribench.masking import Masker
 from attribench.masking.image import ImageMasker
 
 
+def _segment(samples: torch.Tensor) -> torch.Tensor:
+    return torch.tensor(
+        segment_samples(samples.cpu().numpy()), device=samples.device
+    )
+
+
 class MaskingDataset:
     def __init__(self, mode: str, start: float, stop: float, num_steps: int):
         if mode not in ("morf", "lerf"):
@@ -23,6 +30,20 @@ class MaskingDataset:
     def __getitem__(self, item):
         raise NotImplementedError
 
+    def get_num_to_mask(self, item: int) -> np.ndarray:
+        """Returns the number of features that are masked in each sample
+        at the given step (shape: [batch_size]).
+        """
+        raise NotImplementedError
+
+    def mask_states(
+        self, sample_indices: np.ndarray, num_to_mask: np.ndarray
+    ) -> torch.Tensor:
+        """Masks ``num_to_mask[i]`` features of sample ``sample_indices[i]``,
+        for each i. The same sample can occur multiple times.
+        """
+        raise NotImplementedError
+
 
 class DeletionDataset(MaskingDataset):
     def __init__(
@@ -59,6 +80,53 @@ class DeletionDataset(MaskingDataset):
         )
         return masked_samples
 
+    def get_num_to_mask(self, item: int) -> np.ndarray:
+        return np.full(self.samples.shape[0], self.mask_range[item])
+
+    def mask_states(
+        self, sample_indices: np.ndarray, num_to_mask: np.ndarray
+    ) -> torch.Tensor:
+        """Masks the top (MoRF) or bottom (LeRF) ``num_to_mask[i]`` features
+        of sample ``sample_indices[i]``, for each i.
+        The same sample can occur multiple times.
+
+        Returns
+        -------
+        torch.Tensor
+            Masked samples (shape: [len(sample_indices), *sample_shape])
+        """
+        masker = self.masker
+        assert masker.sorted_indices is not None
+        assert masker.baseline is not None
+        sorted_indices = torch.as_tensor(masker.sorted_indices)
+        device = self.samples.device
+        index = torch.tensor(sample_indices, device=device)
+        num_features = sorted_indices.shape[1]
+
+        # Rank of each feature in the sorted order
+        # [len(sample_indices), num_features]
+        sorted_indices = sorted_indices.to(device)[index]
+        ranks = torch.empty_like(sorted_indices).scatter_(
+            1,
+            sorted_indices,
+            torch.arange(num_features, device=device).expand_as(
+                sorted_indices
+            ),
+        )
+        k = torch.tensor(num_to_mask, device=device)[:, None]
+        bool_mask = (
+            ranks >= num_features - k if self.mode == "morf" else ranks < k
+        )
+        if num_features == self.samples[0].numel():
+            # Features correspond to individual values in the samples
+            bool_mask = bool_mask.reshape(-1, *self.samples.shape[1:])
+        else:
+            # Features correspond to pixels, mask all color channels
+            bool_mask = bool_mask.reshape(-1, 1, *self.samples.shape[2:])
+        samples = self.samples[index]
+        baseline = masker.baseline.to(device)[index]
+        return samples - (bool_mask * samples) + (bool_mask * baseline)
+
 
 class IrofDataset(MaskingDataset):
     def __init__(
@@ -69,12 +137,16 @@ class IrofDataset(MaskingDataset):
         num_steps: int,
         samples: torch.Tensor,
         masker: ImageMasker,
+        segmented_images: Optional[torch.Tensor] = None,
     ):
         super().__init__(mode, start, stop, num_steps)
         self.samples = samples
         self.masker = masker
-        self.segmented_images = torch.tensor(
-            segment_samples(samples.cpu().numpy()), device=samples.device
+        # Segmentation can be given if it was already computed
+        self.segmented_images = (
+            segmented_images
+            if segmented_images is not None
+            else _segment(samples)
         )
 
     def __len__(self):
@@ -94,3 +166,52 @@ class IrofDataset(MaskingDataset):
 
     def set_attrs(self, attrs: torch.Tensor):
         self.masker.set_batch(self.samples, attrs, self.segmented_images)
+
+    def get_num_to_mask(self, item: int) -> np.ndarray:
+        """Returns the number of segments that are masked in each sample
+        at the given step (shape: [batch_size]).
+        """
+        assert self.masker.sorted_indices is not None
+        to_mask = self.start + (item / (self.num_steps - 1)) * (
+            self.stop - self.start
+        )
+        return np.array(
+            [
+                int(len(sorted_indices) * to_mask)
+                for sorted_indices in self.masker.sorted_indices
+            ]
+        )
+
+    def mask_states(
+        self, sample_indices: np.ndarray, num_to_mask: np.ndarray
+    ) -> torch.Tensor:
+        """Masks the top (MoRF) or bottom (LeRF) ``num_to_mask[i]`` segments
+        of sample ``sample_indices[i]``, for each i.
+        The same sample can occur multiple times.
+
+        Returns
+        -------
+        torch.Tensor
+            Masked samples (shape: [len(sample_indices), *sample_shape])
+        """
+        masker = self.masker
+        assert masker.sorted_indices is not None
+        assert masker.baseline is not None
+        bool_masks = []
+        for sample_idx, num in zip(sample_indices, num_to_mask):
+            sorted_indices = masker.sorted_indices[sample_idx]
+            segments = (
+                sorted_indices[len(sorted_indices) - num :]
+                if self.mode == "morf"
+                else sorted_indices[:num]
+            )
+            seg_img = self.segmented_images[sample_idx]
+            bool_masks.append(
+                (seg_img[..., None] == segments.to(seg_img.device)).any(-1)
+            )
+        # [num_states, 1, height, width]
+        bool_mask = torch.stack(bool_masks)
+        index = torch.tensor(sample_indices, device=self.samples.device)
+        samples = self.samples[index]
+        baseline = masker.baseline[index]
+        return samples - (bool_mask * samples) + (bool_mask * baseline)
@@ -1,4 +1,6 @@
-from typing import Callable, List, Dict
+from typing import Callable, List, Dict, Tuple, Optional
+
+import numpy as np
 
 import torch
 
@@ -11,11 +13,18 @@ def get_predictions(
     labels: torch.Tensor,
     model: Callable,
     activation_fns: List[str],
+    orig_output: Optional[torch.Tensor] = None,
 ) -> Dict[str, torch.Tensor]:
     preds = {fn: [] for fn in activation_fns}
     for i, batch in enumerate(iter(masking_dataset)):
-        with torch.no_grad():
-            predictions = model(batch)
+        if orig_output is not None and not np.any(
+            masking_dataset.get_num_to_mask(i)
+        ):
+            # Nothing is masked, re-use the original output
+            predictions = orig_output
+        else:
+            with torch.no_grad():
+                predictions = model(batch)
         for fn in activation_fns:
             preds[fn].append(
                 ACTIVATION_FNS[fn](predictions)
@@ -28,3 +37,215 @@ def get_predictions(
             preds[afn], dim=1
         ).cpu()  # [batch_size, len(mask_range)]
     return preds_cat
+
+
+def _predict_states(
+    masking_dataset: MaskingDataset,
+    labels: torch.Tensor,
+    model: Callable,
+    activation_fns: List[str],
+    state_samples: np.ndarray,
+    state_num_to_mask: np.ndarray,
+    orig_output: Optional[torch.Tensor] = None,
+) -> Dict[str, torch.Tensor]:
+    """Computes the predictions for the given (sample, number of masked
+    features) states. The states are packed into forward batches of the same
+    size as the original batch. If `orig_output` is given, it is used for
+    states in which nothing is masked.
+    """
+    batch_size = labels.shape[0]
+    num_states = len(state_samples)
+    result = {fn: torch.zeros(num_states) for fn in activation_fns}
+
+    # States in which nothing is masked
+    if orig_output is not None:
+        unmasked = np.flatnonzero(state_num_to_mask == 0)
+        sample_idx = torch.tensor(
+            state_samples[unmasked], device=labels.device, dtype=torch.long
+        )
+        for fn in activation_fns:
+            result[fn][unmasked] = (
+                ACTIVATION_FNS[fn](orig_output[sample_idx])
+                .gather(dim=1, index=labels[sample_idx].unsqueeze(-1))
+                .flatten()
+                .cpu()
+            )
+        to_predict = np.flatnonzero(state_num_to_mask != 0)
+    else:
+        to_predict = np.arange(num_states)
+
+    for i in range(0, len(to_predict), batch_size):
+        chunk = to_predict[i : i + batch_size]
+        chunk_samples = state_samples[chunk]
+        batch = masking_dataset.mask_states(
+            chunk_samples, state_num_to_mask[chunk]
+        )
+        chunk_labels = labels[
+            torch.tensor(chunk_samples, device=labels.device)
+        ]
+        with torch.no_grad():
+            predictions = model(batch)
+        for fn in activation_fns:
+            result[fn][chunk] = (
+                ACTIVATION_FNS[fn](predictions)
+                .gather(dim=1, index=chunk_labels.unsqueeze(-1))
+                .flatten()
+                .cpu()
+            )
+    return result
+
+
+def get_deduplicated_predictions(
+    masking_dataset: MaskingDataset,
+    labels: torch.Tensor,
+    model: Callable,
+    activation_fns: List[str],
+    orig_output: Optional[torch.Tensor] = None,
+) -> Dict[str, torch.Tensor]:
+    """Computes the same predictions as :func:`get_predictions`, but
+    evaluates each distinct masking state of each sample only once.
+
+    For images with few segments, many steps mask exactly the same set of
+    segments. The distinct (sample, number of masked segments) pairs are
+    packed into forward batches of the same size as the original batch,
+    and the outputs are broadcast to all steps that share them.
+    """
+    batch_size = labels.shape[0]
+    # [num_steps, batch_size]
+    num_to_mask = np.stack(
+        [
+            masking_dataset.get_num_to_mask(step)
+            for step in range(len(masking_dataset))
+        ]
+    )
+
+    # Find distinct states for each sample
+    state_samples, state_num_to_mask, state_index = [], [], []
+    for sample_idx in range(batch_size):
+        # distinct: [num_distinct], inverse: [num_steps]
+        distinct, inverse = np.unique(
+            num_to_mask[:, sample_idx], return_inverse=True
+        )
+        state_index.append(len(state_samples) + inverse)
+        state_samples.extend([sample_idx] * len(distinct))
+        state_num_to_mask.extend(distinct)
+    # [batch_size, num_steps]
+    state_index = torch.tensor(np.stack(state_index))
+
+    # Compute predictions for all distinct states
+    preds = _predict_states(
+        masking_dataset,
+        labels,
+        model,
+        activation_fns,
+        np.array(state_samples),
+        np.array(state_num_to_mask),
+        orig_output,
+    )
+
+    # Broadcast predictions to all steps
+    # [batch_size, num_steps]
+    return {afn: preds[afn][state_index] for afn in activation_fns}
+
+
+def get_adaptive_predictions(
+    masking_dataset: MaskingDataset,
+    labels: torch.Tensor,
+    model: Callable,
+    activation_fns: List[str],
+    tolerance: float,
+    num_coarse_steps: int,
+    orig_output: Optional[torch.Tensor] = None,
+) -> Dict[str, torch.Tensor]:
+    """Computes the predictions of :func:`get_predictions` on an adaptively
+    refined subset of the steps.
+
+    First, a coarse grid of `num_coarse_steps` steps (including the first
+    and last step) is evaluated for each sample. Then, each interval between
+    two consecutive evaluated steps is split in half if the output changes
+    by more than `tolerance` over the interval, for any of the activation
+    functions. This is repeated until no intervals need to be split, or
+    until all steps in the interval are evaluated. Each distinct masking state
+    of each sample is evaluated only once.
+
+    Returns
+    -------
+    Dict[str, torch.Tensor]
+        Predictions for each activation function
+        (shape: [batch_size, num_steps]). Steps that were not evaluated
+        are NaN.
+    """
+    batch_size = labels.shape[0]
+    num_steps = len(masking_dataset)
+    # [num_steps, batch_size]
+    num_to_mask = np.stack(
+        [masking_dataset.get_num_to_mask(step) for step in range(num_steps)]
+    )
+    result = {
+        afn: torch.full((batch_size, num_steps), float("nan"))
+        for afn in activation_fns
+    }
+    evaluated = np.zeros((batch_size, num_steps), dtype=bool)
+    # (sample, number of masked features) -> index in state_preds
+    state_cache: Dict[Tuple[int, int], int] = {}
+    state_preds = {afn: torch.zeros(0) for afn in activation_fns}
+
+    # Start with coarse grid
+    coarse_steps = np.unique(
+        np.linspace(0, num_steps - 1, max(num_coarse_steps, 2)).astype(int)
+    )
+    to_evaluate = [
+        (sample_idx, step)
+        for sample_idx in range(batch_size)
+        for step in coarse_steps
+    ]
+    while len(to_evaluate) > 0:
+        # Evaluate new distinct states
+        new_states = []
+        for sample_idx, step in to_evaluate:
+            state = (sample_idx, int(num_to_mask[step, sample_idx]))
+            if state not in state_cache:
+                state_cache[state] = (
+                    state_preds[activation_fns[0]].shape[0] + len(new_states)
+                )
+                new_states.append(state)
+        if len(new_states) > 0:
+            new_preds = _predict_states(
+                masking_dataset,
+                labels,
+                model,
+                activation_fns,
+                np.array([state[0] for state in new_states]),
+                np.array([state[1] for state in new_states]),
+                orig_output,
+            )
+            for afn in activation_fns:
+                state_preds[afn] = torch.cat(
+                    [state_preds[afn], new_preds[afn]]
+                )
+        for sample_idx, step in to_evaluate:
+            state_idx = state_cache[
+                (sample_idx, int(num_to_mask[step, sample_idx]))
+            ]
+            for afn in activation_fns:
+                result[afn][sample_idx, step] = state_preds[afn][state_idx]
+            evaluated[sample_idx, step] = True
+
+        # Refine intervals where the output changes too much
+        to_evaluate = []
+        for sample_idx in range(batch_size):
+            steps = np.flatnonzero(evaluated[sample_idx])
+            # [num_evaluated - 1]
+            change = np.max(
+                np.stack(
+                    [
+                        np.abs(np.diff(result[afn][sample_idx, steps].numpy()))
+                        for afn in activation_fns
+                    ]
+                ),
+                axis=0,
+            )
+            refine = (change > tolerance) & (np.diff(steps) > 1)
+            for left, right in zip(steps[:-1][refine], steps[1:][refine]):
+                to_evaluate.append((sample_idx, (left + right) // 2))
+    return result
@@ -1,4 +1,4 @@
-from ._infidelity import infidelity
+from ._infidelity import infidelity, iter_infidelity
 from ._perturbation_generator import (
     PerturbationGenerator,
     NoisyBaselinePerturbationGenerator,
@@ -1,16 +1,150 @@
 from tqdm import tqdm
 from torch import nn
 import torch
-from typing import Dict, List
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
     AttributionsDataset,
+    _check_attribution_values,
 )
 from ._perturbation_generator import PerturbationGenerator
-from torch.utils.data import DataLoader
+from attribench.data import OutputCache
+from attribench.data.hdf5_dataset._output_cache import _get_cached_output
+from attribench.data._dataloader import _get_dataloader
 from attribench._activation_fns import ACTIVATION_FNS
 from attribench.result._infidelity_result import InfidelityResult
 from attribench.result._grouped_batch_result import GroupedBatchResult
+from attribench.result import ResultSink
+from .._stream import _collect
+
+
+def _compute_infidelity(
+    dot_products: torch.Tensor,
+    pred_diffs: torch.Tensor,
+    mask: torch.Tensor,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Computes Infidelity from the dot products and prediction differences
+    of the perturbations. Only the perturbations for which `mask` is True are
+    taken into account.
+
+    Parameters
+    ----------
+    dot_products : torch.Tensor
+        Dot products of perturbation vectors and attributions.
+        Shape: [num_perturbations, batch_size]
+    pred_diffs : torch.Tensor
+        Differences between original and perturbed model outputs.
+        Shape: [num_perturbations, batch_size]
+    mask : torch.Tensor
+        Boolean mask indicating which perturbations were used.
+        Shape: [num_perturbations, batch_size]
+
+    Returns
+    -------
+    Tuple[torch.Tensor, torch.Tensor]
+        Infidelity for each sample ([batch_size]) and the squared error
+        for each perturbation ([num_perturbations, batch_size]).
+    """
+    mask = mask.float()
+    counts = mask.sum(dim=0, keepdim=True).clamp(min=1)  # [1, batch_size]
+    # Denominator for normalizing constant beta
+    beta_denominator = (
+        torch.sum(dot_products**2 * mask, dim=0, keepdim=True) / counts
+    )  # [1, batch_size]
+    # Numerator for normalizing constant beta depends on
+    # activation function
+    # [1, batch_size]
+    beta_numerator = (
+        torch.sum(dot_products * pred_diffs * mask, dim=0, keepdim=True)
+        / counts
+    )
+    beta = beta_numerator / beta_denominator
+    # If attribution map is constant 0,
+    # dot products will be 0 and beta will be nan or inf. Set to 0.
+    beta[torch.isnan(beta)] = 0
+    beta[torch.isinf(beta)] = 0
+    # [num_perturbations, batch_size]
+    squared_errors = (beta * dot_products - pred_diffs) ** 2 * mask
+    # [batch_size]
+    infidelity = squared_errors.sum(dim=0) / counts.squeeze(0)
+    return infidelity, squared_errors
+
+
+# Powers (of dot products, of prediction differences) whose sums are needed
+# to compute the mean and variance of the squared errors incrementally
+_POWERS = [(2, 0), (1, 1), (0, 2), (4, 0), (3, 1), (2, 2), (1, 3), (0, 4)]
+
+
+def _power_sums_update(
+    dot_products: torch.Tensor, pred_diffs: torch.Tensor
+) -> torch.Tensor:
+    """Computes the terms that a single perturbation adds to the running
+    power sums of the dot products and prediction differences.
+
+    Parameters
+    ----------
+    dot_products : torch.Tensor
+        Dot products for a single perturbation. Shape: [batch_size]
+    pred_diffs : torch.Tensor
+        Prediction differences for a single perturbation. Shape: [batch_size]
+
+    Returns
+    -------
+    torch.Tensor
+        Terms to add to the power sums. Shape: [len(_POWERS), batch_size]
+    """
+    # Sums of fourth powers lose precision quickly in single precision
+    dot_products = dot_products.double()
+    pred_diffs = pred_diffs.double()
+    return torch.stack(
+        [dot_products**a * pred_diffs**b for a, b in _POWERS]
+    )
+
+
+def _infidelity_confidence(
+    power_sums: torch.Tensor, n: int
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Computes Infidelity and the half-width of the 95% confidence interval
+    of the mean squared error from the running power sums of the dot products
+    and prediction differences of `n` perturbations.
+
+    Because the normalizing constant beta changes with every perturbation,
+    the squared errors cannot be accumulated directly. Instead, their mean
+    and variance are expanded in the power sums, which makes each update
+    independent of the number of earlier perturbations. The result is equal
+    to the one obtained from :func:`_compute_infidelity`.
+
+    Parameters
+    ----------
+    power_sums : torch.Tensor
+        Sums of the products of powers in ``_POWERS`` over all perturbations.
+        Shape: [len(_POWERS), batch_size]
+    n : int
+        Number of perturbations. Must be at least 2.
+
+    Returns
+    -------
+    Tuple[torch.Tensor, torch.Tensor]
+        Infidelity and confidence interval half-width for each sample.
+        Shape: [batch_size]
+    """
+    d2, dp, p2, d4, d3p, d2p2, dp3, p4 = power_sums / n
+    beta = dp / d2
+    # If attribution map is constant 0, beta is nan or inf. Set to 0.
+    beta[torch.isnan(beta) | torch.isinf(beta)] = 0
+    # Mean of (beta * d - p)^2 and of (beta * d - p)^4
+    mean = beta**2 * d2 - 2 * beta * dp + p2
+    mean_sq = (
+        beta**4 * d4
+        - 4 * beta**3 * d3p
+        + 6 * beta**2 * d2p2
+        - 4 * beta * dp3
+        + p4
+    )
+    # Unbiased variance, clamped to undo rounding errors
+    variance = ((mean_sq - mean**2) * n / (n - 1)).clamp(min=0)
+    half_width = 1.96 * torch.sqrt(variance / n)
+    return mean, half_width
 
 
 def _infidelity_batch(
@@ -22,14 +156,20 @@ def _infidelity_batch(
     num_perturbations: int,
     activation_fns: List[str],
     device: torch.device,
+    tolerance: Optional[float] = None,
+    min_perturbations: int = 10,
+    orig_output: Optional[torch.Tensor] = None,
 ):
     batch_x = batch_x.to(device)
     batch_y = batch_y.to(device)
+    batch_size = batch_x.shape[0]
     method_names: List[str] = list(batch_attr.keys())
 
     # method_name -> perturbation_generator
     # -> activation_fn -> [batch_size, 1]
-    batch_result: Dict[str, Dict[str, Dict[str, torch.Tensor]]] = {
+    # If tolerance is given, there is an additional level for the output:
+    # -> output -> [batch_size, 1]
+    batch_result: Dict[str, Dict[str, Dict[str, Any]]] = {
         method_name: {
             pg_name: {
                 activation_fn: torch.zeros(1)
@@ -57,30 +197,64 @@ def _infidelity_batch(
             device
         )
 
-    # Get original model output on the samples
+    # Get original model output on the samples, unless it was given
     # (dict: activation_fn -> torch.Tensor)
-    orig_output = {}
-    with torch.no_grad():
-        for fn in activation_fns:
-            # [batch_size, 1]
-            orig_output[fn] = ACTIVATION_FNS[fn](model(batch_x)).gather(
-                dim=1, index=batch_y.unsqueeze(-1)
-            )
+    if orig_output is None:
+        with torch.no_grad():
+            orig_output = model(batch_x)
+    activated_orig_output = {}
+    for fn in activation_fns:
+        # [batch_size, 1]
+        activated_orig_output[fn] = ACTIVATION_FNS[fn](orig_output).gather(
+            dim=1, index=batch_y.unsqueeze(-1)
+        )
 
     for (
         pert_name,
         pert_generator,
     ) in perturbation_generators.items():
         pert_generator.set_samples(batch_x)
-        dot_products: Dict[str, List[torch.Tensor]] = {
-            method: [] for method in batch_attr.keys()
+        # Dot products and prediction differences for each perturbation.
+        # Entries for samples that were no longer perturbed remain 0 and
+        # are masked out using perturbation_mask.
+        # method -> [num_perturbations, batch_size]
+        dot_products: Dict[str, torch.Tensor] = {
+            method: torch.zeros(num_perturbations, batch_size, device=device)
+            for method in batch_attr.keys()
+        }
+        # activation_fn -> [num_perturbations, batch_size]
+        pred_diffs: Dict[str, torch.Tensor] = {
+            afn: torch.zeros(num_perturbations, batch_size, device=device)
+            for afn in activation_fns
         }
-        pred_diffs = {afn: [] for afn in activation_fns}
+        perturbation_mask = torch.zeros(
+            num_perturbations, batch_size, dtype=torch.bool, device=device
+        )
+        # Running power sums for the convergence check
+        # (method, activation_fn) -> [len(_POWERS), batch_size]
+        power_sums: Dict[Tuple[str, str], torch.Tensor] = {}
+        if tolerance is not None:
+            power_sums = {
+                (method, afn): torch.zeros(
+                    len(_POWERS),
+                    batch_size,
+                    dtype=torch.float64,
+                    device=device,
+                )
+                for method in batch_attr.keys()
+                for afn in activation_fns
+            }
+        # Samples that still need to be perturbed
+        active = torch.arange(batch_size, device=device)
 
-        for _ in range(num_perturbations):
+        for i in range(num_perturbations):
+            if len(active) == 0:
+                break
             # Get perturbation vector I and perturbed samples (x - I)
-            perturbation_vector = pert_generator.generate_perturbation()
-            perturbed_x = batch_x - perturbation_vector
+            perturbation_vector = pert_generator.generate_perturbation()[
+                active
+            ]
+            perturbed_x = batch_x[active] - perturbation_vector
 
             # Get output of model on perturbed sample
             with torch.no_grad():
@@ -90,10 +264,11 @@ def _infidelity_batch(
             for fn in activation_fns:
                 activated_perturbed_output = ACTIVATION_FNS[fn](
                     perturbed_output
-                ).gather(dim=1, index=batch_y.unsqueeze(-1))
-                pred_diffs[fn].append(
-                    torch.squeeze(orig_output[fn] - activated_perturbed_output)
-                )
+                ).gather(dim=1, index=batch_y[active].unsqueeze(-1))
+                pred_diffs[fn][i, active] = (
+                    activated_orig_output[fn][active]
+                    - activated_perturbed_output
+                ).flatten()
 
             # Compute dot products of perturbation vectors with all
             # attributions for each sample
@@ -101,51 +276,103 @@ def _infidelity_batch(
                 attribution_method,
                 attributions,
             ) in tensor_attributions.items():
-                # (batch_size)
-                dot_products[attribution_method].append(
-                    (perturbation_vector.flatten(1) * attributions).sum(dim=-1)
+                # (num_active)
+                dot_products[attribution_method][i, active] = (
+                    perturbation_vector.flatten(1) * attributions[active]
+                ).sum(dim=-1)
+            perturbation_mask[i, active] = True
+
+            if tolerance is None:
+                continue
+            for (method, afn), sums in power_sums.items():
+                sums[:, active] += _power_sums_update(
+                    dot_products[method][i, active],
+                    pred_diffs[afn][i, active],
                 )
+            # The variance is undefined for a single perturbation
+            if i + 1 >= max(min_perturbations, 2):
+                # A sample has converged if the confidence interval of
+                # the mean squared error is tight for all methods and
+                # activation functions. Active samples have been
+                # perturbed in every iteration so far.
+                converged = torch.ones(
+                    len(active), dtype=torch.bool, device=device
+                )
+                for sums in power_sums.values():
+                    infidelity, half_width = _infidelity_confidence(
+                        sums[:, active], i + 1
+                    )
+                    converged &= half_width <= tolerance * infidelity
+                # Compact the active set
+                active = active[~converged]
 
         # For each method and activation function, compute infidelity
-        # activation_fn -> [num_perturbations, batch_size]
-        tensor_pred_diffs = {
-            afn: torch.stack(pred_diffs[afn], dim=0)
-            for afn in pred_diffs.keys()
-        }
         for method in tensor_attributions.keys():
-            # Dot prodcts for this method
-            method_dot_products = torch.stack(
-                dot_products[method]
-            )  # [num_perturbations, batch_size]
-            # Denominator for normalizing constant beta
-            beta_denominator = torch.mean(
-                method_dot_products**2, dim=0, keepdim=True
-            )  # [1, batch_size]
             for afn in activation_fns:
-                # Numerator for normalizing constant beta depends on
-                # activation function
-                # [1, batch_size]
-                beta_numerator = torch.mean(
-                    method_dot_products * tensor_pred_diffs[afn],
-                    dim=0,
-                    keepdim=True,
+                infidelity, _ = _compute_infidelity(
+                    dot_products[method], pred_diffs[afn], perturbation_mask
                 )
-                beta = beta_numerator / beta_denominator
-                # If attribution map is constant 0,
-                # dot products will be 0 and beta will be nan or inf. Set to 0.
-                beta[torch.isnan(beta)] = 0
-                beta[torch.isinf(beta)] = 0
                 # [batch_size, 1]
-                infidelity = torch.mean(
-                    (beta * method_dot_products - tensor_pred_diffs[afn]) ** 2,
-                    dim=0,
-                ).unsqueeze(-1)
-                batch_result[method][pert_name][afn] = (
-                    infidelity.cpu().detach().numpy()
-                )
+                infidelity = infidelity.unsqueeze(-1).cpu().detach().numpy()
+                if tolerance is None:
+                    batch_result[method][pert_name][afn] = infidelity
+                else:
+                    batch_result[method][pert_name][afn] = {
+                        "value": infidelity,
+                        "num_perturbations": perturbation_mask.sum(dim=0)
+                        .unsqueeze(-1)
+                        .cpu()
+                        .numpy(),
+                    }
     return batch_result
 
 
+def iter_infidelity(
+    model: nn.Module,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    activation_fns: List[str],
+    perturbation_generators: Dict[str, PerturbationGenerator],
+    num_perturbations: int,
+    device: torch.device = torch.device("cpu"),
+    tolerance: Optional[float] = None,
+    min_perturbations: int = 10,
+    output_cache: Optional[OutputCache] = None,
+) -> Generator[GroupedBatchResult, None, None]:
+    """Computes the Infidelity metric batch by batch, and yields the result
+    of each batch as soon as it is computed. See :func:`infidelity` for a
+    description of the metric and of the parameters.
+
+    Yields
+    ------
+    GroupedBatchResult
+        Result of Infidelity on a batch of samples.
+    """
+    _check_attribution_values(attributions_dataset, "Infidelity")
+    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
+    dataloader = _get_dataloader(
+        grouped_dataset, batch_size=batch_size, num_workers=4
+    )
+    cached_outputs = (
+        output_cache.for_model(model) if output_cache is not None else None
+    )
+    for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
+        batch_result = _infidelity_batch(
+            model,
+            batch_x,
+            batch_y,
+            batch_attr,
+            perturbation_generators,
+            num_perturbations,
+            activation_fns,
+            device,
+            tolerance,
+            min_perturbations,
+            _get_cached_output(cached_outputs, batch_indices, device),
+        )
+        yield GroupedBatchResult(batch_indices, batch_result)
+
+
 def infidelity(
     model: nn.Module,
     attributions_dataset: AttributionsDataset,
@@ -154,7 +381,11 @@ def infidelity(
     perturbation_generators: Dict[str, PerturbationGenerator],
     num_perturbations: int,
     device: torch.device = torch.device("cpu"),
-) -> InfidelityResult:
+    tolerance: Optional[float] = None,
+    min_perturbations: int = 10,
+    output_cache: Optional[OutputCache] = None,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[InfidelityResult]:
     """Computes the Infidelity metric for a given :class:`~attribench.data.AttributionsDataset` and model.
 
     Infidelity is computed by generating perturbations for each sample in the
@@ -179,6 +410,15 @@ def infidelity(
     The Infidelity metric is computed for each perturbation generator in
     `perturbation_generators` and each activation function in `activation_fns`.
 
+    If `tolerance` is given, Infidelity is computed adaptively:
+    `num_perturbations` is then the maximal number of perturbations per
+    sample. After `min_perturbations` perturbations, a sample is no longer
+    perturbed as soon as the half-width of the 95% confidence interval of its
+    mean squared error is smaller than a fraction `tolerance` of the mean
+    squared error itself, for all methods and activation functions.
+    The number of perturbations that was actually used for each sample is
+    stored in the result.
+
     Parameters
     ----------
     model : nn.Module
@@ -196,27 +436,47 @@ def infidelity(
         Tuple of activation functions to use when computing Infidelity.
     device : torch.device, optional
         Device to use, by default `torch.device("cpu")`
+    tolerance : Optional[float], optional
+        Relative tolerance for adaptive early stopping.
+        If None, exactly `num_perturbations` perturbations are used for
+        each sample. By default None.
+    min_perturbations : int, optional
+        Minimal number of perturbations to use for each sample before
+        checking for convergence. Only used if `tolerance` is given.
+        By default 10.
+    output_cache : Optional[OutputCache], optional
+        Cache of the outputs of models on the samples. If the outputs of
+        `model` are in the cache, the output of the model on the original
+        samples is not computed again. By default None.
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
+
+    Returns
+    -------
+    Optional[InfidelityResult]
+        If `sinks` is None, the result of Infidelity.
     """
-    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
-    dataloader = DataLoader(
-        grouped_dataset, batch_size=batch_size, num_workers=4
-    )
+    _check_attribution_values(attributions_dataset, "Infidelity")
     result = InfidelityResult(
         attributions_dataset.method_names,
         list(perturbation_generators.keys()),
         activation_fns,
         num_samples=attributions_dataset.num_samples,
+        adaptive=tolerance is not None,
     )
-    for batch_indices, batch_x, batch_y, batch_attr in tqdm(dataloader):
-        batch_result = _infidelity_batch(
-            model,
-            batch_x,
-            batch_y,
-            batch_attr,
-            perturbation_generators,
-            num_perturbations,
-            activation_fns,
-            device,
-        )
-        result.add(GroupedBatchResult(batch_indices, batch_result))
-    return result
+    batch_results = iter_infidelity(
+        model,
+        attributions_dataset,
+        batch_size,
+        activation_fns,
+        perturbation_generators,
+        num_perturbations,
+        device,
+        tolerance,
+        min_perturbations,
+        output_cache,
+    )
+    return _collect(result, batch_results, sinks)
@@ -1 +1 @@
-from ._minimal_subset import minimal_subset
\ No newline at end of file
+from ._minimal_subset import minimal_subset, iter_minimal_subset
@@ -1,16 +1,42 @@
-from torch.utils.data import DataLoader
+from attribench.data._dataloader import _get_dataloader
 from ._dataset import (
     MinimalSubsetDeletionDataset,
     MinimalSubsetInsertionDataset,
 )
 from attribench.masking import Masker
-from typing import Callable, Dict, Mapping
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    Mapping,
+    Optional,
+    Sequence,
+)
 import torch
 from torch import nn
-from attribench.data import AttributionsDataset
-from attribench.result import MinimalSubsetResult
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.hdf5_dataset._output_cache import (
+    CachedOutputs,
+    _get_cached_output,
+)
+from attribench.data.attributions_dataset._attributions_dataset import (
+    GroupedAttributionsDataset,
+)
+from attribench.result import MinimalSubsetResult, ResultSink
 from attribench.result._batch_result import BatchResult
 from tqdm import tqdm
+from .._stream import _collect
+
+
+def _get_orig_predictions(
+    cached_outputs: Optional[CachedOutputs],
+    indices: torch.Tensor,
+    device: torch.device,
+) -> Optional[torch.Tensor]:
+    orig_output = _get_cached_output(cached_outputs, indices, device)
+    if orig_output is None:
+        return None
+    return torch.argmax(orig_output, dim=1)
 
 
 def minimal_subset_batch(
@@ -20,8 +46,13 @@ def minimal_subset_batch(
     num_steps: float,
     maskers: Mapping[str, Masker],
     mode: str,
+    orig_predictions: Optional[torch.Tensor] = None,
 ) -> Dict[str, torch.Tensor]:
     batch_result: Dict[str, torch.Tensor] = {}
+    if orig_predictions is None:
+        # The original predictions are the same for all maskers
+        with torch.no_grad():
+            orig_predictions = torch.argmax(model(samples), dim=1)
     for masker_name, masker in maskers.items():
         if mode == "deletion":
             ds = MinimalSubsetDeletionDataset(
@@ -43,7 +74,6 @@ def minimal_subset_batch(
         flipped = torch.tensor(
             [False for _ in range(ds.samples.shape[0])]
         ).bool()
-        orig_predictions = torch.argmax(model(ds.samples), dim=1)
 
         # The MinimalSubsetDataset is an iterator that returns batches of
         # masked samples and the number of features that were masked.
@@ -77,6 +107,111 @@ def minimal_subset_batch(
     return batch_result
 
 
+def minimal_subset_grouped_batch(
+    samples: torch.Tensor,
+    model: Callable,
+    attrs: Mapping[str, torch.Tensor],
+    num_steps: float,
+    maskers: Mapping[str, Masker],
+    mode: str,
+    orig_predictions: Optional[torch.Tensor] = None,
+) -> Dict[str, Dict[str, torch.Tensor]]:
+    """Computes Minimal Subset for a batch of samples and the attributions of
+    all methods for these samples. The original predictions of the model and
+    the baselines of the maskers are computed once, and shared between the
+    methods.
+    """
+    if orig_predictions is None:
+        with torch.no_grad():
+            orig_predictions = torch.argmax(model(samples), dim=1)
+    return {
+        method_name: minimal_subset_batch(
+            samples,
+            model,
+            method_attrs,
+            num_steps,
+            maskers,
+            mode,
+            orig_predictions,
+        )
+        for method_name, method_attrs in attrs.items()
+    }
+
+
+def iter_minimal_subset(
+    model: nn.Module,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    maskers: Mapping[str, Masker],
+    mode: str = "deletion",
+    num_steps: int = 100,
+    device: torch.device = torch.device("cpu"),
+    sample_major: bool = False,
+    output_cache: Optional[OutputCache] = None,
+) -> Generator[BatchResult, None, None]:
+    """Computes the Minimal Subset metric batch by batch, and yields the result
+    of each batch as soon as it is computed. See :func:`minimal_subset` for a
+    description of the metric and of the parameters.
+
+    Yields
+    ------
+    BatchResult
+        Result of Minimal Subset on a batch of samples.
+    """
+    model.to(device)
+    model.eval()
+    cached_outputs = (
+        output_cache.for_model(model) if output_cache is not None else None
+    )
+
+    if sample_major:
+        dataloader = _get_dataloader(
+            GroupedAttributionsDataset(attributions_dataset),
+            batch_size=batch_size,
+            num_workers=4,
+            pin_memory=True,
+        )
+        for batch_indices, batch_x, _, batch_attr in tqdm(dataloader):
+            batch_x = batch_x.to(device)
+            method_results = minimal_subset_grouped_batch(
+                batch_x,
+                model,
+                batch_attr,
+                num_steps,
+                maskers,
+                mode,
+                _get_orig_predictions(cached_outputs, batch_indices, device),
+            )
+            yield BatchResult.from_method_dict(batch_indices, method_results)
+        return
+
+    dataloader = _get_dataloader(
+        attributions_dataset,
+        batch_size=batch_size,
+        num_workers=4,
+        pin_memory=True,
+    )
+
+    for (
+        batch_indices,
+        batch_x,
+        _,
+        batch_attr,
+        method_names,
+    ) in tqdm(dataloader):
+        batch_x = batch_x.to(device)
+        batch_result = minimal_subset_batch(
+            batch_x,
+            model,
+            batch_attr,
+            num_steps,
+            maskers,
+            mode,
+            _get_orig_predictions(cached_outputs, batch_indices, device),
+        )
+        yield BatchResult(batch_indices, batch_result, method_names)
+
+
 def minimal_subset(
     model: nn.Module,
     attributions_dataset: AttributionsDataset,
@@ -85,7 +220,10 @@ def minimal_subset(
     mode: str = "deletion",
     num_steps: int = 100,
     device: torch.device = torch.device("cpu"),
-) -> MinimalSubsetResult:
+    sample_major: bool = False,
+    output_cache: Optional[OutputCache] = None,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[MinimalSubsetResult]:
     """Computes Minimal Subset Deletion or Insertion for a given
     :class:`~attribench.data.AttributionsDataset` and model.
 
@@ -120,35 +258,43 @@ def minimal_subset(
     device : torch.device, optional
         Device to use when computing the Minimal Subset metric,
         by default torch.device("cpu")
+    sample_major : bool, optional
+        If True, the metric is computed for all methods on each batch of
+        samples before moving on to the next batch. Work that does not depend
+        on the attributions (loading the samples, the original predictions of
+        the model and the baselines of the maskers) is then done once per
+        batch instead of once per method. By default False.
+    output_cache : Optional[OutputCache], optional
+        Cache of the outputs of models on the samples. If the outputs of
+        `model` are in the cache, they are used as the original predictions,
+        by default None.
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
 
     Returns
     -------
-    MinimalSubsetResult
+    Optional[MinimalSubsetResult]
+        If `sinks` is None, the result of Minimal Subset.
     """
-    model.to(device)
-    model.eval()
-
-    dataloader = DataLoader(
-        attributions_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
-    )
-
     result = MinimalSubsetResult(
         attributions_dataset.method_names,
         list(maskers.keys()),
         mode,
-        num_samples=len(attributions_dataset),
+        num_samples=attributions_dataset.num_samples,
     )
 
-    for (
-        batch_indices,
-        batch_x,
-        _,
-        batch_attr,
-        method_names,
-    ) in tqdm(dataloader):
-        batch_x = batch_x.to(device)
-        batch_result = minimal_subset_batch(
-            batch_x, model, batch_attr, num_steps, maskers, mode
-        )
-        result.add(BatchResult(batch_indices, batch_result, method_names))
-    return result
+    batch_results = iter_minimal_subset(
+        model,
+        attributions_dataset,
+        batch_size,
+        maskers,
+        mode,
+        num_steps,
+        device,
+        sample_major,
+        output_cache,
+    )
+    return _collect(result, batch_results, sinks)
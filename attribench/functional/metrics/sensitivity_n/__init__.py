@@ -1 +1 @@
-from ._sensitivity_n import sensitivity_n
\ No newline at end of file
+from ._sensitivity_n import sensitivity_n, iter_sensitivity_n
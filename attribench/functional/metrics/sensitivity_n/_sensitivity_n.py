@@ -2,29 +2,45 @@ import numpy as np
 from torch import nn
 import torch
 import numpy.typing as npt
-from typing import Callable, List, Mapping, Dict, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 from attribench.masking import Masker
 from attribench.masking.image import ImageMasker
-from torch.utils.data import DataLoader
-from attribench.data import AttributionsDataset
+from attribench.data._dataloader import _get_dataloader
+from attribench.data import AttributionsDataset, OutputCache
+from attribench.data.hdf5_dataset._output_cache import _get_cached_output
 from attribench._activation_fns import ACTIVATION_FNS
 from ._dataset import SensitivityNDataset, SegSensNDataset
-from attribench._segmentation import segment_attributions
+from attribench._segmentation import segment_attributions_tensor
 from attribench._stat import rowwise_pearsonr
-from attribench.result import SensitivityNResult
+from attribench.result import ResultSink, SensitivityNResult
 from attribench.result._grouped_batch_result import GroupedBatchResult
 from attribench.data.attributions_dataset._attributions_dataset import (
     GroupedAttributionsDataset,
+    _check_attribution_values,
 )
 from tqdm import tqdm
+from .._stream import _collect
 
 
 def _get_orig_output(
-    samples: torch.Tensor, model: Callable, activation_fns: List[str]
+    samples: torch.Tensor,
+    model: Callable,
+    activation_fns: List[str],
+    orig_output: Optional[torch.Tensor] = None,
 ):
     activated_orig_output = {}
     with torch.no_grad():
-        orig_output = model(samples)
+        if orig_output is None:
+            orig_output = model(samples)
         for activation_fn in activation_fns:
             activated_orig_output[activation_fn] = ACTIVATION_FNS[
                 activation_fn
@@ -38,20 +54,27 @@ def _compute_out_diffs(
     activation_fns: List[str],
     orig_output: Dict[str, torch.Tensor],
     labels: torch.Tensor,
-) -> Tuple[Dict[str, Dict[int, npt.NDArray]], Dict[int, npt.NDArray]]:
+) -> Tuple[Dict[str, torch.Tensor], Dict[int, torch.Tensor]]:
     n_range = ds.n_range
-    output_diff_shape = (ds.samples.shape[0], ds.num_subsets)
+    batch_size = ds.samples.shape[0]
+    device = ds.samples.device
     # Calculate differences in output and removed indices
     # (will be re-used for all methods)
-    # activation_fn -> n -> [batch_size, num_subsets]
-    output_diffs: Dict[str, Dict[int, npt.NDArray]] = {
-        activation_fn: {n: np.zeros(output_diff_shape) for n in n_range}
+    # activation_fn -> [len(n_range), batch_size, num_subsets]
+    output_diffs: Dict[str, torch.Tensor] = {
+        activation_fn: torch.zeros(
+            (len(n_range), batch_size, ds.num_subsets), device=device
+        )
         for activation_fn in activation_fns
     }
-    removed_indices: Dict[int, npt.NDArray] = {
-        n: np.zeros((ds.samples.shape[0], ds.num_subsets, n), dtype=int)
+    # n -> [batch_size, num_subsets, n]
+    removed_indices: Dict[int, torch.Tensor] = {
+        n: torch.zeros(
+            (batch_size, ds.num_subsets, n), dtype=torch.long, device=device
+        )
         for n in n_range
     }
+    n_indices = {n: n_idx for n_idx, n in enumerate(n_range)}
     # TODO why do we not use a dataloader here?
     for i in range(len(ds)):
         batch, indices, n, subset_idx = ds[i]
@@ -60,14 +83,11 @@ def _compute_out_diffs(
             output = model(batch)
         for activation_fn in activation_fns:
             activated_output = ACTIVATION_FNS[activation_fn](output)
-            # [batch_size, 1]
-            output_diffs[activation_fn][n][:, subset_idx] = (
+            # [batch_size]
+            output_diffs[activation_fn][n_indices[n], :, subset_idx] = (
                 (orig_output[activation_fn] - activated_output)
                 .gather(dim=1, index=labels.unsqueeze(-1))
                 .flatten()
-                .detach()
-                .cpu()
-                .numpy()
             )
         removed_indices[n][:, subset_idx, :] = indices  # [batch_size, n]
     return output_diffs, removed_indices
@@ -78,44 +98,51 @@ def _compute_correlations(
     batch_attr: Dict[str, torch.Tensor],
     ds: SensitivityNDataset | SegSensNDataset,
     segmented: bool,
-    removed_indices: Dict[int, npt.NDArray],
-    output_diffs: Dict[str, Dict[int, npt.NDArray]],
+    removed_indices: Dict[int, torch.Tensor],
+    output_diffs: Dict[str, torch.Tensor],
     activation_fns: List[str],
 ) -> Dict[str, Dict[str, torch.Tensor]]:
-    # activation_fn -> method_name -> [batch_size, len(n_range)]
-    result = {
-        activation_fn: {
-            method_name: torch.zeros((ds.samples.shape[0], len(ds.n_range)))
-            for method_name in method_names
-        }
-        for activation_fn in activation_fns
-    }
-    # Compute correlations for all methods
-    # TODO can we use joblib here to compute this in parallel?
-    for method_name in method_names:
-        attrs = batch_attr[method_name].cpu().numpy()
+    # Compute sums of attributions for all methods
+    # [num_methods, len(n_range), batch_size, num_subsets]
+    batch_size = ds.samples.shape[0]
+    device = batch_attr[method_names[0]].device
+    sum_of_attrs = torch.zeros(
+        (len(method_names), len(ds.n_range), batch_size, ds.num_subsets),
+        device=device,
+    )
+    for method_idx, method_name in enumerate(method_names):
+        # No copy is made if the attributions are already float32
+        attrs = batch_attr[method_name].float()
         if segmented:
             assert isinstance(ds, SegSensNDataset)
-            attrs = segment_attributions(
-                ds.segmented_images.cpu().numpy(), attrs
-            )
+            attrs = segment_attributions_tensor(ds.segmented_images, attrs)
         # [batch_size, 1, -1]
         attrs = attrs.reshape((attrs.shape[0], 1, -1))
         for n_idx, n in enumerate(ds.n_range):
             # [batch_size, num_subsets, n]
-            n_mask_attrs = np.take_along_axis(
-                attrs, axis=-1, indices=removed_indices[n]
+            n_mask_attrs = torch.take_along_dim(
+                attrs, removed_indices[n].to(device), dim=-1
             )
-            for activation_fn in activation_fns:
-                # Compute sum of attributions
-                # [batch_size, num_subsets]
-                n_sum_of_attrs = n_mask_attrs.sum(axis=-1)
-                n_output_diffs = output_diffs[activation_fn][n]
-                # Compute correlation between output difference and
-                # sum of attribution values
-                result[activation_fn][method_name][:, n_idx] = torch.tensor(
-                    rowwise_pearsonr(n_sum_of_attrs, n_output_diffs)
-                )
+            # [batch_size, num_subsets]
+            sum_of_attrs[method_idx, n_idx] = n_mask_attrs.sum(dim=-1)
+
+    # [num_activation_fns, 1, len(n_range), batch_size, num_subsets]
+    all_output_diffs = torch.stack(
+        [output_diffs[activation_fn] for activation_fn in activation_fns]
+    )[:, None].to(device)
+    # Compute correlation between output difference and sum of attribution
+    # values for all activation functions, methods and values of n at once
+    # [num_activation_fns, num_methods, len(n_range), batch_size]
+    corrs = rowwise_pearsonr(sum_of_attrs[None], all_output_diffs)
+
+    # activation_fn -> method_name -> [batch_size, len(n_range)]
+    result = {
+        activation_fn: {
+            method_name: corrs[fn_idx, method_idx].transpose(0, 1)
+            for method_idx, method_name in enumerate(method_names)
+        }
+        for fn_idx, activation_fn in enumerate(activation_fns)
+    }
     return result
 
 
@@ -129,9 +156,12 @@ def _sens_n_batch(
     n_range: npt.NDArray,
     num_subsets: int,
     segmented: bool,
+    orig_output: Optional[torch.Tensor] = None,
 ) -> Dict[str, Dict[str, Dict[str, torch.Tensor]]]:
     method_names = list(attrs.keys())
-    orig_output = _get_orig_output(samples, model, activation_fns)
+    orig_output = _get_orig_output(
+        samples, model, activation_fns, orig_output
+    )
     # masker_name -> activation_fn -> method_name -> [batch_size, num_steps]
     batch_result: Dict[str, Dict[str, Dict[str, torch.Tensor]]] = {}
 
@@ -160,6 +190,76 @@ def _sens_n_batch(
     return batch_result
 
 
+def iter_sensitivity_n(
+    model: nn.Module,
+    attributions_dataset: AttributionsDataset,
+    batch_size: int,
+    maskers: Mapping[str, Masker],
+    activation_fns: str | List[str],
+    min_subset_size: float,
+    max_subset_size: float,
+    num_steps: int,
+    num_subsets: int,
+    segmented: bool,
+    device: torch.device = torch.device("cpu"),
+    output_cache: Optional[OutputCache] = None,
+) -> Generator[GroupedBatchResult, None, None]:
+    """Computes the Sensitivity-n metric batch by batch, and yields the result
+    of each batch as soon as it is computed. See :func:`sensitivity_n` for a
+    description of the metric and of the parameters.
+
+    Yields
+    ------
+    GroupedBatchResult
+        Result of Sensitivity-n on a batch of samples.
+    """
+    _check_attribution_values(attributions_dataset, "Sensitivity-n")
+    if isinstance(activation_fns, str):
+        activation_fns = [activation_fns]
+
+    model.to(device)
+    model.eval()
+    cached_outputs = (
+        output_cache.for_model(model) if output_cache is not None else None
+    )
+
+    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
+    dataloader = _get_dataloader(
+        grouped_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
+    )
+
+    # Compute range of subset sizes
+    n_range = np.linspace(min_subset_size, max_subset_size, num_steps)
+    if segmented:
+        n_range = n_range * 100
+    else:
+        total_num_features = np.prod(attributions_dataset.attributions_shape)
+        n_range = n_range * total_num_features
+    n_range = n_range.astype(int)
+
+    for (
+        batch_indices,
+        batch_x,
+        batch_y,
+        batch_attr,
+    ) in tqdm(dataloader):
+        batch_x = batch_x.to(device)
+        batch_y = batch_y.to(device)
+        batch_result = _sens_n_batch(
+            batch_x,
+            batch_y,
+            model,
+            batch_attr,
+            maskers,
+            activation_fns,
+            n_range,
+            num_subsets,
+            segmented,
+            _get_cached_output(cached_outputs, batch_indices, device),
+        )
+        yield GroupedBatchResult(batch_indices, batch_result)
+
+
 def sensitivity_n(
     model: nn.Module,
     attributions_dataset: AttributionsDataset,
@@ -172,7 +272,9 @@ def sensitivity_n(
     num_subsets: int,
     segmented: bool,
     device: torch.device = torch.device("cpu"),
-) -> SensitivityNResult:
+    output_cache: Optional[OutputCache] = None,
+    sinks: Optional[Sequence[ResultSink]] = None,
+) -> Optional[SensitivityNResult]:
     """Computes the Sensitivity-n metric for a given :class:`~attribench.data.AttributionsDataset` and model.
 
     Sensitivity-n is computed by iteratively masking a random subset of `n` features
@@ -223,22 +325,24 @@ def sensitivity_n(
         If True, then the Seg-Sensitivity-n metric is computed.
     device : torch.device, optional
         Device to use, by default torch.device("cpu")
+    output_cache : Optional[OutputCache], optional
+        Cache of the outputs of models on the samples. If the outputs of
+        `model` are in the cache, the output of the model on the original
+        samples is not computed again. By default None.
+    sinks : Optional[Sequence[ResultSink]], optional
+        If given, the result of each batch is passed to the sinks as soon as
+        it is computed, instead of collecting the full result in memory.
+        See :class:`~attribench.result.ResultSink`.
+        Default: None
 
     Returns
     -------
-    SensitivityNResult
+    Optional[SensitivityNResult]
+        If `sinks` is None, the result of Sensitivity-n.
     """
+    _check_attribution_values(attributions_dataset, "Sensitivity-n")
     if isinstance(activation_fns, str):
         activation_fns = [activation_fns]
-
-    model.to(device)
-    model.eval()
-
-    grouped_dataset = GroupedAttributionsDataset(attributions_dataset)
-    dataloader = DataLoader(
-        grouped_dataset, batch_size=batch_size, num_workers=4, pin_memory=True
-    )
-
     result = SensitivityNResult(
         attributions_dataset.method_names,
         list(maskers.keys()),
@@ -247,33 +351,18 @@ def sensitivity_n(
         num_steps=num_steps,
     )
 
-    # Compute range of subset sizes
-    n_range = np.linspace(min_subset_size, max_subset_size, num_steps)
-    if segmented:
-        n_range = n_range * 100
-    else:
-        total_num_features = np.prod(attributions_dataset.attributions_shape)
-        n_range = n_range * total_num_features
-    n_range = n_range.astype(int)
-
-    for (
-        batch_indices,
-        batch_x,
-        batch_y,
-        batch_attr,
-    ) in tqdm(dataloader):
-        batch_x = batch_x.to(device)
-        batch_y = batch_y.to(device)
-        batch_result = _sens_n_batch(
-            batch_x,
-            batch_y,
-            model,
-            batch_attr,
-            maskers,
-            activation_fns,
-            n_range,
-            num_subsets,
-            segmented,
-        )
-        result.add(GroupedBatchResult(batch_indices, batch_result))
-    return result
+    batch_results = iter_sensitivity_n(
+        model,
+        attributions_dataset,
+        batch_size,
+        maskers,
+        activation_fns,
+        min_subset_size,
+        max_subset_size,
+        num_steps,
+        num_subsets,
+        segmented,
+        device,
+        output_cache,
+    )
+    return _collect(result, batch_results, sinks)
@@ -4,6 +4,25 @@ import numpy as np
 import torch
 
 
+def _get_sorted_indices(attributions: torch.Tensor) -> torch.Tensor:
+    """Returns the indices of the features of each sample, sorted by
+    increasing attribution value.
+    Attributions with an integer dtype are interpreted as precomputed
+    rankings: each value is the position of the feature in the sorted order
+    (see :func:`~attribench.data.store_rankings`). In that case, the
+    ranking is inverted instead of sorting the attributions.
+    """
+    flat_attributions = attributions.reshape(attributions.shape[0], -1).cpu()
+    if torch.is_floating_point(flat_attributions):
+        return torch.tensor(flat_attributions.numpy().argsort())
+    ranks = flat_attributions.long()
+    sorted_indices = torch.empty_like(ranks)
+    sorted_indices.scatter_(
+        1, ranks, torch.arange(ranks.shape[1]).expand_as(ranks).contiguous()
+    )
+    return sorted_indices
+
+
 class Masker:
     """Base class for all maskers.
     Maskers are used to "remove" features from a sample by masking them with
@@ -115,7 +134,9 @@ class Masker:
         attributions : torch.Tensor, optional
             Attributions of shape ``[num_samples, *sample_shape]``, by default None
             If None, the :meth:`mask_top` and :meth:`mask_bot` methods will 
-            not be available.
+            not be available. If the attributions have an integer dtype,
+            they are interpreted as precomputed rankings, which avoids
+            sorting the attributions.
         """
         raise NotImplementedError
 
@@ -1,4 +1,5 @@
 from attribench.masking import Masker
+from attribench.masking._masker import _get_sorted_indices
 from attribench._segmentation import segment_attributions
 from typing import List, Union, Optional, Tuple
 import numpy as np
@@ -71,9 +72,19 @@ class ImageMasker(Masker):
         attributions : torch.Tensor, optional
             Attributions to use for masking, by default None
             If None, the :meth:`mask_top` and :meth:`mask_bot` methods will
-            not be available.
+            not be available. If the attributions have an integer dtype,
+            they are interpreted as precomputed rankings, which avoids
+            sorting the attributions.
         segmented_samples : torch.Tensor, optional
             Segmented samples to use for masking, by default None
+
+        Raises
+        ------
+        ValueError
+            If the shapes of the samples, attributions and segmented samples
+            are not compatible, or if segmented samples are given with
+            rankings. Segments are sorted by their average attribution
+            value, which can't be computed from rankings.
         """
 
         # Check if attributions are compatible with samples
@@ -88,6 +99,13 @@ class ImageMasker(Masker):
 
         # Check if segmented samples are compatible with samples
         if segmented_samples is not None:
+            if attributions is not None and not torch.is_floating_point(
+                attributions
+            ):
+                raise ValueError(
+                    "Segmented masking requires attribution values,"
+                    " but rankings were given."
+                )
             if not (
                 samples.shape[0] == segmented_samples.shape[0]
                 and samples.shape[-2:] == segmented_samples.shape[-2:]
@@ -102,6 +120,11 @@ class ImageMasker(Masker):
                     f" {segmented_samples.device} for segmented_samples."
                 )
 
+        # Baselines only depend on the samples. If the masker is used on the
+        # same samples multiple times (e.g. for multiple attribution methods),
+        # the baselines are re-used.
+        reuse_baselines = samples is self.samples and self.baseline is not None
+
         # Set attributes
         self.samples = samples
         self.attributions = attributions
@@ -130,12 +153,7 @@ class ImageMasker(Masker):
             self.sorted_indices = filtered_sorted_indices
         elif attributions is not None:
             # If only attributions are given, sort them
-            self.sorted_indices = torch.tensor(
-                attributions.cpu()
-                .numpy()
-                .reshape(attributions.shape[0], -1)
-                .argsort()
-            )
+            self.sorted_indices = _get_sorted_indices(attributions)
 
         if segmented_samples is not None:
             # Get the indices of the segments for each image
@@ -144,7 +162,8 @@ class ImageMasker(Masker):
                 for i in range(samples.shape[0])
             ]
 
-        self._initialize_baselines(self.samples)
+        if not reuse_baselines:
+            self._initialize_baselines(self.samples)
 
     def get_num_features(self):
         assert self.samples is not None
@@ -1,4 +1,5 @@
 from attribench.masking import Masker
+from attribench.masking._masker import _get_sorted_indices
 import torch
 import numpy as np
 from typing import List, Union
@@ -37,19 +38,18 @@ class TabularMasker(Masker):
                 "Attributions and samples have incompatible shapes."
             )
 
+        # Baselines only depend on the samples, re-use them if possible
+        reuse_baselines = samples is self.samples and self.baseline is not None
+
         # Set attributes
         self.samples = samples
         self.attributions = attributions
         if attributions is not None:
-            self.sorted_indices = torch.tensor(
-                attributions.cpu()
-                .numpy()
-                .reshape(attributions.shape[0], -1)
-                .argsort()
-            )
+            self.sorted_indices = _get_sorted_indices(attributions)
 
         # Init baselines
-        self._initialize_baselines(samples)
+        if not reuse_baselines:
+            self._initialize_baselines(samples)
 
     def _check_attribution_shape(self, samples, attributions) -> bool:
         # For tabular data, attributions and samples should always have the
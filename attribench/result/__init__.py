@@ -7,4 +7,7 @@ from ._infidelity_result import InfidelityResult
 from ._max_sensitivity_result import MaxSensitivityResult
 from ._minimal_subset_result import MinimalSubsetResult
 from ._sensitivity_n_result import SensitivityNResult
-from ._parameter_randomization_result import ParameterRandomizationResult
\ No newline at end of file
+from ._parameter_randomization_result import ParameterRandomizationResult
+from ._result_sink import ResultSink
+from ._hdf5_result_sink import HDF5ResultSink
+from ._running_statistics import RunningStatistics
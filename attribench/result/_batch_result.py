@@ -1,5 +1,15 @@
 import torch
-from typing import Dict, List
+from typing import Dict, List, Mapping
+
+
+def _concat_leaves(results: List):
+    # Concatenates nested dictionaries of tensors with the same structure
+    if isinstance(results[0], Mapping):
+        return {
+            key: _concat_leaves([result[key] for result in results])
+            for key in results[0].keys()
+        }
+    return torch.cat([torch.as_tensor(result) for result in results], dim=0)
 
 
 class BatchResult:
@@ -12,3 +22,37 @@ class BatchResult:
         self.method_names = method_names
         self.results = results
         self.indices = indices
+
+    @classmethod
+    def from_method_dict(cls, indices: torch.Tensor,
+                         method_results: Mapping[str, Dict]) -> "BatchResult":
+        """
+        Creates a BatchResult from the results of a metric that was computed
+        sample-major, i.e. for all methods on the same batch of samples.
+
+        Parameters
+        ----------
+        indices : torch.Tensor
+            Indices of the samples in the batch.
+        method_results : Mapping[str, Dict]
+            Dictionary mapping method names to the results of the metric
+            for that method on the batch.
+
+        Returns
+        -------
+        BatchResult
+            BatchResult containing a row for each (method, sample) pair.
+        """
+        method_names = list(method_results.keys())
+        results = _concat_leaves(
+            [method_results[method_name] for method_name in method_names]
+        )
+        return cls(
+            indices.repeat(len(method_names)),
+            results,
+            [
+                method_name
+                for method_name in method_names
+                for _ in range(len(indices))
+            ],
+        )
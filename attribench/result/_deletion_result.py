@@ -13,6 +13,50 @@ from ._metric_result import MetricResult
 import pandas as pd
 
 
+def _fill_indices(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # For each step, index of the closest evaluated (non-NaN) step
+    # to the left and to the right (inclusive)
+    num_steps = x.shape[-1]
+    steps = np.broadcast_to(np.arange(num_steps), x.shape)
+    evaluated = ~np.isnan(x)
+    left = np.maximum.accumulate(np.where(evaluated, steps, 0), axis=-1)
+    right = np.flip(
+        np.minimum.accumulate(
+            np.flip(np.where(evaluated, steps, num_steps - 1), axis=-1),
+            axis=-1,
+        ),
+        axis=-1,
+    )
+    return left, right
+
+
+def _interpolate(x: np.ndarray) -> np.ndarray:
+    """Linearly interpolates steps that were not evaluated (NaN) in curves
+    computed using the adaptive mode. Curves without NaNs are returned as-is.
+    """
+    if not np.any(np.isnan(x)):
+        return x
+    left, right = _fill_indices(x)
+    x_left = np.take_along_axis(x, left, axis=-1)
+    x_right = np.take_along_axis(x, right, axis=-1)
+    steps = np.broadcast_to(np.arange(x.shape[-1]), x.shape)
+    width = np.maximum(right - left, 1)
+    return x_left + (x_right - x_left) * (steps - left) / width
+
+
+def _error_bound(x: np.ndarray, columns: Optional[npt.NDArray] = None):
+    # For each step that was not evaluated, the interpolation error is at
+    # most the change in output over the surrounding interval, assuming the
+    # curve lies between the values at the ends of the interval.
+    left, right = _fill_indices(x)
+    bound = np.abs(
+        np.take_along_axis(x, right, axis=-1)
+        - np.take_along_axis(x, left, axis=-1)
+    )
+    bound = np.where(np.isnan(x), bound, 0.0)
+    return _auc(bound, columns)
+
+
 def _aoc(x: np.ndarray, columns: Optional[npt.NDArray] = None):
     if columns is not None:
         x = x[..., columns]
@@ -31,6 +75,13 @@ def _auc(x: np.ndarray, columns: Optional[npt.NDArray] = None):
 class DeletionResult(MetricResult):
     """
     Represents results from running the Deletion metric.
+
+    If the metric was computed in adaptive mode, only a subset of the steps
+    is evaluated for each sample. The steps that were not evaluated are
+    stored as NaN, so the positions of the evaluated steps are given by the
+    non-NaN entries. When computing the AUC/AOC, the missing steps are
+    linearly interpolated. An upper bound on the resulting error can be
+    retrieved using :meth:`get_error_bound_df`.
     """
 
     def __init__(
@@ -182,8 +233,50 @@ class DeletionResult(MetricResult):
             array = self.tree.get(
                 masker=masker, activation_fn=activation_fn, method=method
             )
-            df_dict[method] = agg_fns[agg_fn](array, columns)
+            df_dict[method] = agg_fns[agg_fn](_interpolate(array), columns)
         return pd.DataFrame.from_dict(df_dict), higher_is_better
+
+    def get_error_bound_df(
+        self,
+        masker: str,
+        activation_fn: str,
+        methods: Optional[List[str]] = None,
+        columns: Optional[npt.NDArray] = None,
+    ) -> pd.DataFrame:
+        """
+        Retrieves a dataframe containing an upper bound on the error of the
+        AUC/AOC values returned by :meth:`get_df`, caused by interpolating
+        the steps that were not evaluated in adaptive mode.
+        The bound assumes that the curve lies between the values at the
+        ends of each interpolated interval. The bound is the same for
+        AUC and AOC, and is zero if all steps were evaluated.
+
+        Parameters
+        ----------
+        masker : str
+            The masker to use.
+        activation_fn : str
+            The activation function to use.
+        methods : Optional[List[str]]
+            The methods to include. If None, includes all methods.
+        columns : Optional[npt.NDArray]
+            The columns used in the AUC/AOC calculation.
+            If None, uses all columns.
+
+        Returns
+        -------
+        pd.DataFrame
+            Dataframe containing the error bounds, with a row for each sample
+            and a column for each method.
+        """
+        methods = methods if methods is not None else self.method_names
+        df_dict = {}
+        for method in methods:
+            array = self.tree.get(
+                masker=masker, activation_fn=activation_fn, method=method
+            )
+            df_dict[method] = _error_bound(array, columns)
+        return pd.DataFrame.from_dict(df_dict)
     
     @override
     def merge(self, other: MetricResult, level: str, allow_overwrite: bool) -> None:
@@ -0,0 +1,129 @@
+import copy
+from typing import Dict, List, Union
+import h5py
+import numpy as np
+from numpy import typing as npt
+from attribench.data._bulk_read import _write_rows
+from attribench.data.nd_array_tree._random_access_nd_array_tree import (
+    RandomAccessNDArrayTree,
+)
+from ._batch_result import BatchResult
+from ._grouped_batch_result import GroupedBatchResult
+from ._metric_result import MetricResult
+from ._result_sink import ResultSink
+
+
+class _HDF5NDArrayTree(RandomAccessNDArrayTree):
+    """RandomAccessNDArrayTree of which the NDArrays are datasets in a HDF5
+    group written by :meth:`RandomAccessNDArrayTree.save_to_hdf`.
+    Writes go directly to the file, so the tree is never held in memory.
+    """
+
+    def __init__(
+        self,
+        group: h5py.Group,
+        levels: Dict[str, List[str]],
+        shape: List[int],
+    ):
+        self.levels = levels
+        self.shape = shape
+        self.level_names = sorted(list(levels.keys()))
+
+        def _open_rec(node: h5py.Group) -> Dict:
+            return {
+                key: _open_rec(child)
+                if isinstance(child, h5py.Group)
+                else child
+                for key, child in node.items()
+            }
+
+        self._data = _open_rec(group)
+
+    def write(
+        self, indices: npt.NDArray, data: npt.NDArray, **level_keys
+    ) -> None:
+        if set(level_keys.keys()) != set(self.levels.keys()):
+            raise ValueError(
+                f"Must provide key for all levels: {list(self.levels.keys())}"
+                f"(received {level_keys})"
+            )
+        dest = self._data
+        for level_name in self.level_names:
+            dest = dest[level_keys[level_name]]
+        _write_rows(dest, indices, np.asarray(data))
+
+
+class _EmptyNDArrayTree(RandomAccessNDArrayTree):
+    """RandomAccessNDArrayTree that only describes the levels and shape of
+    a tree, without allocating its NDArrays. Saving it to a HDF5 group
+    creates the datasets without writing any data to them.
+    """
+
+    def __init__(self, levels: Dict[str, List[str]], shape: List[int]):
+        self.levels = levels
+        self.shape = shape
+        self.level_names = sorted(list(levels.keys()))
+        self._data = {}
+
+    def save_to_hdf(self, group: h5py.Group) -> None:
+        def _add_rec(cur_group: h5py.Group, depth=0):
+            cur_group.attrs["level_name"] = self.level_names[depth]
+            for key in self.levels[self.level_names[depth]]:
+                if depth < len(self.level_names) - 1:
+                    _add_rec(cur_group.create_group(key), depth + 1)
+                else:
+                    # Unwritten rows have the default fill value 0
+                    cur_group.create_dataset(
+                        key, shape=self.shape, dtype=np.float64
+                    )
+
+        _add_rec(group)
+
+
+class HDF5ResultSink(ResultSink):
+    """Writes the results of a metric to a HDF5 file as they are computed,
+    so the full result is never held in memory.
+
+    The file has the same format as the files written by
+    :meth:`MetricResult.save`, and can be loaded using
+    :meth:`MetricResult.load`. The file is created when the metric starts,
+    and samples for which no result was written (e.g. if the metric was
+    stopped early) have value 0.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the HDF5 file. The file must not exist yet.
+        """
+        self.path = path
+        self.file: h5py.File | None = None
+        self.result: MetricResult | None = None
+
+    def open(self, result: MetricResult) -> None:
+        # The file is created by saving a copy of the result of which the
+        # tree only contains the structure, so the metadata of the result
+        # (e.g. the mode of Deletion) is saved as well. Rows are then
+        # written to the datasets in place, through a copy of the result
+        # that uses the file as its tree, so the logic of MetricResult.add
+        # is reused.
+        structure = copy.copy(result)
+        structure.tree = _EmptyNDArrayTree(result.levels, result.shape)
+        structure.save(self.path, "hdf5")
+        self.file = h5py.File(self.path, "r+")
+        structure.tree = _HDF5NDArrayTree(
+            self.file, result.levels, result.shape
+        )
+        self.result = structure
+
+    def add(self, batch_result: Union[BatchResult, GroupedBatchResult]):
+        if self.result is None:
+            raise ValueError("HDF5ResultSink was not opened")
+        self.result.add(batch_result)
+
+    def close(self) -> None:
+        if self.file is not None and self.file.id.valid:
+            self.file.close()
+        self.result = None
@@ -13,6 +13,7 @@ class InfidelityResult(GroupedMetricResult):
         perturbation_generators: List[str],
         activation_fns: List[str],
         num_samples: int,
+        adaptive=False,
     ):
         """
         Parameters
@@ -25,6 +26,10 @@ class InfidelityResult(GroupedMetricResult):
             Names of activation functions used by Infidelity.
         num_samples : int
             Number of samples on which Infidelity was run.
+        adaptive : bool, optional
+            Whether Infidelity was computed adaptively. If True, the number
+            of perturbations used for each sample is stored as well.
+            Defaults to False.
         """
         levels = {
             "method": method_names,
@@ -33,7 +38,11 @@ class InfidelityResult(GroupedMetricResult):
         }
         shape = [num_samples, 1]
         level_order = ["method", "perturbation_generator", "activation_fn"]
+        if adaptive:
+            levels["output"] = ["value", "num_perturbations"]
+            level_order.append("output")
         super().__init__(method_names, shape, levels, level_order)
+        self.adaptive = adaptive
 
     @classmethod
     @override
@@ -44,10 +53,27 @@ class InfidelityResult(GroupedMetricResult):
             tree.levels["perturbation_generator"],
             tree.levels["activation_fn"],
             tree.shape[0],
+            adaptive="output" in tree.levels,
         )
         res.tree = tree
         return res
 
+    def _get(
+        self,
+        method: str,
+        perturbation_generator: str,
+        activation_fn: str,
+        output: str = "value",
+    ):
+        level_keys = {
+            "method": method,
+            "perturbation_generator": perturbation_generator,
+            "activation_fn": activation_fn,
+        }
+        if self.adaptive:
+            level_keys["output"] = output
+        return self.tree.get(**level_keys)
+
     def get_df(
         self,
         perturbation_generator: str,
@@ -78,9 +104,54 @@ class InfidelityResult(GroupedMetricResult):
         methods = methods if methods is not None else self.method_names
         df_dict = {}
         for method in methods:
-            df_dict[method] = self.tree.get(
-                method=method,
-                perturbation_generator=perturbation_generator,
-                activation_fn=activation_fn,
+            df_dict[method] = self._get(
+                method, perturbation_generator, activation_fn
             ).flatten()
         return pd.DataFrame.from_dict(df_dict), False
+
+    def get_num_perturbations_df(
+        self,
+        perturbation_generator: str,
+        activation_fn: str,
+        methods: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """Retrieves a dataframe containing the number of perturbations that
+        were used for each method and sample, for the given perturbation
+        generator and activation function. Only available if Infidelity was
+        computed adaptively.
+
+        Parameters
+        ----------
+        perturbation_generator : str
+            The perturbation generator to use.
+        activation_fn : str
+            The activation function to use.
+        methods : Optional[List[str]], optional
+            The methods to include. If None, includes all methods.
+            Defaults to None.
+
+        Returns
+        -------
+        pd.DataFrame
+            Dataframe containing the number of perturbations.
+
+        Raises
+        ------
+        ValueError
+            If Infidelity was not computed adaptively.
+        """
+        if not self.adaptive:
+            raise ValueError(
+                "Number of perturbations is only stored for adaptive"
+                " Infidelity."
+            )
+        methods = methods if methods is not None else self.method_names
+        df_dict = {}
+        for method in methods:
+            df_dict[method] = self._get(
+                method,
+                perturbation_generator,
+                activation_fn,
+                output="num_perturbations",
+            ).flatten()
+        return pd.DataFrame.from_dict(df_dict)
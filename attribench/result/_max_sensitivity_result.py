@@ -6,7 +6,9 @@ from ._grouped_metric_result import GroupedMetricResult
 class MaxSensitivityResult(GroupedMetricResult):
     """Represents results from running the Max-Sensitivity metric.
     """
-    def __init__(self, method_names: List[str], num_samples: int):
+    def __init__(
+        self, method_names: List[str], num_samples: int, adaptive=False
+    ):
         """
         Parameters
         ----------
@@ -14,19 +16,36 @@ class MaxSensitivityResult(GroupedMetricResult):
             Names of attribution methods tested by Max-Sensitivity.
         num_samples : int
             Number of samples on which Max-Sensitivity was run.
+        adaptive : bool, optional
+            Whether Max-Sensitivity was computed adaptively. If True, the
+            number of perturbations used for each sample is stored as well.
+            Defaults to False.
         """
         levels = {"method": method_names}
         level_order = ["method"]
+        if adaptive:
+            levels["output"] = ["value", "num_perturbations"]
+            level_order.append("output")
         shape = [num_samples]
         super().__init__(method_names, shape, levels, level_order)
+        self.adaptive = adaptive
 
     @classmethod
     def _load(cls, path: str, format="hdf5") -> "MaxSensitivityResult":
         tree = cls._load_tree(path, format)
-        res = MaxSensitivityResult(tree.levels["method"], tree.shape[0])
+        res = MaxSensitivityResult(
+            tree.levels["method"],
+            tree.shape[0],
+            adaptive="output" in tree.levels,
+        )
         res.tree = tree
         return res
 
+    def _get(self, method: str, output: str = "value"):
+        if self.adaptive:
+            return self.tree.get(method=method, output=output)
+        return self.tree.get(method=method)
+
     def get_df(
         self, methods: Optional[List[str]] = None
     ) -> Tuple[pd.DataFrame, bool]:
@@ -49,5 +68,39 @@ class MaxSensitivityResult(GroupedMetricResult):
         methods = methods if methods is not None else self.method_names
         df_dict = {}
         for method in methods:
-            df_dict[method] = self.tree.get(method=method)
+            df_dict[method] = self._get(method)
         return pd.DataFrame.from_dict(df_dict), False
+
+    def get_num_perturbations_df(
+        self, methods: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """Retrieves a dataframe containing the number of perturbations that
+        were used for each method and sample. Only available if
+        Max-Sensitivity was computed adaptively.
+
+        Parameters
+        ----------
+        methods : Optional[List[str]], optional
+            the methods to include. If None, includes all methods.
+            Defaults to None.
+
+        Returns
+        -------
+        pd.DataFrame
+            Dataframe containing the number of perturbations.
+
+        Raises
+        ------
+        ValueError
+            If Max-Sensitivity was not computed adaptively.
+        """
+        if not self.adaptive:
+            raise ValueError(
+                "Number of perturbations is only stored for adaptive"
+                " Max-Sensitivity."
+            )
+        methods = methods if methods is not None else self.method_names
+        df_dict = {}
+        for method in methods:
+            df_dict[method] = self._get(method, output="num_perturbations")
+        return pd.DataFrame.from_dict(df_dict)
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Optional
 import h5py
 import numpy as np
 from attribench.data.nd_array_tree._random_access_nd_array_tree import (
@@ -54,7 +54,22 @@ class MetricResult:
         self.method_names = method_names
         self.levels = levels
         self.level_order = level_order
-        self.tree = RandomAccessNDArrayTree(levels, shape)
+        self._tree: Optional[RandomAccessNDArrayTree] = None
+
+    @property
+    def tree(self) -> RandomAccessNDArrayTree:
+        """Tree containing the results. The arrays of the tree are only
+        allocated when the tree is first used, so a result that only
+        describes the structure of the results (e.g. for a
+        :class:`ResultSink`) takes no memory.
+        """
+        if self._tree is None:
+            self._tree = RandomAccessNDArrayTree(self.levels, self.shape)
+        return self._tree
+
+    @tree.setter
+    def tree(self, tree: RandomAccessNDArrayTree):
+        self._tree = tree
 
     def add(self, batch_result: BatchResult):
         """
@@ -1,12 +1,32 @@
 from typing import Tuple, Optional, List
+from typing_extensions import override
+import os
+import h5py
+import yaml
+import numpy as np
 import pandas as pd
 from ._grouped_metric_result import GroupedMetricResult
 
 
 class ParameterRandomizationResult(GroupedMetricResult):
     """Represents results from running the Parameter Randomization metric.
+
+    If the cascading variant of Parameter Randomization was used,
+    the result contains an additional ``layer`` level, with one entry for
+    each stage of the cascade. The entry for a given layer contains the
+    result after randomizing that layer and all layers above it.
+
+    If Parameter Randomization was run for multiple random seeds, the result
+    contains the correlation for each seed. :meth:`get_df` then aggregates
+    over the seeds.
     """
-    def __init__(self, method_names: List[str], num_samples: int):
+    def __init__(
+        self,
+        method_names: List[str],
+        num_samples: int,
+        layers: Optional[List[str]] = None,
+        num_seeds: int = 1,
+    ):
         """
         Parameters
         ----------
@@ -14,21 +34,68 @@ class ParameterRandomizationResult(GroupedMetricResult):
             Names of attribution methods tested by Parameter Randomization.
         num_samples : int
             Number of samples on which Parameter Randomization was run.
+        layers : Optional[List[str]], optional
+            Names of the randomized layers, in the order in which they were
+            randomized (top to bottom). Only used for cascading Parameter
+            Randomization. If None, the result has no layer level.
+            Defaults to None.
+        num_seeds : int, optional
+            Number of random seeds (i.e. independent re-initializations of
+            the model) for which Parameter Randomization was run.
+            Defaults to 1.
         """
         levels = {"method": method_names}
         level_order = ["method"]
+        if layers is not None:
+            levels["layer"] = list(layers)
+            level_order.append("layer")
         shape = [num_samples]
+        if num_seeds > 1:
+            shape.append(num_seeds)
         super().__init__(method_names, shape, levels, level_order)
+        self.layers = list(layers) if layers is not None else None
+        self.num_seeds = num_seeds
+
+    @override
+    def save(self, path: str, format="hdf5"):
+        super().save(path, format)
+
+        # Save the order of the layers, as the tree does not preserve it
+        if self.layers is None:
+            return
+        if format == "hdf5":
+            with h5py.File(path, mode="a") as fp:
+                fp.attrs["layers"] = self.layers
+        elif format == "csv":
+            with open(os.path.join(path, "metadata.yaml"), "r") as fp:
+                metadata = yaml.safe_load(fp)
+            metadata["layers"] = self.layers
+            with open(os.path.join(path, "metadata.yaml"), "w") as fp:
+                yaml.dump(metadata, fp)
 
     @classmethod
     def _load(cls, path: str, format="hdf5") -> "ParameterRandomizationResult":
         tree = cls._load_tree(path, format)
-        res = ParameterRandomizationResult(tree.levels["method"], tree.shape[0])
+        layers = None
+        if "layer" in tree.levels:
+            if format == "hdf5":
+                with h5py.File(path, "r") as fp:
+                    layers = [str(layer) for layer in fp.attrs["layers"]]
+            else:
+                with open(os.path.join(path, "metadata.yaml"), "r") as fp:
+                    layers = yaml.safe_load(fp)["layers"]
+        num_seeds = tree.shape[1] if len(tree.shape) > 1 else 1
+        res = ParameterRandomizationResult(
+            tree.levels["method"], tree.shape[0], layers, num_seeds
+        )
         res.tree = tree
         return res
 
     def get_df(
-        self, methods: Optional[List[str]] = None
+        self,
+        methods: Optional[List[str]] = None,
+        layer: Optional[str] = None,
+        agg_fn: str = "mean",
     ) -> Tuple[pd.DataFrame, bool]:
         """Retrieves a dataframe from the result. The dataframe contains a row
         for each method and a column for each sample. Each value is the
@@ -39,6 +106,16 @@ class ParameterRandomizationResult(GroupedMetricResult):
         methods : Optional[List[str]], optional
             the methods to include. If None, includes all methods.
             Defaults to None.
+        layer : Optional[str], optional
+            the layer up to which the model was randomized. Only used for
+            cascading Parameter Randomization. If None, the last layer is used
+            (i.e. the fully randomized model).
+            Defaults to None.
+        agg_fn : str, optional
+            How to aggregate the results over the random seeds. Either
+            ``"mean"`` for the mean or ``"std"`` for the standard deviation.
+            Only used if the result contains multiple seeds.
+            Defaults to ``"mean"``.
 
         Returns
         -------
@@ -46,8 +123,22 @@ class ParameterRandomizationResult(GroupedMetricResult):
             Dataframe containing results,
             and boolean indicating if higher is better.
         """
+        if agg_fn not in ("mean", "std"):
+            raise ValueError(f"Invalid agg_fn: {agg_fn}")
         methods = methods if methods is not None else self.method_names
         df_dict = {}
         for method in methods:
-            df_dict[method] = self.tree.get(method=method)
+            if self.layers is None:
+                array = self.tree.get(method=method)
+            else:
+                array = self.tree.get(
+                    method=method,
+                    layer=layer if layer is not None else self.layers[-1],
+                )
+            if self.num_seeds > 1:
+                if agg_fn == "mean":
+                    array = np.mean(array, axis=-1)
+                else:
+                    array = np.std(array, axis=-1)
+            df_dict[method] = array
         return pd.DataFrame.from_dict(df_dict), False
@@ -0,0 +1,54 @@
+from abc import abstractmethod
+from typing import Union
+from ._batch_result import BatchResult
+from ._grouped_batch_result import GroupedBatchResult
+from ._metric_result import MetricResult
+
+
+class ResultSink:
+    """Base class for consumers of the results of a metric.
+
+    Instead of collecting the full result of a metric in memory, the
+    functional metrics can pass the result of each batch to one or more
+    sinks as soon as it is computed, using the `sinks` argument (e.g.
+    :func:`~attribench.functional.metrics.deletion`). A sink can write the
+    results to disk, keep running statistics, or stop the metric early.
+
+    The metric calls :meth:`open` once before the first batch, :meth:`add`
+    for each batch and :meth:`close` when it is done, also if it was
+    stopped early or failed. After each batch, the metric stops if
+    :attr:`stop` is True for any of its sinks.
+    """
+
+    def open(self, result: MetricResult) -> None:
+        """Called by the metric before the first batch.
+
+        Parameters
+        ----------
+        result : MetricResult
+            Empty result of the metric, which describes the structure of
+            the results (``levels``, ``level_order`` and ``shape``).
+            Its arrays are not allocated: accessing ``result.tree``
+            allocates the full result in memory, which sinks should avoid.
+        """
+        pass
+
+    @abstractmethod
+    def add(self, batch_result: Union[BatchResult, GroupedBatchResult]):
+        """Called by the metric for the result of each batch.
+
+        Parameters
+        ----------
+        batch_result : Union[BatchResult, GroupedBatchResult]
+            Result of the metric on a batch of samples.
+        """
+        raise NotImplementedError
+
+    @property
+    def stop(self) -> bool:
+        """If True, the metric stops after the current batch."""
+        return False
+
+    def close(self) -> None:
+        """Called by the metric after the last batch."""
+        pass
@@ -0,0 +1,206 @@
+from typing import Dict, List, Optional, Tuple, Union
+import itertools
+import numpy as np
+from numpy import typing as npt
+import torch
+from ._batch_result import BatchResult
+from ._grouped_batch_result import GroupedBatchResult
+from ._grouped_metric_result import GroupedMetricResult
+from ._metric_result import MetricResult
+from ._result_sink import ResultSink
+
+
+def _flatten(
+    data: Dict, prefix: Tuple[str, ...] = ()
+) -> Dict[Tuple, npt.NDArray]:
+    # Maps the path to each leaf of a nested dictionary to the leaf
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, prefix + (key,)))
+        else:
+            if isinstance(value, torch.Tensor):
+                value = value.detach().cpu().numpy()
+            flat[prefix + (key,)] = np.asarray(value, dtype=np.float64)
+    return flat
+
+
+def _unflatten(flat: Dict[Tuple, npt.NDArray]) -> Dict:
+    data: Dict = {}
+    for path, value in flat.items():
+        node = data
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return data
+
+
+class RunningStatistics(ResultSink):
+    """Keeps the running mean and variance of the results of a metric
+    over the samples, without storing the results themselves.
+
+    The statistics have the same structure as the results of a batch. For
+    metrics that compute each method separately, the method name is added
+    as the first level, e.g. ``mean["Gradient"]["constant"]["linear"]``.
+    NaN values (e.g. steps that were not evaluated by Deletion in
+    adaptive mode) are ignored.
+
+    If `tolerance` is given, the metric is stopped early as soon as the
+    standard error of every mean is at most `tolerance`, after at least
+    `min_samples` samples. This gives a cheap estimate of the average
+    result of a metric, without running it on the full dataset.
+
+    When the metric opens the sink, the statistics record every result
+    the metric will compute (e.g. each combination of method, masker and
+    activation function). The metric is only stopped once each of these
+    results has enough samples. Metrics such as Deletion compute the
+    methods one after the other, unless ``sample_major=True``. In that
+    case, all samples are computed for the first methods, and only the
+    last method is stopped early. Use ``sample_major=True`` to stop all
+    methods early.
+    """
+
+    def __init__(
+        self,
+        tolerance: Optional[float] = None,
+        min_samples: int = 2,
+        max_samples: Optional[int] = None,
+    ):
+        """
+        Parameters
+        ----------
+        tolerance : Optional[float], optional
+            If given, the metric is stopped once the standard error of all
+            means is at most `tolerance`. Defaults to None.
+        min_samples : int, optional
+            Minimal number of samples before the metric is stopped because
+            of `tolerance`. At least 2 samples are always needed to
+            estimate the standard error. Defaults to 2.
+        max_samples : Optional[int], optional
+            If given, the metric is stopped once the statistics contain at
+            least `max_samples` samples. Defaults to None.
+        """
+        self.tolerance = tolerance
+        self.min_samples = max(min_samples, 2)
+        self.max_samples = max_samples
+        self._num_samples: Dict[Tuple, int] = {}
+        self._expected_paths: List[Tuple] = []
+        self._count: Dict[Tuple, npt.NDArray] = {}
+        self._mean: Dict[Tuple, npt.NDArray] = {}
+        self._m2: Dict[Tuple, npt.NDArray] = {}
+
+    def open(self, result: MetricResult) -> None:
+        # Paths have the same order as the results of the batches. For
+        # metrics that compute each method separately, the method is the
+        # first level.
+        level_order = list(result.level_order)
+        if not isinstance(result, GroupedMetricResult):
+            level_order.remove("method")
+            level_order.insert(0, "method")
+        self._expected_paths = list(
+            itertools.product(
+                *(result.levels[level_name] for level_name in level_order)
+            )
+        )
+
+    def _update(self, path: Tuple, values: npt.NDArray):
+        # Merges the statistics of the batch with the running statistics,
+        # using the parallel algorithm of Chan et al.
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        values = np.where(valid, values, 0.0)
+        mean = values.sum(axis=0) / np.maximum(count, 1)
+        m2 = (np.where(valid, values - mean, 0.0) ** 2).sum(axis=0)
+        self._num_samples[path] = (
+            self._num_samples.get(path, 0) + values.shape[0]
+        )
+        if path not in self._count:
+            self._count[path], self._mean[path], self._m2[path] = (
+                count,
+                mean,
+                m2,
+            )
+            return
+        total = self._count[path] + count
+        delta = mean - self._mean[path]
+        weight = count / np.maximum(total, 1)
+        self._m2[path] = (
+            self._m2[path] + m2 + delta**2 * self._count[path] * weight
+        )
+        self._mean[path] = self._mean[path] + delta * weight
+        self._count[path] = total
+
+    def add(self, batch_result: Union[BatchResult, GroupedBatchResult]):
+        flat = _flatten(batch_result.results)
+        if isinstance(batch_result, GroupedBatchResult):
+            for path, values in flat.items():
+                self._update(path, values)
+            return
+        method_names = np.array(batch_result.method_names)
+        for method_name in np.unique(method_names):
+            rows = method_names == method_name
+            for path, values in flat.items():
+                self._update((str(method_name),) + path, values[rows])
+
+    @property
+    def num_samples(self) -> int:
+        """Smallest number of samples over all results. If the sink was
+        opened by a metric, results that were not computed yet have 0
+        samples.
+        """
+        if len(self._expected_paths) > 0:
+            return min(
+                self._num_samples.get(path, 0)
+                for path in self._expected_paths
+            )
+        return min(self._num_samples.values(), default=0)
+
+    @property
+    def count(self) -> Dict:
+        """Number of samples (excluding NaN values) for each result."""
+        return _unflatten(self._count)
+
+    @property
+    def mean(self) -> Dict:
+        """Mean over the samples for each result."""
+        return _unflatten(
+            {
+                path: np.where(self._count[path] > 0, mean, np.nan)
+                for path, mean in self._mean.items()
+            }
+        )
+
+    def _variance(self, path: Tuple) -> npt.NDArray:
+        count = self._count[path]
+        return np.where(
+            count > 1, self._m2[path] / np.maximum(count - 1, 1), np.nan
+        )
+
+    @property
+    def variance(self) -> Dict:
+        """Sample variance over the samples for each result."""
+        return _unflatten({path: self._variance(path) for path in self._m2})
+
+    def _std_error(self, path: Tuple) -> npt.NDArray:
+        return np.sqrt(self._variance(path) / np.maximum(self._count[path], 1))
+
+    @property
+    def std_error(self) -> Dict:
+        """Standard error of the mean for each result."""
+        return _unflatten({path: self._std_error(path) for path in self._m2})
+
+    @property
+    def stop(self) -> bool:
+        if len(self._num_samples) == 0:
+            return False
+        if self.max_samples is not None:
+            if self.num_samples >= self.max_samples:
+                return True
+        if self.tolerance is None or self.num_samples < self.min_samples:
+            return False
+        for path in self._m2:
+            std_error = self._std_error(path)
+            # Results without any valid values are not taken into account
+            if np.any(std_error[~np.isnan(std_error)] > self.tolerance):
+                return False
+        return True
@@ -0,0 +1,119 @@
+"""Micro-benchmark comparing read throughput of attributions stored with
+different storage profiles (see :class:`attribench.data.AttributionsDatasetWriter`).
+
+Three access patterns are measured:
+
+- ``method-major``: consecutive batches for each method in turn, as read by
+  Deletion, Insertion and IROF.
+- ``grouped``: consecutive batches of samples with the attributions of all
+  methods, as read by the grouped metrics (e.g. Parameter Randomization)
+  and by sample-major scheduling.
+- ``grouped-shuffled``: the same, but with samples in random order.
+
+Usage::
+
+    python benchmarks/attributions_storage.py --num-samples 512
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from attribench.data import (
+    AttributionsDataset,
+    AttributionsDatasetWriter,
+    GroupedAttributionsDataset,
+    hdf5_to_memmap,
+)
+
+PROFILES = {
+    "default": {},
+    "sample-chunks": {"chunking": "sample"},
+    "batch-chunks": {"chunking": "batch"},
+    "batch-chunks-lzf": {"chunking": "batch", "compression": "lzf"},
+    "batch-chunks-gzip": {"chunking": "batch", "compression": "gzip"},
+    "batch-chunks-float16": {"chunking": "batch", "dtype": np.float16},
+    "batch-chunks-blosc": {"chunking": "batch", "compression": "blosc"},
+    # Default profile, converted to memory-mapped .npy files
+    "memmap": {},
+}
+
+
+def _write(path, attributions, batch_size, profile):
+    num_samples = attributions[next(iter(attributions))].shape[0]
+    writer = AttributionsDatasetWriter(
+        path, num_samples, batch_size=batch_size, **profile
+    )
+    for method_name, method_attrs in attributions.items():
+        for start in range(0, num_samples, batch_size):
+            indices = np.arange(start, min(start + batch_size, num_samples))
+            writer.write(indices, method_attrs[indices], method_name)
+    writer.close()
+
+
+def _time(dataset, batch_size, shuffle, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in DataLoader(dataset, batch_size=batch_size, shuffle=shuffle):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-samples", type=int, default=256)
+    parser.add_argument("--num-methods", type=int, default=4)
+    parser.add_argument("--sample-shape", type=int, nargs="+",
+                        default=[3, 64, 64])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    samples = torch.zeros(args.num_samples, *args.sample_shape)
+    labels = torch.zeros(args.num_samples, dtype=torch.long)
+    attributions = {
+        f"method_{i}": rng.standard_normal(
+            (args.num_samples, *args.sample_shape), dtype=np.float32
+        )
+        for i in range(args.num_methods)
+    }
+
+    print(
+        f"{'profile':<24}{'size (MB)':>10}{'method-major':>14}"
+        f"{'grouped':>10}{'shuffled':>10}   (samples/s)"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, profile in PROFILES.items():
+            path = os.path.join(tmpdir, f"{name}.h5")
+            try:
+                _write(path, attributions, args.batch_size, profile)
+            except ValueError as e:
+                print(f"{name:<24}skipped: {e}")
+                continue
+            size = os.path.getsize(path)
+            if name == "memmap":
+                hdf5_to_memmap(path, os.path.join(tmpdir, name))
+                path = os.path.join(tmpdir, name)
+            dataset = AttributionsDataset(samples, labels, path=path)
+            grouped = GroupedAttributionsDataset(dataset)
+            method_major = _time(
+                dataset, args.batch_size, False, args.repeats
+            )
+            grouped_time = _time(grouped, args.batch_size, False, args.repeats)
+            shuffled_time = _time(grouped, args.batch_size, True, args.repeats)
+            num_rows = args.num_samples * args.num_methods
+            print(
+                f"{name:<24}{size / 2**20:>10.1f}"
+                f"{num_rows / method_major:>14.0f}"
+                f"{num_rows / grouped_time:>10.0f}"
+                f"{num_rows / shuffled_time:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
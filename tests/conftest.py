@@ -0,0 +1,106 @@
+import itertools
+import numpy as np
+import pytest
+import torch
+from torch import nn
+from attribench import BasicModelFactory, MethodFactory
+from attribench.data import AttributionsDataset
+
+
+NUM_SAMPLES = 8
+NUM_CLASSES = 4
+SAMPLE_SHAPE = (3, 8, 8)
+
+
+class Net(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.conv = nn.Conv2d(3, 4, 3, padding=1)
+        self.fc = nn.Linear(4 * 8 * 8, NUM_CLASSES)
+
+    def forward(self, x):
+        return self.fc(torch.relu(self.conv(x)).flatten(1))
+
+
+class Gradient:
+    def __init__(self, model: nn.Module):
+        self.model = model
+
+    def __call__(self, x, y):
+        x = x.clone().requires_grad_(True)
+        out = self.model(x).gather(1, y.unsqueeze(-1)).sum()
+        return torch.autograd.grad(out, x)[0]
+
+
+class InputXGradient(Gradient):
+    def __call__(self, x, y):
+        return super().__call__(x, y) * x
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    return Net().eval()
+
+
+@pytest.fixture
+def samples(model):
+    generator = torch.Generator().manual_seed(0)
+    x = torch.rand(NUM_SAMPLES, *SAMPLE_SHAPE, generator=generator)
+    with torch.no_grad():
+        y = model(x).argmax(dim=1)
+    return x, y
+
+
+@pytest.fixture
+def method_factory():
+    return MethodFactory({"grad": Gradient, "ixg": InputXGradient})
+
+
+@pytest.fixture
+def model_factory(model):
+    return BasicModelFactory(model)
+
+
+@pytest.fixture
+def feature_attributions_dataset(model, samples, method_factory):
+    # Attributions have the same shape as the samples
+    x, y = samples
+    attributions = {
+        name: method(x, y).detach()
+        for name, method in method_factory(model).items()
+    }
+    return AttributionsDataset(x, y, attributions=attributions)
+
+
+@pytest.fixture
+def attributions_dataset(model, samples, method_factory):
+    # Attributions are summed over the channels, so they can be used
+    # with pixel-level maskers
+    x, y = samples
+    attributions = {
+        name: method(x, y).detach().sum(dim=1, keepdim=True)
+        for name, method in method_factory(model).items()
+    }
+    return AttributionsDataset(x, y, attributions=attributions)
+
+
+def _assert_results_equal(result, expected, atol=1e-5):
+    # Compares the arrays of two metric results, NaNs are considered equal.
+    # The order of the keys in a level can change when a result is loaded.
+    levels = result.tree.levels
+    assert {name: set(keys) for name, keys in levels.items()} == {
+        name: set(keys) for name, keys in expected.tree.levels.items()
+    }
+    for keys in itertools.product(*levels.values()):
+        level_keys = dict(zip(levels.keys(), keys))
+        np.testing.assert_allclose(
+            result.tree.get(**level_keys),
+            expected.tree.get(**level_keys),
+            atol=atol,
+        )
+
+
+@pytest.fixture
+def assert_results_equal():
+    return _assert_results_equal
@@ -0,0 +1,99 @@
+import h5py
+import numpy as np
+import pytest
+from attribench.data import AttributionsDatasetWriter
+
+
+NUM_SAMPLES = 8
+SAMPLE_SHAPE = (1, 2, 2)
+
+
+def _attributions(indices, value_offset=0.0):
+    # Each row is filled with its sample index, so rows can be recognized
+    indices = np.asarray(indices)
+    return (
+        np.ones((len(indices), *SAMPLE_SHAPE), dtype=np.float32)
+        * (indices + value_offset)[:, None, None, None]
+    )
+
+
+def _read(path, method_name):
+    with h5py.File(path, "r") as fp:
+        return fp[method_name][()]
+
+
+# None writes rows immediately, 1 submits a buffer on every write and
+# 1e6 keeps all rows buffered until flush
+@pytest.mark.parametrize("buffer_size", [None, 1, 10**6])
+def test_unsorted_and_duplicate_writes(tmp_path, buffer_size):
+    path = str(tmp_path / "attrs.h5")
+    writer = AttributionsDatasetWriter(
+        path, NUM_SAMPLES, buffer_size=buffer_size
+    )
+    writer.write(np.array([5, 1, 7, 0]), _attributions([5, 1, 7, 0]), "m")
+    writer.write(np.array([6, 2, 4, 3]), _attributions([6, 2, 4, 3]), "m")
+    # Rewritten rows must overwrite the earlier rows, also within a batch
+    writer.write(
+        np.array([1, 3, 1]), _attributions([1, 3, 1], [10, 10, 20]), "m"
+    )
+    writer.close()
+
+    expected = _attributions(np.arange(NUM_SAMPLES))
+    expected[1] = 21
+    expected[3] = 13
+    np.testing.assert_array_equal(_read(path, "m"), expected)
+
+
+def test_flush_writes_buffered_rows(tmp_path):
+    path = str(tmp_path / "attrs.h5")
+    writer = AttributionsDatasetWriter(path, NUM_SAMPLES, buffer_size=10**6)
+    writer.write(np.array([2, 0]), _attributions([2, 0]), "a")
+    writer.write(np.array([1]), _attributions([1]), "b")
+    # Rows are only buffered, no datasets have been created yet
+    assert "a" not in writer.file.keys()
+
+    writer.flush()
+    np.testing.assert_array_equal(
+        writer.file["a"][[0, 2]], _attributions([0, 2])
+    )
+    np.testing.assert_array_equal(writer.file["b"][[1]], _attributions([1]))
+
+    writer.write(np.array([3]), _attributions([3]), "a")
+    writer.close()
+    assert not writer.file.id.valid
+    np.testing.assert_array_equal(
+        _read(path, "a")[[0, 2, 3]], _attributions([0, 2, 3])
+    )
+    # Closing twice is allowed
+    writer.close()
+
+
+def test_float16_storage(tmp_path):
+    path = str(tmp_path / "attrs.h5")
+    writer = AttributionsDatasetWriter(
+        path, NUM_SAMPLES, dtype=np.float16, buffer_size=1
+    )
+    writer.write(np.arange(NUM_SAMPLES), _attributions(range(8)), "m")
+    writer.close()
+    with h5py.File(path, "r") as fp:
+        assert fp["m"].dtype == np.float16
+        assert fp.attrs["storage_dtype"] == "float16"
+
+
+def test_background_error_is_raised(tmp_path, monkeypatch):
+    path = str(tmp_path / "attrs.h5")
+    writer = AttributionsDatasetWriter(path, NUM_SAMPLES, buffer_size=1)
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("write failed")
+
+    # The rows are written on the background thread
+    monkeypatch.setattr(writer, "_write_method", _fail)
+    writer.write(np.array([0]), _attributions([0]), "m")
+    with pytest.raises(RuntimeError, match="write failed"):
+        writer.close()
+    # The file and the background thread are closed despite the error
+    assert not writer.file.id.valid
+    assert writer._executor is not None
+    with pytest.raises(RuntimeError):
+        writer._executor.submit(print)
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import TensorDataset
+from attribench.data import (
+    AttributionsDataset,
+    HDF5Dataset,
+    HDF5DatasetWriter,
+    OutputCache,
+)
+from attribench.functional import select_samples
+from attribench.functional.metrics import (
+    deletion,
+    insertion,
+    irof,
+    minimal_subset,
+)
+from attribench.masking.image import ConstantImageMasker
+
+
+MASKERS = {"constant": ConstantImageMasker("pixel")}
+ACTIVATION_FNS = ["linear", "softmax"]
+CURVE_METRICS = [deletion, insertion, irof]
+
+
+def _curve_kwargs(metric):
+    if metric is minimal_subset:
+        return {"num_steps": 10}
+    return {"activation_fns": ACTIVATION_FNS, "num_steps": 10}
+
+
+@pytest.mark.parametrize("metric", CURVE_METRICS + [minimal_subset])
+def test_sample_major_equals_method_major(
+    model, attributions_dataset, assert_results_equal, metric
+):
+    kwargs = _curve_kwargs(metric)
+    expected = metric(model, attributions_dataset, 3, MASKERS, **kwargs)
+    result = metric(
+        model,
+        attributions_dataset,
+        3,
+        MASKERS,
+        **kwargs,
+        sample_major=True,
+    )
+    assert_results_equal(result, expected)
+
+
+@pytest.mark.parametrize("metric", CURVE_METRICS)
+def test_adaptive_refinement(model, attributions_dataset, metric):
+    full = metric(
+        model, attributions_dataset, 3, MASKERS, ACTIVATION_FNS, num_steps=41
+    )
+    adaptive = metric(
+        model,
+        attributions_dataset,
+        3,
+        MASKERS,
+        ACTIVATION_FNS,
+        num_steps=41,
+        tolerance=0.1,
+        num_coarse_steps=6,
+    )
+    num_skipped = 0
+    for activation_fn in ACTIVATION_FNS:
+        for method in ["grad", "ixg"]:
+            level_keys = dict(
+                masker="constant", activation_fn=activation_fn, method=method
+            )
+            curves = adaptive.tree.get(**level_keys)
+            evaluated = ~np.isnan(curves)
+            num_skipped += (~evaluated).sum()
+            # Steps that were evaluated are exact
+            np.testing.assert_allclose(
+                curves[evaluated],
+                full.tree.get(**level_keys)[evaluated],
+                atol=1e-5,
+            )
+        # Interpolating the skipped steps stays within the error bound
+        error = (
+            adaptive.get_df("constant", activation_fn)[0]
+            - full.get_df("constant", activation_fn)[0]
+        ).abs()
+        bound = adaptive.get_error_bound_df("constant", activation_fn)
+        assert (error <= bound + 1e-6).all().all()
+    assert num_skipped > 0
+
+
+@pytest.fixture
+def cached_dataset(tmp_path, model, samples, method_factory):
+    # select_samples stores the outputs of the model next to the samples
+    path = str(tmp_path / "samples.h5")
+    x, y = samples
+    select_samples(
+        model, TensorDataset(x, y), 6, 3, writer=HDF5DatasetWriter(path, 6)
+    )
+    dataset = HDF5Dataset(path)
+    x = torch.stack([torch.as_tensor(dataset[i][0]) for i in range(6)])
+    y = torch.tensor([int(dataset[i][1]) for i in range(6)])
+    attributions = {
+        name: method(x, y).detach().sum(dim=1, keepdim=True)
+        for name, method in method_factory(model).items()
+    }
+    return (
+        AttributionsDataset(dataset, attributions=attributions),
+        OutputCache(path),
+    )
+
+
+@pytest.mark.parametrize("metric", CURVE_METRICS + [minimal_subset])
+@pytest.mark.parametrize("sample_major", [False, True])
+def test_output_cache(
+    model, cached_dataset, assert_results_equal, metric, sample_major
+):
+    dataset, output_cache = cached_dataset
+    assert output_cache.for_model(model) is not None
+    kwargs = _curve_kwargs(metric)
+
+    # Count the forward passes of the model
+    num_batches = []
+    forward = model.forward
+
+    def counting_forward(x):
+        num_batches.append(x.shape[0])
+        return forward(x)
+
+    model.forward = counting_forward
+    expected = metric(
+        model, dataset, 3, MASKERS, **kwargs, sample_major=sample_major
+    )
+    num_uncached = len(num_batches)
+    num_batches.clear()
+    result = metric(
+        model,
+        dataset,
+        3,
+        MASKERS,
+        **kwargs,
+        sample_major=sample_major,
+        output_cache=output_cache,
+    )
+    # The forward passes on the original samples are skipped
+    assert len(num_batches) < num_uncached
+    assert_results_equal(result, expected)
@@ -0,0 +1,193 @@
+import itertools
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import TensorDataset
+from attribench.distributed._worker import WorkerConfig
+from attribench.distributed.metrics import (
+    Deletion,
+    ImpactCoverage,
+    Infidelity,
+    Insertion,
+    Irof,
+    MaxSensitivity,
+    MinimalSubset,
+    ParameterRandomization,
+    SensitivityN,
+)
+from attribench.functional.metrics import (
+    deletion,
+    insertion,
+    irof,
+    minimal_subset,
+    parameter_randomization,
+)
+from attribench.functional.metrics.infidelity import (
+    NoisyBaselinePerturbationGenerator,
+)
+from attribench.masking.image import ConstantImageMasker
+
+
+WORLD_SIZE = 2
+MASKERS = {"constant": ConstantImageMasker("pixel")}
+
+
+class _InProcessWorkerConfig(WorkerConfig):
+    # Passes the results of a worker directly to the metric
+    def __init__(self, world_size, rank, result_handler):
+        super().__init__(world_size, rank)
+        self.result_handler = result_handler
+
+    def setup(self):
+        pass
+
+    def cleanup(self):
+        pass
+
+    def send_result(self, result):
+        self.result_handler(result)
+
+
+def _run(metric):
+    # Runs the workers of all ranks one after the other on the CPU,
+    # and returns the indices of the samples that were sent
+    indices = []
+
+    def handle_result(message):
+        indices.append(message.data.indices)
+        metric._handle_result(message)
+
+    for rank in range(WORLD_SIZE):
+        worker = metric._create_worker(
+            _InProcessWorkerConfig(WORLD_SIZE, rank, handle_result)
+        )
+        worker.device = torch.device("cpu")
+        worker.work()
+    return np.unique(np.concatenate([np.asarray(i) for i in indices]))
+
+
+def _assert_finite(result):
+    levels = result.tree.levels
+    for keys in itertools.product(*levels.values()):
+        values = result.tree.get(**dict(zip(levels.keys(), keys)))
+        assert np.isfinite(values).all()
+
+
+@pytest.mark.parametrize(
+    "metric_cls, metric_fn, kwargs",
+    [
+        (Deletion, deletion, {"activation_fns": "linear", "num_steps": 5}),
+        (Insertion, insertion, {"activation_fns": "linear", "num_steps": 5}),
+        (Irof, irof, {"activation_fns": "linear", "num_steps": 5}),
+        (MinimalSubset, minimal_subset, {"num_steps": 5}),
+    ],
+)
+@pytest.mark.parametrize("sample_major", [False, True])
+def test_masking_metrics(
+    model,
+    model_factory,
+    attributions_dataset,
+    assert_results_equal,
+    metric_cls,
+    metric_fn,
+    kwargs,
+    sample_major,
+):
+    metric = metric_cls(
+        model_factory,
+        attributions_dataset,
+        3,
+        MASKERS,
+        sample_major=sample_major,
+        **kwargs,
+    )
+    indices = _run(metric)
+    assert len(indices) == attributions_dataset.num_samples
+    expected = metric_fn(model, attributions_dataset, 3, MASKERS, **kwargs)
+    assert_results_equal(metric.result, expected)
+
+
+@pytest.mark.parametrize("cascading", [False, True])
+def test_parameter_randomization(
+    model_factory,
+    feature_attributions_dataset,
+    method_factory,
+    assert_results_equal,
+    cascading,
+):
+    kwargs = dict(cascading=cascading, num_seeds=2, seed=0)
+    metric = ParameterRandomization(
+        model_factory,
+        feature_attributions_dataset,
+        3,
+        method_factory,
+        **kwargs,
+    )
+    _run(metric)
+    # All ranks use the same randomized models
+    expected = parameter_randomization(
+        model_factory,
+        feature_attributions_dataset,
+        3,
+        method_factory,
+        **kwargs,
+    )
+    assert_results_equal(metric.result, expected)
+
+
+def test_infidelity(model_factory, attributions_dataset):
+    metric = Infidelity(
+        model_factory,
+        attributions_dataset,
+        3,
+        ["linear"],
+        {"noisy": NoisyBaselinePerturbationGenerator(0.1)},
+        4,
+    )
+    assert len(_run(metric)) == attributions_dataset.num_samples
+    _assert_finite(metric.result)
+
+
+def test_max_sensitivity(model_factory, attributions_dataset, method_factory):
+    metric = MaxSensitivity(
+        model_factory, attributions_dataset, 3, method_factory, 3, 0.1
+    )
+    assert len(_run(metric)) == attributions_dataset.num_samples
+    _assert_finite(metric.result)
+
+
+def test_sensitivity_n(model_factory, attributions_dataset):
+    metric = SensitivityN(
+        model_factory,
+        attributions_dataset,
+        3,
+        MASKERS,
+        "linear",
+        0.1,
+        0.5,
+        2,
+        4,
+    )
+    assert len(_run(metric)) == attributions_dataset.num_samples
+    _assert_finite(metric.result)
+
+
+def test_impact_coverage(
+    tmp_path, model, model_factory, samples, method_factory
+):
+    # A random patch for each target class
+    generator = torch.Generator().manual_seed(0)
+    for target in range(model.fc.out_features):
+        torch.save(
+            torch.rand(1, 3, 3, 3, generator=generator),
+            tmp_path / f"patch_{target}.pt",
+        )
+    metric = ImpactCoverage(
+        model_factory,
+        TensorDataset(*samples),
+        3,
+        method_factory,
+        str(tmp_path),
+    )
+    assert len(_run(metric)) == len(samples[0])
+    _assert_finite(metric.result)
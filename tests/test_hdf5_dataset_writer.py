@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from attribench.data import HDF5Dataset, HDF5DatasetWriter
+
+
+MEAN = [0.5, 0.4, 0.3]
+STD = [0.2, 0.3, 0.4]
+
+
+@pytest.mark.parametrize(
+    "dtype, mean, std",
+    [
+        (np.float32, None, None),
+        (np.float32, MEAN, STD),
+        (np.float16, MEAN, STD),
+        (np.uint8, MEAN, STD),
+        (np.uint8, None, None),
+    ],
+)
+def test_round_trip_equals_stored_samples(tmp_path, dtype, mean, std):
+    path = str(tmp_path / "samples.h5")
+    rng = np.random.default_rng(0)
+    raw = rng.random((4, 3, 5, 5), dtype=np.float32)
+    if mean is not None:
+        samples = (raw - np.reshape(MEAN, (-1, 1, 1))) / np.reshape(
+            STD, (-1, 1, 1)
+        )
+    else:
+        samples = raw
+    samples = samples.astype(np.float32)
+    writer = HDF5DatasetWriter(path, 4, dtype=dtype, mean=mean, std=std)
+    writer.write(samples, np.arange(4))
+    expected = writer.round_trip(samples)
+
+    dataset = HDF5Dataset(path)
+    stored = np.stack([np.asarray(dataset[i][0]) for i in range(4)])
+    np.testing.assert_allclose(expected, stored, rtol=1e-6, atol=1e-6)
+    if dtype == np.float32:
+        np.testing.assert_allclose(expected, samples, rtol=1e-6, atol=1e-6)
+    else:
+        # Lossy storage changes the samples slightly
+        np.testing.assert_allclose(expected, samples, atol=0.05)
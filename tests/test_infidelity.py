@@ -0,0 +1,72 @@
+import math
+import numpy as np
+import torch
+from attribench.functional.metrics import infidelity
+from attribench.functional.metrics.infidelity import (
+    NoisyBaselinePerturbationGenerator,
+)
+from attribench.functional.metrics.infidelity._infidelity import (
+    _compute_infidelity,
+    _infidelity_confidence,
+    _power_sums_update,
+)
+
+
+def test_incremental_confidence_equals_direct_computation():
+    generator = torch.Generator().manual_seed(0)
+    num_perturbations, batch_size = 37, 5
+    dot_products = torch.randn(
+        num_perturbations, batch_size, generator=generator
+    )
+    pred_diffs = 0.5 * dot_products + torch.randn(
+        num_perturbations, batch_size, generator=generator
+    )
+    # Constant zero attributions give beta = 0
+    dot_products[:, 2] = 0
+
+    power_sums = torch.zeros(8, batch_size, dtype=torch.float64)
+    for i in range(num_perturbations):
+        power_sums += _power_sums_update(dot_products[i], pred_diffs[i])
+        if i == 0:
+            continue
+        value, half_width = _infidelity_confidence(power_sums, i + 1)
+        expected, squared_errors = _compute_infidelity(
+            dot_products[: i + 1],
+            pred_diffs[: i + 1],
+            torch.ones(i + 1, batch_size, dtype=torch.bool),
+        )
+        expected_half_width = (
+            1.96 * torch.std(squared_errors, dim=0) / math.sqrt(i + 1)
+        )
+        torch.testing.assert_close(value.float(), expected)
+        torch.testing.assert_close(half_width.float(), expected_half_width)
+
+
+def test_tolerance(model, attributions_dataset):
+    generators = {"noisy": NoisyBaselinePerturbationGenerator(0.1)}
+    result = infidelity(
+        model,
+        attributions_dataset,
+        4,
+        ["linear"],
+        generators,
+        50,
+        tolerance=0.5,
+        min_perturbations=5,
+    )
+    num_perturbations = result.tree.get(
+        method="grad",
+        perturbation_generator="noisy",
+        activation_fn="linear",
+        output="num_perturbations",
+    )
+    assert (num_perturbations >= 5).all()
+    assert (num_perturbations <= 50).all()
+    assert (num_perturbations < 50).any()
+    values = result.tree.get(
+        method="grad",
+        perturbation_generator="noisy",
+        activation_fn="linear",
+        output="value",
+    )
+    assert np.isfinite(values).all()
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+import torch
+from attribench import MethodFactory
+from attribench.data import AttributionsDataset
+from attribench.functional.metrics import parameter_randomization
+
+
+NUM_SEEDS = 3
+SEED = 7
+
+
+class IntegratedGradients:
+    # Evaluates the model on a batch of scaled copies of the samples
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, x, y, num_steps=4):
+        alphas = torch.linspace(1 / num_steps, 1, num_steps)
+        scaled_x = torch.cat([alpha * x for alpha in alphas])
+        scaled_x.requires_grad_(True)
+        out = self.model(scaled_x).gather(
+            1, y.repeat(num_steps).unsqueeze(-1)
+        )
+        gradients = torch.autograd.grad(out.sum(), scaled_x)[0]
+        return gradients.reshape(num_steps, *x.shape).mean(dim=0) * x
+
+
+class LayerActivation:
+    # Refers to a layer of the model it was created for
+    def __init__(self, model):
+        self.model = model
+        self.layer = model.conv
+
+    def __call__(self, x, y):
+        activations = []
+        handle = self.layer.register_forward_hook(
+            lambda module, inputs, output: activations.append(output)
+        )
+        with torch.no_grad():
+            self.model(x)
+        handle.remove()
+        return activations[0].sum(dim=1, keepdim=True).expand_as(x)
+
+
+@pytest.fixture
+def method_factory():
+    return MethodFactory(
+        {"ig": IntegratedGradients, "activation": LayerActivation}
+    )
+
+
+@pytest.fixture
+def dataset(model, samples, method_factory):
+    x, y = samples
+    attributions = {
+        name: method(x, y).detach()
+        for name, method in method_factory(model).items()
+    }
+    return AttributionsDataset(x, y, attributions=attributions)
+
+
+@pytest.mark.parametrize("cascading", [False, True])
+def test_multiple_seeds_equal_single_seeds(
+    model_factory, dataset, method_factory, cascading
+):
+    result = parameter_randomization(
+        model_factory,
+        dataset,
+        3,
+        method_factory,
+        cascading=cascading,
+        num_seeds=NUM_SEEDS,
+        seed=SEED,
+    )
+    for seed_idx in range(NUM_SEEDS):
+        # Seed i of a run uses seed + i
+        single = parameter_randomization(
+            model_factory,
+            dataset,
+            3,
+            method_factory,
+            cascading=cascading,
+            seed=SEED + seed_idx,
+        )
+        for method in ["ig", "activation"]:
+            for layer in result.layers if cascading else [None]:
+                level_keys = {"layer": layer} if cascading else {}
+                values = result.tree.get(method=method, **level_keys)
+                expected = single.tree.get(method=method, **level_keys)
+                assert values.shape[1] == NUM_SEEDS
+                np.testing.assert_allclose(
+                    values[:, seed_idx], expected, atol=1e-5
+                )
+
+
+def test_last_cascading_stage_equals_full_randomization(
+    model_factory, dataset, method_factory
+):
+    kwargs = dict(num_seeds=2, seed=SEED)
+    full = parameter_randomization(
+        model_factory,
+        dataset,
+        3,
+        method_factory,
+        **kwargs,
+    )
+    cascading = parameter_randomization(
+        model_factory,
+        dataset,
+        3,
+        method_factory,
+        cascading=True,
+        **kwargs,
+    )
+    for method in ["ig", "activation"]:
+        np.testing.assert_allclose(
+            cascading.tree.get(method=method, layer=cascading.layers[-1]),
+            full.tree.get(method=method),
+            atol=1e-5,
+        )
+
+
+def test_seed(model_factory, dataset, method_factory):
+    torch.manual_seed(0)
+    expected_state = torch.random.get_rng_state()
+    results = [
+        parameter_randomization(
+            model_factory,
+            dataset,
+            3,
+            method_factory,
+            seed=seed,
+        ).tree.get(method="ig")
+        for seed in [SEED, SEED, SEED + 1]
+    ]
+    # The global random state is not used if a seed is given
+    assert torch.equal(torch.random.get_rng_state(), expected_state)
+    np.testing.assert_array_equal(results[0], results[1])
+    assert not np.allclose(results[0], results[2])
@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+from attribench.functional.metrics import (
+    deletion,
+    parameter_randomization,
+)
+from attribench.masking.image import ConstantImageMasker
+from attribench.result import (
+    HDF5ResultSink,
+    MetricResult,
+    ResultSink,
+    RunningStatistics,
+)
+
+
+MASKERS = {"constant": ConstantImageMasker("pixel")}
+ACTIVATION_FNS = ["linear", "softmax"]
+
+
+class _CountingSink(ResultSink):
+    def __init__(self):
+        self.num_batches = 0
+        self.closed = False
+
+    def open(self, result):
+        pass
+
+    def add(self, batch_result):
+        self.num_batches += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize("sample_major", [False, True])
+def test_hdf5_result_sink_deletion(
+    tmp_path, model, attributions_dataset, assert_results_equal, sample_major
+):
+    path = str(tmp_path / "result.h5")
+    kwargs = dict(num_steps=10, sample_major=sample_major)
+    expected = deletion(
+        model, attributions_dataset, 3, MASKERS, ACTIVATION_FNS, **kwargs
+    )
+    result = deletion(
+        model,
+        attributions_dataset,
+        3,
+        MASKERS,
+        ACTIVATION_FNS,
+        **kwargs,
+        sinks=[HDF5ResultSink(path)],
+    )
+    assert result is None
+    loaded = MetricResult.load(path)
+    assert type(loaded) is type(expected)
+    assert loaded.mode == expected.mode
+    assert_results_equal(loaded, expected)
+
+
+def test_hdf5_result_sink_parameter_randomization(
+    tmp_path,
+    model_factory,
+    feature_attributions_dataset,
+    method_factory,
+    assert_results_equal,
+):
+    path = str(tmp_path / "result.h5")
+    kwargs = dict(cascading=True, num_seeds=2, seed=0)
+    expected = parameter_randomization(
+        model_factory,
+        feature_attributions_dataset,
+        3,
+        method_factory,
+        **kwargs,
+    )
+    parameter_randomization(
+        model_factory,
+        feature_attributions_dataset,
+        3,
+        method_factory,
+        **kwargs,
+        sinks=[HDF5ResultSink(path)],
+    )
+    loaded = MetricResult.load(path)
+    assert loaded.layers == expected.layers
+    assert loaded.num_seeds == expected.num_seeds
+    assert_results_equal(loaded, expected)
+
+
+# Steps that were skipped for all samples have no statistics
+@pytest.mark.filterwarnings("ignore:Mean of empty slice")
+@pytest.mark.filterwarnings("ignore:Degrees of freedom")
+def test_running_statistics(model, attributions_dataset):
+    # Adaptive mode leaves steps that were not evaluated as NaN
+    kwargs = dict(num_steps=21, tolerance=0.1, num_coarse_steps=5)
+    expected = deletion(
+        model, attributions_dataset, 3, MASKERS, ACTIVATION_FNS, **kwargs
+    )
+    statistics = RunningStatistics()
+    deletion(
+        model,
+        attributions_dataset,
+        3,
+        MASKERS,
+        ACTIVATION_FNS,
+        **kwargs,
+        sinks=[statistics],
+    )
+    assert statistics.num_samples == attributions_dataset.num_samples
+    for method in ["grad", "ixg"]:
+        for activation_fn in ACTIVATION_FNS:
+            values = expected.tree.get(
+                method=method, masker="constant", activation_fn=activation_fn
+            )
+            count = statistics.count[method]["constant"][activation_fn]
+            mean = statistics.mean[method]["constant"][activation_fn]
+            variance = statistics.variance[method]["constant"][activation_fn]
+            np.testing.assert_array_equal(count, (~np.isnan(values)).sum(0))
+            np.testing.assert_allclose(mean, np.nanmean(values, axis=0))
+            np.testing.assert_allclose(
+                variance, np.nanvar(values, axis=0, ddof=1), atol=1e-10
+            )
+
+
+def test_running_statistics_grouped(
+    model_factory, feature_attributions_dataset, method_factory
+):
+    kwargs = dict(num_seeds=3, seed=0)
+    expected = parameter_randomization(
+        model_factory,
+        feature_attributions_dataset,
+        3,
+        method_factory,
+        **kwargs,
+    )
+    statistics = RunningStatistics()
+    parameter_randomization(
+        model_factory,
+        feature_attributions_dataset,
+        3,
+        method_factory,
+        **kwargs,
+        sinks=[statistics],
+    )
+    for method in ["grad", "ixg"]:
+        values = expected.tree.get(method=method)
+        np.testing.assert_allclose(
+            statistics.mean[method], values.mean(axis=0), rtol=1e-6
+        )
+        np.testing.assert_allclose(
+            statistics.variance[method],
+            values.var(axis=0, ddof=1),
+            rtol=1e-5,
+        )
+
+
+def test_running_statistics_stops_early(
+    tmp_path, model, attributions_dataset
+):
+    path = str(tmp_path / "result.h5")
+    counter = _CountingSink()
+    statistics = RunningStatistics(max_samples=4)
+    deletion(
+        model,
+        attributions_dataset,
+        3,
+        MASKERS,
+        "linear",
+        num_steps=10,
+        sample_major=True,
+        sinks=[HDF5ResultSink(path), counter, statistics],
+    )
+    # Two batches of 3 samples are needed for 4 samples
+    assert counter.num_batches == 2
+    assert counter.closed
+    assert statistics.num_samples == 6
+    # Samples that were not computed are 0 in the file
+    loaded = MetricResult.load(path)
+    values = loaded.tree.get(
+        method="grad", masker="constant", activation_fn="linear"
+    )
+    assert (values[6:] == 0).all()
+    assert not (values[:6] == 0).all()